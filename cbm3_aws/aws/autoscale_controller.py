@@ -0,0 +1,242 @@
+import math
+import time
+from threading import Event
+from typing import Callable
+from typing import Union
+from mypy_boto3_autoscaling import AutoScalingClient
+from mypy_boto3_stepfunctions.client import SFNClient
+from cbm3_aws import log_helper
+from cbm3_aws.aws.autoscale_group import INSTANCE_VIRTUAL_CPUS
+
+logger = log_helper.get_logger(__name__)
+
+# each instance runs a worker process per this many virtual CPUs, each
+# running up to this many simulations at once, see
+# cbm3_aws.scripts.run_instance
+WORKER_VIRTUAL_CPUS = 8
+
+
+def count_running_executions(client: SFNClient, state_machine_arn: str) -> int:
+    """Count the running executions of the specified state machine
+
+    Args:
+        client (SFNClient): boto3 step functions client
+        state_machine_arn (str): the state machine's resource name
+
+    Returns:
+        int: the number of running executions
+    """
+    paginator = client.get_paginator("list_executions")
+    count = 0
+    for page in paginator.paginate(
+        stateMachineArn=state_machine_arn, statusFilter="RUNNING"
+    ):
+        count += len(page["executions"])
+    return count
+
+
+def get_tasks_per_instance(
+    dynamic_work_units: bool, max_tasks_held: int = 1
+) -> int:
+    """Get the number of tasks run at once by each instance of a cluster
+
+    Args:
+        dynamic_work_units (bool): True if the cluster was deployed with
+            dynamic work units, in which case each worker process holds a
+            single-simulation task per simulation slot
+        max_tasks_held (int, optional): the number of tasks held at once by
+            each worker process without dynamic work units. Defaults to 1.
+
+    Returns:
+        int: the number of tasks per instance
+    """
+    workers = math.ceil(INSTANCE_VIRTUAL_CPUS / WORKER_VIRTUAL_CPUS)
+    if dynamic_work_units:
+        return workers * WORKER_VIRTUAL_CPUS
+    return workers * max_tasks_held
+
+
+class AutoscaleController:
+    """Sets the desired capacity of the worker autoscaling group from the
+    amount of work in the cluster's state machines.
+
+    Each running execution of the task state machine is one task that is
+    either waiting on the activity or being run by a worker, so the number
+    of running task executions is the demand for worker processes. The
+    desired number of instances is the demand divided by the number of
+    worker processes per instance, limited to the group's MinSize and
+    MaxSize.
+
+    Capacity is increased as soon as demand rises. It is only decreased
+    once demand has stayed lower for scale_down_delay seconds, so that
+    short gaps between tasks do not cause instances to be removed and
+    relaunched. When the application state machine has no running
+    executions for idle_timeout seconds, the group is scaled to its
+    MinSize, which scales it to zero when the group's MinSize is 0.
+
+    Clusters deployed with the inline task layout have no task state
+    machine, so the number of tasks can not be counted. For these the
+    group is scaled to its MaxSize while the application state machine has
+    running executions.
+
+    Args:
+        autoscale_client (AutoScalingClient): boto3 autoscaling client
+        sfn_client (SFNClient): boto3 step functions client
+        auto_scaling_group_name (str): the worker group name
+        task_state_machine_arn (str): the task state machine resource
+            name, or None if the cluster uses the inline task layout
+        app_state_machine_arn (str): the application state machine resource
+            name
+        tasks_per_instance (int, optional): the number of worker processes,
+            each running one task at a time, on each instance. Defaults
+            to 1.
+        scale_down_delay (float, optional): seconds demand must stay below
+            the current capacity before scaling down. Defaults to 300.
+        idle_timeout (float, optional): seconds with no running executions
+            before scaling to the group's MinSize. Defaults to 600.
+        clock (Callable, optional): function returning the current time in
+            seconds. Defaults to time.time.
+    """
+
+    def __init__(
+        self,
+        autoscale_client: AutoScalingClient,
+        sfn_client: SFNClient,
+        auto_scaling_group_name: str,
+        task_state_machine_arn: Union[str, None],
+        app_state_machine_arn: str,
+        tasks_per_instance: int = 1,
+        scale_down_delay: float = 300.0,
+        idle_timeout: float = 600.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.autoscale_client = autoscale_client
+        self.sfn_client = sfn_client
+        self.auto_scaling_group_name = auto_scaling_group_name
+        self.task_state_machine_arn = task_state_machine_arn
+        self.app_state_machine_arn = app_state_machine_arn
+        self.tasks_per_instance = tasks_per_instance
+        self.scale_down_delay = scale_down_delay
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self._scale_down_since: Union[float, None] = None
+        self._idle_since: Union[float, None] = None
+
+    def get_demand(self) -> dict:
+        """Get the current work in the cluster
+
+        Returns:
+            dict: the number of "running_tasks", which is None if it can not
+                be counted, and "running_executions"
+        """
+        running_tasks = None
+        if self.task_state_machine_arn:
+            running_tasks = count_running_executions(
+                self.sfn_client, self.task_state_machine_arn
+            )
+        return dict(
+            running_tasks=running_tasks,
+            running_executions=count_running_executions(
+                self.sfn_client, self.app_state_machine_arn
+            ),
+        )
+
+    def get_group(self) -> dict:
+        """Get the current capacity settings of the worker group
+
+        Returns:
+            dict: the "desired", "min" and "max" capacity of the group
+        """
+        response = self.autoscale_client.describe_auto_scaling_groups(
+            AutoScalingGroupNames=[self.auto_scaling_group_name]
+        )
+        group = response["AutoScalingGroups"][0]
+        return dict(
+            desired=group["DesiredCapacity"],
+            min=group["MinSize"],
+            max=group["MaxSize"],
+        )
+
+    def get_desired_capacity(self, demand: dict, group: dict) -> int:
+        """Compute the desired capacity, applying the scale down delay and
+        idle timeout.
+
+        Args:
+            demand (dict): the return value of :py:func:`get_demand`
+            group (dict): the return value of :py:func:`get_group`
+
+        Returns:
+            int: the desired capacity
+        """
+        now = self.clock()
+        current = group["desired"]
+        running_tasks = demand["running_tasks"]
+        idle = not running_tasks and demand["running_executions"] == 0
+        if idle:
+            if self._idle_since is None:
+                self._idle_since = now
+            self._scale_down_since = None
+            if now - self._idle_since >= self.idle_timeout:
+                return group["min"]
+            return current
+        self._idle_since = None
+
+        if running_tasks is None:
+            target = group["max"]
+        else:
+            target = math.ceil(running_tasks / self.tasks_per_instance)
+            target = min(max(target, group["min"]), group["max"])
+        if target >= current:
+            self._scale_down_since = None
+            return target
+        if self._scale_down_since is None:
+            self._scale_down_since = now
+        if now - self._scale_down_since >= self.scale_down_delay:
+            self._scale_down_since = None
+            return target
+        return current
+
+    def step(self) -> int:
+        """Run one iteration of the scaling loop
+
+        Returns:
+            int: the desired capacity of the group after the iteration
+        """
+        demand = self.get_demand()
+        group = self.get_group()
+        desired = self.get_desired_capacity(demand, group)
+        if desired != group["desired"]:
+            logger.info(
+                dict(
+                    demand=demand,
+                    group=group,
+                    desired=desired,
+                )
+            )
+            self.autoscale_client.set_desired_capacity(
+                AutoScalingGroupName=self.auto_scaling_group_name,
+                DesiredCapacity=desired,
+                HonorCooldown=False,
+            )
+        return desired
+
+    def run(
+        self, interval: float = 60.0, stop_event: Union[Event, None] = None
+    ) -> None:
+        """Run the scaling loop until the stop event is set
+
+        Args:
+            interval (float, optional): seconds between iterations.
+                Defaults to 60.
+            stop_event (Event, optional): event that stops the loop. If
+                None the loop runs until the process is interrupted.
+                Defaults to None.
+        """
+        stop_event = stop_event if stop_event else Event()
+        while not stop_event.is_set():
+            try:
+                self.step()
+            except Exception:
+                # errors such as API throttling should not stop the loop
+                logger.exception("autoscale controller iteration failed")
+            stop_event.wait(interval)
@@ -39,6 +39,9 @@ AWS_NON_WINDOWS_SUPPORTING_INSTANCE_TYPES = [
     "x2gd.*",
 ]
 
+# the number of virtual CPUs of each instance in the group
+INSTANCE_VIRTUAL_CPUS = 8
+
 
 def delete_launch_template(client: EC2Client, context: dict[str, str]):
     """Drop launch template associated with the specified context
@@ -207,7 +210,10 @@ def create_autoscaling_group(
                 "Overrides": [
                     {
                         "InstanceRequirements": {
-                            "VCpuCount": {"Min": 8, "Max": 8},
+                            "VCpuCount": {
+                                "Min": INSTANCE_VIRTUAL_CPUS,
+                                "Max": INSTANCE_VIRTUAL_CPUS,
+                            },
                             "MemoryMiB": {"Min": 10000, "Max": 33000},
                             "CpuManufacturers": ["intel"],
                             "ExcludedInstanceTypes": (
@@ -1,35 +1,247 @@
 import json
+from typing import Union
+from cbm3_aws.aws import cbm3_run_task_state_machine
 
+# application state machine layouts: each task is run by a child execution
+# of the task state machine, or the task state machine's states are
+# embedded in the Map iterator
+CHILD_EXECUTION_LAYOUT = "child_execution"
+INLINE_LAYOUT = "inline"
+
+
+def _get_launch_task_states(
+    task_state_machine_arn: str, compact_results: bool
+) -> dict:
+    state = {
+        "launch_cbm_task": {
+            "Type": "Task",
+            "Resource": "arn:aws:states:::states:startExecution.sync",
+            "Parameters": {
+                "StateMachineArn": task_state_machine_arn,
+                "Input": {
+                    "Input.$": "$.Input",
+                    "AWS_STEP_FUNCTIONS_STARTED_BY_EXECUTION_ID.$": "$$.Execution.Id",  # noqa E501
+                },
+            },
+            "End": True,
+        }
+    }
+    if compact_results:
+        # the startExecution.sync result echoes the child execution's
+        # input and metadata, so keep only the task's output
+        state["launch_cbm_task"]["ResultSelector"] = {
+            "task.$": "States.StringToJson($.Output)"
+        }
+        state["launch_cbm_task"]["OutputPath"] = "$.task"
+    return state
+
+
+def _get_task_processor(
+    task_layout: str,
+    task_state_machine_arn: Union[str, None],
+    activity_arn: Union[str, None],
+    task_retry_policy: Union[dict, None],
+    compact_results: bool,
+    s3_bucket_name: Union[str, None],
+) -> dict:
+    if task_layout == CHILD_EXECUTION_LAYOUT:
+        if not task_state_machine_arn:
+            raise ValueError(
+                "task_state_machine_arn required for the "
+                f"{CHILD_EXECUTION_LAYOUT} layout"
+            )
+        return {
+            "StartAt": "launch_cbm_task",
+            "States": _get_launch_task_states(
+                task_state_machine_arn, compact_results
+            ),
+        }
+    if task_layout == INLINE_LAYOUT:
+        if not activity_arn:
+            raise ValueError(
+                f"activity_arn required for the {INLINE_LAYOUT} layout"
+            )
+        return cbm3_run_task_state_machine.get_task_states(
+            activity_arn, task_retry_policy, compact_results, s3_bucket_name
+        )
+    raise ValueError(f"unknown task_layout: {task_layout}")
+
+
+def _get_inline_map_state(task_processor: dict, compact_results: bool) -> dict:
+    state = {
+        "Type": "Map",
+        "ItemsPath": "$.task_list",
+        "Parameters": {"Input.$": "$$.Map.Item.Value"},
+        "Iterator": task_processor,
+        "End": True,
+    }
+    if compact_results:
+        # rather than the list of every task's output, the execution
+        # output is the task count and the status records of the failed
+        # tasks
+        state["ResultSelector"] = {
+            "tasks.$": "States.ArrayLength($)",
+            "failed_status_keys.$": (
+                "$[?(@.output.failed == true)].output.status_key"
+            ),
+        }
+    return state
+
+
+def _get_distributed_map_state(
+    task_processor: dict,
+    s3_bucket_name: str,
+    max_concurrency: int,
+    max_items_per_batch: int,
+) -> dict:
+    item_processor = {
+        "ProcessorConfig": {"Mode": "DISTRIBUTED", "ExecutionType": "STANDARD"}
+    }
+    if max_items_per_batch > 1:
+        # each child execution receives a batch of tasks in its "Items"
+        # input, and runs them all with an inline map
+        item_processor["StartAt"] = "launch_batch"
+        item_processor["States"] = {
+            "launch_batch": {
+                "Type": "Map",
+                "ItemsPath": "$.Items",
+                "ItemProcessor": {
+                    "ProcessorConfig": {"Mode": "INLINE"},
+                    **task_processor,
+                },
+                "End": True,
+            }
+        }
+    else:
+        item_processor.update(task_processor)
+
+    state = {
+        "Type": "Map",
+        "ItemReader": {
+            "Resource": "arn:aws:states:::s3:getObject",
+            "ReaderConfig": {"InputType": "JSON"},
+            "Parameters": {
+                "Bucket": s3_bucket_name,
+                "Key.$": "$.task_list_key",
+            },
+        },
+        "ItemSelector": {"Input.$": "$$.Map.Item.Value"},
+        "ItemProcessor": item_processor,
+        "MaxConcurrency": max_concurrency,
+        # the combined output of a large number of tasks exceeds the step
+        # functions payload limit, so it is written to S3
+        "ResultWriter": {
+            "Resource": "arn:aws:states:::s3:putObject",
+            "Parameters": {
+                "Bucket": s3_bucket_name,
+                "Prefix.$": "$.result_prefix",
+            },
+        },
+        "End": True,
+    }
+    if max_items_per_batch > 1:
+        state["ItemBatcher"] = {"MaxItemsPerBatch": max_items_per_batch}
+    return state
+
+
+def get_state_machine(
+    task_state_machine_arn: Union[str, None],
+    distributed_map: bool = False,
+    s3_bucket_name: Union[str, None] = None,
+    map_max_concurrency: int = 0,
+    map_max_items_per_batch: int = 1,
+    task_layout: str = CHILD_EXECUTION_LAYOUT,
+    activity_arn: Union[str, None] = None,
+    task_retry_policy: Union[dict, None] = None,
+    compact_results: bool = False,
+) -> str:
+    """Gets the definition of the application state machine, which runs
+    each task in an execution's task list.
+
+    With the default "child_execution" layout each task is run by an
+    execution of the task state machine. With the "inline" layout the
+    task state machine's run, catch and retry states are embedded in the
+    Map iterator, so that no child execution, and none of the state
+    transitions and execution history of launching one, is needed for
+    each task.
+
+    With the default inline Map, the execution input contains the task
+    list::
+
+        {"task_list": [{"upload_s3_key": ..., "simulations": [...]}]}
+
+    With a Distributed Map, the task list is read from a json array stored
+    in S3, and the map results are written to S3::
+
+        {"task_list_key": "s3/key/of/task_list.json",
+         "result_prefix": "s3/key/prefix/for/results"}
+
+    Args:
+        task_state_machine_arn (str): the resource name of the task state
+            machine
+        distributed_map (bool, optional): if True, use a Distributed Map
+            reading the task list from S3. Defaults to False.
+        s3_bucket_name (str, optional): the bucket containing task lists
+            and receiving results. Required if distributed_map is True, or
+            for the task status records written by the inline layout with
+            compact_results. Defaults to None.
+        map_max_concurrency (int, optional): the maximum number of
+            concurrent Distributed Map child executions, where 0 means no
+            limit beyond the Step Functions maximum. Defaults to 0.
+        map_max_items_per_batch (int, optional): the number of tasks
+            launched by each Distributed Map child execution. Defaults to
+            1.
+        task_layout (str, optional): "child_execution" or "inline".
+            Defaults to "child_execution".
+        activity_arn (str, optional): the resource name of the activity
+            polled by the workers. Required for the inline layout.
+            Defaults to None.
+        task_retry_policy (dict, optional): the retry policy of the inline
+            layout's task states, see
+            :py:func:`cbm3_aws.aws.task_retry_policy.get_task_retry_policy`.
+            Defaults to None.
+        compact_results (bool, optional): if True, each task's output is
+            the count of its simulations and the S3 key of its status
+            record written by the worker, and the inputs echoed by the
+            child executions' results are dropped. With the default inline
+            Map, the execution output is reduced to the number of tasks and
+            the "status_key" of each failed task::
+
+                {"tasks": 120, "failed_status_keys": [...]}
+
+            The Map still collects the compact output of every task before
+            reducing it, so task lists large enough for these to approach
+            the Step Functions payload limit need a Distributed Map, whose
+            results are written to S3. The workers must be run with
+            compact_results to match. Defaults to False.
+
+    Returns:
+        str: the json state machine definition
+    """
+    task_processor = _get_task_processor(
+        task_layout,
+        task_state_machine_arn,
+        activity_arn,
+        task_retry_policy,
+        compact_results,
+        s3_bucket_name,
+    )
+    if distributed_map:
+        if not s3_bucket_name:
+            raise ValueError("s3_bucket_name required for distributed_map")
+        map_state = _get_distributed_map_state(
+            task_processor,
+            s3_bucket_name,
+            map_max_concurrency,
+            map_max_items_per_batch,
+        )
+    else:
+        map_state = _get_inline_map_state(task_processor, compact_results)
 
-def get_state_machine(task_state_machine_arn: str) -> str:
     return json.dumps(
         {
-            "Comment": "Task to launch CBM run task state machines",
+            "Comment": "Task to run CBM tasks",
             "StartAt": "map_tasks",
-            "States": {
-                "map_tasks": {
-                    "Type": "Map",
-                    "ItemsPath": "$.task_list",
-                    "Parameters": {"Input.$": "$$.Map.Item.Value"},
-                    "Iterator": {
-                        "StartAt": "launch_cbm_task",
-                        "States": {
-                            "launch_cbm_task": {
-                                "Type": "Task",
-                                "Resource": "arn:aws:states:::states:startExecution.sync",  # noqa E501
-                                "Parameters": {
-                                    "StateMachineArn": task_state_machine_arn,
-                                    "Input": {
-                                        "Input.$": "$.Input",
-                                        "AWS_STEP_FUNCTIONS_STARTED_BY_EXECUTION_ID.$": "$$.Execution.Id",  # noqa E501
-                                    },
-                                },
-                                "End": True,
-                            }
-                        },
-                    },
-                    "End": True,
-                }
-            },
+            "States": {"map_tasks": map_state},
         }
     )
@@ -1,35 +1,243 @@
 import json
+from typing import Union
+from cbm3_aws.aws.task_retry_policy import FAIL
+from cbm3_aws.aws.task_retry_policy import get_task_retry_policy
+from cbm3_aws.instance.failure_policy import RETRYABLE_TASK_ERROR
+from cbm3_aws.instance.spot_interruption import SPOT_INTERRUPTION_ERROR
 
+# error of the Fail state reached when a task's attempts are exhausted
+TASK_ATTEMPTS_EXHAUSTED_ERROR = "cbm3_aws.TaskAttemptsExhausted"
 
-def get_state_machine(cbm_run_task_activity_arn: str) -> str:
+
+# the S3 key of a task status record, matching the key written by the
+# workers with :py:func:`cbm3_aws.s3_io.S3IO.put_json`
+_TASK_STATUS_KEY_FORMAT = (
+    "States.Format('cbm3_aws/{}/task_status/{}.json', "
+    "$.Input.upload_s3_key, $.record.task_id)"
+)
+
+
+def _get_terminal_failure_states(
+    terminal_failure: str,
+    compact_results: bool,
+    s3_bucket_name: Union[str, None],
+) -> dict:
+    if terminal_failure == FAIL:
+        return {
+            "TerminalFailure": {
+                "Type": "Fail",
+                "Error": TASK_ATTEMPTS_EXHAUSTED_ERROR,
+                "Cause": "the task timed out or failed on every attempt",
+            }
+        }
+    # report the task as finished with errors, as the workers do for
+    # quarantined tasks, so the execution's other tasks carry on
+    if not compact_results:
+        return {
+            "TerminalFailure": {
+                "Type": "Pass",
+                "Parameters": {
+                    "output": {
+                        "simulations.$": "$.Input.simulations",
+                        "errors.$": "$.TaskError",
+                    }
+                },
+                "End": True,
+            }
+        }
+    if not s3_bucket_name:
+        raise ValueError(
+            "s3_bucket_name required for compact_results with the "
+            "record_errors terminal failure"
+        )
+    # as the workers do for compact results, the simulations and errors are
+    # written to a task status record in S3, and the output carries only
+    # counts and the record's key
+    return {
+        "TerminalFailure": {
+            "Type": "Pass",
+            "Parameters": {
+                "Input.$": "$.Input",
+                "simulation_ids.$": "$.Input.simulations[*].simulation_ids[*]",
+                "record": {
+                    # no worker reported the task, so the record is
+                    # identified by a new id rather than the worker's task id
+                    "task_id.$": "States.UUID()",
+                    "simulations.$": "$.Input.simulations",
+                    "errors.$": "$.TaskError",
+                },
+            },
+            "Next": "RecordTerminalFailure",
+        },
+        "RecordTerminalFailure": {
+            "Type": "Task",
+            "Resource": "arn:aws:states:::aws-sdk:s3:putObject",
+            "Parameters": {
+                "Bucket": s3_bucket_name,
+                "Key.$": _TASK_STATUS_KEY_FORMAT,
+                "Body.$": "States.JsonToString($.record)",
+                "ContentType": "application/json",
+            },
+            "ResultPath": None,
+            "Retry": [
+                {
+                    "ErrorEquals": ["States.ALL"],
+                    "IntervalSeconds": 5,
+                    "BackoffRate": 2.0,
+                    "MaxAttempts": 3,
+                }
+            ],
+            "Next": "TerminalFailureResult",
+        },
+        "TerminalFailureResult": {
+            "Type": "Pass",
+            "Parameters": {
+                "output": {
+                    "projects.$": "States.ArrayLength($.Input.simulations)",
+                    "simulations.$": "States.ArrayLength($.simulation_ids)",
+                    "failed": True,
+                    "status_key.$": _TASK_STATUS_KEY_FORMAT,
+                }
+            },
+            "End": True,
+        },
+    }
+
+
+def get_task_states(
+    cbm_run_task_activity_arn: str,
+    task_retry_policy: Union[dict, None] = None,
+    compact_results: bool = False,
+    s3_bucket_name: Union[str, None] = None,
+) -> dict:
+    """Get the states that run a single task on the workers, for use as the
+    task state machine or embedded in the application state machine's Map
+    iterator.
+
+    Tasks that time out, or that a worker reports as having failed with a
+    retryable error, are retried with exponential backoff until the
+    policy's attempts are exhausted, when the task is routed to the
+    policy's terminal failure state. Tasks handed back from interrupted
+    spot instances are restarted immediately, and do not count as
+    attempts.
+
+    Args:
+        cbm_run_task_activity_arn (str): the resource name of the activity
+            polled by the workers
+        task_retry_policy (dict, optional): the retry policy, see
+            :py:func:`cbm3_aws.aws.task_retry_policy.get_task_retry_policy`.
+            If None the default policy is used. Defaults to None.
+        compact_results (bool, optional): if True, the simulations and
+            errors of a task routed to the "record_errors" terminal failure
+            are written to a task status record in S3, and its output has
+            the counts and "status_key" of the workers' compact output,
+            see :py:func:`cbm3_aws.instance.instance_task.send_task_result`.
+            Defaults to False.
+        s3_bucket_name (str, optional): the bucket for the task status
+            records. Required if compact_results is True and the policy's
+            terminal failure is "record_errors". Defaults to None.
+
+    Returns:
+        dict: the "StartAt" and "States" of the task
+    """
+    policy = get_task_retry_policy(task_retry_policy)
+    return {
+        "StartAt": "RunCBMTask",
+        "States": {
+            "RunCBMTask": {
+                "Comment": "starts the CBM run task activity",
+                "Type": "Task",
+                "Resource": cbm_run_task_activity_arn,
+                "Parameters": {
+                    "Input.$": "$.Input",
+                    "EnteredTime.$": "$$.State.EnteredTime",
+                    # scopes the workers' attempt records to this execution
+                    "ExecutionId.$": "$$.Execution.Id",
+                },
+                "HeartbeatSeconds": policy["heartbeat_seconds"],
+                "Next": "StopCBMTask",
+                "Retry": [
+                    {
+                        "ErrorEquals": [
+                            "States.Timeout",
+                            RETRYABLE_TASK_ERROR,
+                        ],
+                        "IntervalSeconds": policy["initial_delay_seconds"],
+                        "BackoffRate": policy["backoff_rate"],
+                        "MaxDelaySeconds": policy["max_delay_seconds"],
+                        "MaxAttempts": policy["max_attempts"] - 1,
+                        "JitterStrategy": "FULL",
+                    }
+                ],
+                "Catch": [
+                    {
+                        "ErrorEquals": [SPOT_INTERRUPTION_ERROR],
+                        "ResultPath": "$.Interruption",
+                        "Next": "RestartRemaining",
+                    },
+                    {
+                        "ErrorEquals": [
+                            "States.Timeout",
+                            RETRYABLE_TASK_ERROR,
+                        ],
+                        "ResultPath": "$.TaskError",
+                        "Next": "TerminalFailure",
+                    },
+                ],
+            },
+            "RestartRemaining": {
+                "Comment": (
+                    "restarts the task with the unfinished simulations "
+                    "handed back by a worker on an interrupted instance"
+                ),
+                "Type": "Pass",
+                "Parameters": {
+                    "Input.$": "States.StringToJson($.Interruption.Cause)"
+                },
+                "Next": "RunCBMTask",
+            },
+            **_get_terminal_failure_states(
+                policy["terminal_failure"], compact_results, s3_bucket_name
+            ),
+            "StopCBMTask": {"Type": "Succeed"},
+        },
+    }
+
+
+def get_state_machine(
+    cbm_run_task_activity_arn: str,
+    task_retry_policy: Union[dict, None] = None,
+    compact_results: bool = False,
+    s3_bucket_name: Union[str, None] = None,
+) -> str:
+    """Get the definition of the state machine that runs a single task on
+    the workers, see :py:func:`get_task_states`
+
+    Args:
+        cbm_run_task_activity_arn (str): the resource name of the activity
+            polled by the workers
+        task_retry_policy (dict, optional): the retry policy. If None the
+            default policy is used. Defaults to None.
+        compact_results (bool, optional): if True, task outputs carry only
+            counts. Defaults to False.
+        s3_bucket_name (str, optional): the bucket for the task status
+            records. Defaults to None.
+
+    Returns:
+        str: the json state machine definition
+    """
+    task_states = get_task_states(
+        cbm_run_task_activity_arn,
+        task_retry_policy,
+        compact_results,
+        s3_bucket_name,
+    )
     return json.dumps(
         {
             "Comment": (
                 "Task to launch CBM runs and retry if they experience a crash "
                 "or spot interruption"
             ),
-            "StartAt": "RunCBMTask",
-            "States": {
-                "RunCBMTask": {
-                    "Comment": "starts the CBM run task activity",
-                    "Type": "Task",
-                    "Resource": cbm_run_task_activity_arn,
-                    "HeartbeatSeconds": 60,
-                    "Next": "StopCBMTask",
-                    "Catch": [
-                        {
-                            "ErrorEquals": ["States.Timeout"],
-                            "ResultPath": None,
-                            "Next": "DelayThenRestart",
-                        }
-                    ],
-                },
-                "DelayThenRestart": {
-                    "Type": "Wait",
-                    "Seconds": 60,
-                    "Next": "RunCBMTask",
-                },
-                "StopCBMTask": {"Type": "Succeed"},
-            },
+            **task_states,
         }
     )
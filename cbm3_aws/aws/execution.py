@@ -1,9 +1,59 @@
 import json
 import boto3
+from typing import Union
+from cbm3_aws import task_packer
+
+
+def get_task_list_key(execution_name: str) -> str:
+    """Gets the S3 key of the task list for a Distributed Map execution
+
+    Args:
+        execution_name (str): the name of the execution
+
+    Returns:
+        str: the S3 key
+    """
+    return f"cbm3_aws/executions/{execution_name}/task_list.json"
+
+
+def get_result_prefix(execution_name: str) -> str:
+    """Gets the S3 key prefix under which the results of a Distributed Map
+    execution are written
+
+    Args:
+        execution_name (str): the name of the execution
+
+    Returns:
+        str: the S3 key prefix
+    """
+    return f"cbm3_aws/executions/{execution_name}/map_results"
+
+
+def get_execution_arn(state_machine_arn: str, execution_name: str) -> str:
+    """Gets the resource name of an execution of a state machine
+
+    Args:
+        state_machine_arn (str): the resource name of the state machine
+        execution_name (str): the name of the execution
+
+    Returns:
+        str: the execution's resource name
+    """
+    return "{0}:{1}".format(
+        state_machine_arn.replace(":stateMachine:", ":execution:", 1),
+        execution_name,
+    )
 
 
 def start_execution(
-    execution_name: str, state_machine_arn: str, region_name: str, tasks: dict
+    execution_name: str,
+    state_machine_arn: str,
+    region_name: str,
+    tasks: dict,
+    distributed_map: bool = False,
+    s3_bucket_name: Union[str, None] = None,
+    dynamic_work_units: bool = False,
+    resume: bool = False,
 ) -> dict[str, str]:
     """Starts an execution on a cbm_aws cluster
 
@@ -16,6 +66,20 @@ def start_execution(
             which to run the execution.
         region_name (str): the region name
         tasks (dict): the input data for the execution
+        distributed_map (bool, optional): set to True if the cluster was
+            deployed with a Distributed Map. The task list is then written
+            to S3, rather than passed in the execution input. Defaults to
+            False.
+        s3_bucket_name (str, optional): the cluster's bucket. Required if
+            distributed_map is True. Defaults to None.
+        dynamic_work_units (bool, optional): set to True if the cluster was
+            deployed with dynamic work units. Each task is then split into
+            one task per simulation. Defaults to False.
+        resume (bool, optional): if True, simulations already completed by
+            earlier executions with the same upload_s3_key are skipped,
+            provided their project has not been uploaded again since. If
+            False every simulation in the task list is run. Defaults to
+            False.
 
     Returns:
         dict: the return value of the boto3 state function client
@@ -25,9 +89,33 @@ def start_execution(
         "stepfunctions", region_name=region_name, verify=False
     )
 
+    if dynamic_work_units:
+        tasks = task_packer.create_work_units(tasks)
+    if resume:
+        tasks = dict(
+            tasks,
+            task_list=[dict(t, resume=True) for t in tasks["task_list"]],
+        )
+    execution_input = tasks
+    if distributed_map:
+        if not s3_bucket_name:
+            raise ValueError("s3_bucket_name required for distributed_map")
+        s3_client = boto3.client("s3", region_name=region_name, verify=False)
+        task_list_key = get_task_list_key(execution_name)
+        s3_client.put_object(
+            Bucket=s3_bucket_name,
+            Key=task_list_key,
+            Body=json.dumps(tasks["task_list"]).encode(),
+            ContentType="application/json",
+        )
+        execution_input = dict(
+            task_list_key=task_list_key,
+            result_prefix=get_result_prefix(execution_name),
+        )
+
     start_execution_response = sfn_client.start_execution(
         stateMachineArn=state_machine_arn,
         name=execution_name,
-        input=json.dumps(tasks),
+        input=json.dumps(execution_input),
     )
     return {str(k): str(v) for k, v in start_execution_response.items()}
@@ -16,6 +16,10 @@ from mypy_boto3_s3.client import S3Client
 from cbm3_aws.aws.names import get_names
 from cbm3_aws.aws.names import get_uuid
 from cbm3_aws import log_helper
+from cbm3_aws.transfer_profile import get_transfer_profile
+from cbm3_aws.aws.task_retry_policy import get_task_retry_policy
+from cbm3_aws.aws.task_retry_policy import get_heartbeat_interval
+from cbm3_aws.aws.cbm3_run_state_machine import CHILD_EXECUTION_LAYOUT
 
 logger = log_helper.get_logger(__name__)
 
@@ -114,6 +118,14 @@ def deploy(
     image_ami_id: str,
     resource_description_path: str,
     vpc_zone_identifier: Union[str, None] = None,
+    transfer_profile: Union[dict, None] = None,
+    distributed_map: bool = False,
+    map_max_concurrency: int = 0,
+    map_max_items_per_batch: int = 1,
+    dynamic_work_units: bool = False,
+    task_retry_policy: Union[dict, None] = None,
+    task_layout: str = CHILD_EXECUTION_LAYOUT,
+    compact_results: bool = False,
 ) -> dict:
     if os.path.exists(resource_description_path):
         raise ValueError(
@@ -131,6 +143,14 @@ def deploy(
     rd["min_virtual_cpu"] = int(min_virtual_cpu)
     rd["max_virtual_cpu"] = int(max_virtual_cpu)
     rd["image_ami_id"] = image_ami_id
+    rd["transfer_profile"] = get_transfer_profile(transfer_profile)
+    rd["distributed_map"] = distributed_map
+    rd["map_max_concurrency"] = int(map_max_concurrency)
+    rd["map_max_items_per_batch"] = int(map_max_items_per_batch)
+    rd["dynamic_work_units"] = dynamic_work_units
+    rd["task_retry_policy"] = get_task_retry_policy(task_retry_policy)
+    rd["task_layout"] = task_layout
+    rd["compact_results"] = compact_results
 
     try:
         logger.info("connecting")
@@ -163,7 +183,10 @@ def deploy(
             names=rd["names"],
         )
         rd["state_machine_policy_context"] = roles.create_state_machine_policy(
-            client=iam_client, account_number=account_number, names=rd["names"]
+            client=iam_client,
+            account_number=account_number,
+            names=rd["names"],
+            s3_bucket_name=s3_bucket_name,
         )
 
         logger.info("creating iam roles")
@@ -194,6 +217,13 @@ def deploy(
             client=sfn_client,
             role_arn=rd["state_machine_role_context"]["role_arn"],
             names=rd["names"],
+            distributed_map=rd["distributed_map"],
+            s3_bucket_name=rd["s3_bucket_name"],
+            map_max_concurrency=rd["map_max_concurrency"],
+            map_max_items_per_batch=rd["map_max_items_per_batch"],
+            task_retry_policy=rd["task_retry_policy"],
+            task_layout=rd["task_layout"],
+            compact_results=rd["compact_results"],
         )
 
         logger.info("creating userdata")
@@ -201,6 +231,14 @@ def deploy(
             s3_bucket_name=rd["s3_bucket_name"],
             activity_arn=rd["state_machine_context"]["activity_arn"],
             region_name=rd["region_name"],
+            transfer_profile=rd["transfer_profile"],
+            auto_scaling_group_name=rd["names"]["autoscale_group"],
+            dynamic_work_units=rd["dynamic_work_units"],
+            heartbeat_interval=get_heartbeat_interval(rd["task_retry_policy"]),
+            compact_results=rd["compact_results"],
+            # the workers stop retrying a failing task after the same
+            # number of attempts as the state machine
+            max_task_attempts=rd["task_retry_policy"]["max_attempts"],
         )
 
         iam_instance_profile_arn = rd["instance_iam_role_context"][
@@ -224,16 +262,16 @@ def deploy(
             )
         logger.info(f"using zones: {availability_zones}")
         logger.info("create autoscaling group")
-        rd[
-            "autoscale_group_context"
-        ] = autoscale_group.create_autoscaling_group(
-            client=auto_scale_client,
-            name=rd["names"]["autoscale_group"],
-            launch_template_context=rd["launch_template_context"],
-            min_size=rd["min_virtual_cpu"] // 8,
-            max_size=rd["max_virtual_cpu"] // 8,
-            availability_zones=availability_zones,
-            vpc_zone_identifier=vpc_zone_identifier,
+        rd["autoscale_group_context"] = (
+            autoscale_group.create_autoscaling_group(
+                client=auto_scale_client,
+                name=rd["names"]["autoscale_group"],
+                launch_template_context=rd["launch_template_context"],
+                min_size=rd["min_virtual_cpu"] // 8,
+                max_size=rd["max_virtual_cpu"] // 8,
+                availability_zones=availability_zones,
+                vpc_zone_identifier=vpc_zone_identifier,
+            )
         )
 
         return rd
@@ -1,4 +1,5 @@
 import json
+from typing import Union
 from mypy_boto3_iam.client import IAMClient
 
 
@@ -57,7 +58,10 @@ def delete_policy(client: IAMClient, policy_context: dict[str, str]):
 
 
 def create_state_machine_policy(
-    client: IAMClient, account_number: str, names: dict[str, str]
+    client: IAMClient,
+    account_number: str,
+    names: dict[str, str],
+    s3_bucket_name: Union[str, None] = None,
 ) -> dict[str, str]:
     """Create a state machine policy to allow state machine function
 
@@ -67,6 +71,10 @@ def create_state_machine_policy(
             resources
         names (dict[str, str]): the names used to label provisioned aws
             resources
+        s3_bucket_name (str, optional): if specified, the state machine is
+            permitted to read task lists from, and write map results to
+            this bucket, as needed by a Distributed Map, and to write the
+            task status records of compact results. Defaults to None.
 
     Returns:
         namespace: object containing the policy ARN
@@ -103,6 +111,19 @@ def create_state_machine_policy(
             },
         ],
     }
+    if s3_bucket_name:
+        policy["Statement"].append(
+            {
+                "Effect": "Allow",
+                "Action": [
+                    "s3:GetObject",
+                    "s3:PutObject",
+                    "s3:ListMultipartUploadParts",
+                    "s3:AbortMultipartUpload",
+                ],
+                "Resource": f"arn:aws:s3:::{s3_bucket_name}/*",
+            }
+        )
     create_policy_response = client.create_policy(
         PolicyName=names["state_machine_policy"],
         Path="/",
@@ -121,9 +142,11 @@ def create_ec2_worker_policy(
     names: dict[str, str],
 ):
     """Create a policy object for:
-        1. permitting put/get/delete operations on the
+        1. permitting put/get/delete/list operations on the
            specified named bucket
         2. interact with activity tasks for the cbm3_aws state machine
+        3. setting scale-in protection on instances in the cbm3_aws
+           autoscaling group
 
     Args:
         client (IAMClient): boto3 IAM client
@@ -175,6 +198,23 @@ def create_ec2_worker_policy(
                     f"arn:aws:logs:*:{account_number}:log-group:cbm3_aws:log-stream:*",  # noqa E501
                 ],
             },
+            {
+                # without list permission, reading a missing key is
+                # reported as access denied rather than as a missing key,
+                # which the task failure records rely on
+                "Sid": "4",
+                "Effect": "Allow",
+                "Action": "s3:ListBucket",
+                "Resource": f"arn:aws:s3:::{s3_bucket_name}",
+            },
+            {
+                "Sid": "5",
+                "Effect": "Allow",
+                "Action": "autoscaling:SetInstanceProtection",
+                "Resource": f"arn:aws:autoscaling:*:{account_number}:"
+                "autoScalingGroup:*:autoScalingGroupName/"
+                f"{names['autoscale_group']}",
+            },
         ],
     }
 
@@ -0,0 +1,222 @@
+import json
+from typing import Iterator
+from typing import Sequence
+from typing import Union
+from cbm3_aws.aws import cbm3_run_state_machine
+from cbm3_aws.aws import cbm3_run_task_state_machine
+from cbm3_aws.aws.task_retry_policy import get_task_retry_policy
+from cbm3_aws.instance.failure_policy import RETRYABLE_TASK_ERROR
+from cbm3_aws.instance.spot_interruption import SPOT_INTERRUPTION_ERROR
+
+# outcomes of the activity task attempts in a benchmark scenario
+SUCCESS = "success"
+TIMEOUT = "timeout"
+RETRYABLE_ERROR = "retryable_error"
+SPOT_INTERRUPTION = "spot_interruption"
+
+_OUTCOME_ERRORS = {
+    SUCCESS: None,
+    TIMEOUT: "States.Timeout",
+    RETRYABLE_ERROR: RETRYABLE_TASK_ERROR,
+    SPOT_INTERRUPTION: SPOT_INTERRUPTION_ERROR,
+}
+
+_START_EXECUTION_SYNC = "arn:aws:states:::states:startExecution.sync"
+
+# placeholder resource names for the benchmarked definitions
+_ACTIVITY_ARN = "activity"
+_TASK_STATE_MACHINE_ARN = "task_state_machine"
+
+
+class _Interpreter:
+    def __init__(
+        self, state_machines: dict[str, dict], outcomes: Sequence[str]
+    ):
+        self.state_machines = state_machines
+        self.outcomes = outcomes
+        self.state_transitions = 0
+        self.child_executions = 0
+
+    def _match(self, rules: list[dict], error: str) -> Union[int, None]:
+        for index, rule in enumerate(rules):
+            error_equals = rule["ErrorEquals"]
+            if error in error_equals or "States.ALL" in error_equals:
+                return index
+        return None
+
+    def _run_task(
+        self, state: dict, outcomes: Iterator[str]
+    ) -> Union[str, None]:
+        if state["Resource"] == _START_EXECUTION_SYNC:
+            self.child_executions += 1
+            child = self.state_machines[state["Parameters"]["StateMachineArn"]]
+            if self.run(child, outcomes, n_items=0):
+                return None
+            return "States.TaskFailed"
+        return _OUTCOME_ERRORS[next(outcomes)]
+
+    def run(
+        self, states_def: dict, outcomes: Iterator[str], n_items: int
+    ) -> bool:
+        """Walk the states, counting each state entered and each retry as
+        a state transition, as Step Functions bills them
+
+        Returns:
+            bool: True if the states succeeded, False if they failed
+        """
+        states = states_def["States"]
+        name = states_def["StartAt"]
+        retries: dict[int, int] = {}
+        while True:
+            state = states[name]
+            self.state_transitions += 1
+            error = None
+            if state["Type"] == "Map":
+                processor = state.get("ItemProcessor", state.get("Iterator"))
+                for _ in range(n_items):
+                    # each item runs the scenario from its first outcome
+                    if not self.run(processor, iter(self.outcomes), 0):
+                        return False
+            elif state["Type"] == "Task":
+                error = self._run_task(state, outcomes)
+            elif state["Type"] == "Succeed":
+                return True
+            elif state["Type"] == "Fail":
+                return False
+
+            if error is None:
+                if state.get("End"):
+                    return True
+                name = state["Next"]
+                retries = {}
+                continue
+            retrier = self._match(state.get("Retry", []), error)
+            if retrier is not None:
+                max_attempts = state["Retry"][retrier].get("MaxAttempts", 3)
+                if retries.get(retrier, 0) < max_attempts:
+                    retries[retrier] = retries.get(retrier, 0) + 1
+                    continue
+            catcher = self._match(state.get("Catch", []), error)
+            if catcher is None:
+                return False
+            name = state["Catch"][catcher]["Next"]
+            retries = {}
+
+
+def count_state_transitions(
+    app_definition: str,
+    task_definition: Union[str, None],
+    outcomes: Sequence[str],
+    n_tasks: int,
+) -> dict:
+    """Count the state transitions of an application state machine
+    execution over an inline Map task list, in which the activity task
+    attempts of every task have the specified outcomes.
+
+    Args:
+        app_definition (str): json application state machine definition
+        task_definition (str): json task state machine definition, or None
+            for the inline task layout
+        outcomes (Sequence[str]): the outcome of each attempt at a task's
+            activity, one of "success", "timeout", "retryable_error" or
+            "spot_interruption", ending with "success" for tasks that
+            finish
+        n_tasks (int): the number of tasks in the task list
+
+    Returns:
+        dict: the "state_transitions" and "child_executions" of the
+            execution, and whether it "succeeded"
+    """
+    state_machines = {}
+    if task_definition:
+        state_machines[_TASK_STATE_MACHINE_ARN] = json.loads(task_definition)
+    interpreter = _Interpreter(state_machines, outcomes)
+    succeeded = interpreter.run(
+        json.loads(app_definition), iter(()), n_items=n_tasks
+    )
+    return dict(
+        state_transitions=interpreter.state_transitions,
+        child_executions=interpreter.child_executions,
+        succeeded=succeeded,
+    )
+
+
+def get_scenarios(task_retry_policy: Union[dict, None] = None) -> dict:
+    """Get the benchmark scenarios: the outcomes of a task's activity
+    attempts, by scenario name
+
+    Args:
+        task_retry_policy (dict, optional): the retry policy, which sets
+            the number of attempts in the "attempts_exhausted" scenario.
+            Defaults to None.
+
+    Returns:
+        dict: the outcomes of each scenario
+    """
+    policy = get_task_retry_policy(task_retry_policy)
+    return {
+        "success": [SUCCESS],
+        "one_timeout": [TIMEOUT, SUCCESS],
+        "one_retryable_error": [RETRYABLE_ERROR, SUCCESS],
+        "spot_interruption": [SPOT_INTERRUPTION, SUCCESS],
+        "attempts_exhausted": [TIMEOUT] * policy["max_attempts"],
+    }
+
+
+def run_benchmark(
+    n_tasks: int = 100, task_retry_policy: Union[dict, None] = None
+) -> list[dict]:
+    """Compare the state transitions per task of the child execution and
+    inline task layouts of the application state machine for each of the
+    scenarios returned by :py:func:`get_scenarios`
+
+    Args:
+        n_tasks (int, optional): the number of tasks in each execution.
+            Defaults to 100.
+        task_retry_policy (dict, optional): the retry policy. Defaults to
+            None.
+
+    Returns:
+        list: a row for each scenario and layout with the
+            "state_transitions_per_task" and "child_executions_per_task"
+    """
+    layouts = {
+        cbm3_run_state_machine.CHILD_EXECUTION_LAYOUT: (
+            cbm3_run_state_machine.get_state_machine(
+                _TASK_STATE_MACHINE_ARN,
+                task_layout=cbm3_run_state_machine.CHILD_EXECUTION_LAYOUT,
+            ),
+            cbm3_run_task_state_machine.get_state_machine(
+                _ACTIVITY_ARN, task_retry_policy
+            ),
+        ),
+        cbm3_run_state_machine.INLINE_LAYOUT: (
+            cbm3_run_state_machine.get_state_machine(
+                None,
+                task_layout=cbm3_run_state_machine.INLINE_LAYOUT,
+                activity_arn=_ACTIVITY_ARN,
+                task_retry_policy=task_retry_policy,
+            ),
+            None,
+        ),
+    }
+    rows = []
+    for scenario, outcomes in get_scenarios(task_retry_policy).items():
+        for layout, (app_definition, task_definition) in layouts.items():
+            result = count_state_transitions(
+                app_definition, task_definition, outcomes, n_tasks
+            )
+            rows.append(
+                dict(
+                    scenario=scenario,
+                    task_layout=layout,
+                    state_transitions_per_task=(
+                        result["state_transitions"] / n_tasks
+                    ),
+                    child_executions_per_task=(
+                        result["child_executions"] / n_tasks
+                    ),
+                    succeeded=result["succeeded"],
+                )
+            )
+    return rows
@@ -1,3 +1,4 @@
+from typing import Union
 from cbm3_aws.aws import cbm3_run_task_state_machine
 from cbm3_aws.aws import cbm3_run_state_machine
 from mypy_boto3_stepfunctions.client import SFNClient
@@ -13,9 +14,15 @@ def _create_task_state_machine(
     worker_activity_resource_arn: str,
     role_arn: str,
     names: dict[str, str],
+    task_retry_policy: Union[dict, None],
+    compact_results: bool,
+    s3_bucket_name: Union[str, None],
 ) -> str:
     state_machine_definition = cbm3_run_task_state_machine.get_state_machine(
-        cbm_run_task_activity_arn=worker_activity_resource_arn
+        cbm_run_task_activity_arn=worker_activity_resource_arn,
+        task_retry_policy=task_retry_policy,
+        compact_results=compact_results,
+        s3_bucket_name=s3_bucket_name,
     )
 
     response = client.create_state_machine(
@@ -30,12 +37,28 @@ def _create_task_state_machine(
 
 def _create_application_state_machine(
     client: SFNClient,
-    task_state_machine_arn: str,
+    task_state_machine_arn: Union[str, None],
     role_arn: str,
     names: dict[str, str],
+    distributed_map: bool,
+    s3_bucket_name: Union[str, None],
+    map_max_concurrency: int,
+    map_max_items_per_batch: int,
+    task_layout: str,
+    activity_arn: str,
+    task_retry_policy: Union[dict, None],
+    compact_results: bool,
 ) -> str:
     state_machine_definition = cbm3_run_state_machine.get_state_machine(
-        task_state_machine_arn=task_state_machine_arn
+        task_state_machine_arn=task_state_machine_arn,
+        distributed_map=distributed_map,
+        s3_bucket_name=s3_bucket_name,
+        map_max_concurrency=map_max_concurrency,
+        map_max_items_per_batch=map_max_items_per_batch,
+        task_layout=task_layout,
+        activity_arn=activity_arn,
+        task_retry_policy=task_retry_policy,
+        compact_results=compact_results,
     )
 
     cbm3_run_state_machine_response = client.create_state_machine(
@@ -49,7 +72,16 @@ def _create_application_state_machine(
 
 
 def create_state_machines(
-    client: SFNClient, role_arn: str, names: dict[str, str]
+    client: SFNClient,
+    role_arn: str,
+    names: dict[str, str],
+    distributed_map: bool = False,
+    s3_bucket_name: Union[str, None] = None,
+    map_max_concurrency: int = 0,
+    map_max_items_per_batch: int = 1,
+    task_retry_policy: Union[dict, None] = None,
+    task_layout: str = cbm3_run_state_machine.CHILD_EXECUTION_LAYOUT,
+    compact_results: bool = False,
 ) -> dict:
     """Create the state machine for running tasks on instances
 
@@ -58,6 +90,28 @@ def create_state_machines(
         role_arn (str): The Amazon Resource Name (ARN) of the IAM
             role to use for this state machine.
         names (dict): the names used to label provisioned aws resources
+        distributed_map (bool, optional): if True the application state
+            machine uses a Distributed Map over a task list stored in S3.
+            Defaults to False.
+        s3_bucket_name (str, optional): the bucket for Distributed Map
+            task lists and results, and for the task status records of
+            compact_results. Defaults to None.
+        map_max_concurrency (int, optional): Distributed Map
+            MaxConcurrency, 0 for no limit. Defaults to 0.
+        map_max_items_per_batch (int, optional): the number of tasks in
+            each Distributed Map child execution. Defaults to 1.
+        task_retry_policy (dict, optional): the task state machine's retry
+            policy, see
+            :py:func:`cbm3_aws.aws.task_retry_policy.get_task_retry_policy`.
+            If None the default policy is used. Defaults to None.
+        task_layout (str, optional): "child_execution" to run each task
+            with an execution of a task state machine, or "inline" to
+            embed the task states in the application state machine, in
+            which case no task state machine is created. Defaults to
+            "child_execution".
+        compact_results (bool, optional): if True task outputs carry only
+            counts and the S3 key of the worker's status record for the
+            task. Defaults to False.
 
     Returns:
         dict: dict containing AWS state machine identifying
@@ -65,17 +119,29 @@ def create_state_machines(
     """
     ctx = {}
     ctx["activity_arn"] = _create_worker_activity(client=client, names=names)
-    ctx["task_state_machine_arn"] = _create_task_state_machine(
-        client=client,
-        worker_activity_resource_arn=ctx["activity_arn"],
-        role_arn=role_arn,
-        names=names,
-    )
+    if task_layout == cbm3_run_state_machine.CHILD_EXECUTION_LAYOUT:
+        ctx["task_state_machine_arn"] = _create_task_state_machine(
+            client=client,
+            worker_activity_resource_arn=ctx["activity_arn"],
+            role_arn=role_arn,
+            names=names,
+            task_retry_policy=task_retry_policy,
+            compact_results=compact_results,
+            s3_bucket_name=s3_bucket_name,
+        )
     ctx["app_state_machine_arn"] = _create_application_state_machine(
         client=client,
-        task_state_machine_arn=ctx["task_state_machine_arn"],
+        task_state_machine_arn=ctx.get("task_state_machine_arn"),
         role_arn=role_arn,
         names=names,
+        distributed_map=distributed_map,
+        s3_bucket_name=s3_bucket_name,
+        map_max_concurrency=map_max_concurrency,
+        map_max_items_per_batch=map_max_items_per_batch,
+        task_layout=task_layout,
+        activity_arn=ctx["activity_arn"],
+        task_retry_policy=task_retry_policy,
+        compact_results=compact_results,
     )
 
     return ctx
@@ -0,0 +1,146 @@
+from typing import Union
+from argparse import ArgumentParser
+from argparse import Namespace
+
+# terminal failure routes: fail the task, which fails the application
+# execution, or finish the task with its error recorded in the output, so
+# the other tasks of the execution carry on
+FAIL = "fail"
+RECORD_ERRORS = "record_errors"
+
+DEFAULT_TASK_RETRY_POLICY = dict(
+    heartbeat_seconds=60,
+    initial_delay_seconds=60,
+    backoff_rate=2.0,
+    max_delay_seconds=900,
+    max_attempts=5,
+    terminal_failure=RECORD_ERRORS,
+)
+
+
+def get_task_retry_policy(policy: Union[dict, None] = None) -> dict:
+    """Gets a complete task retry policy by filling in the values missing
+    from the specified policy with :py:data:`DEFAULT_TASK_RETRY_POLICY`
+
+    The policy controls how the task state machine recovers a task whose
+    worker stopped sending heartbeats or reported a retryable error:
+
+        - heartbeat_seconds: the task's HeartbeatSeconds
+        - initial_delay_seconds: the delay before the first retry
+        - backoff_rate: the multiplier applied to the delay for each
+          subsequent retry
+        - max_delay_seconds: the upper bound on the delay
+        - max_attempts: the total number of attempts at the task
+        - terminal_failure: "fail" to fail the execution once the attempts
+          are exhausted, or "record_errors" to finish the task with the
+          error in its output
+
+    Args:
+        policy (dict, optional): partial or complete policy. Defaults to
+            None.
+
+    Returns:
+        dict: the task retry policy
+    """
+    result = DEFAULT_TASK_RETRY_POLICY.copy()
+    if policy:
+        unknown = set(policy.keys()) - set(result.keys())
+        if unknown:
+            raise ValueError(f"unknown task retry policy keys: {unknown}")
+        result.update(policy)
+    if result["terminal_failure"] not in (FAIL, RECORD_ERRORS):
+        raise ValueError(
+            f"unknown terminal_failure: {result['terminal_failure']}"
+        )
+    if result["max_attempts"] < 1:
+        raise ValueError("max_attempts must be at least 1")
+    if result["heartbeat_seconds"] < 10:
+        raise ValueError("heartbeat_seconds must be at least 10")
+    return result
+
+
+def get_heartbeat_interval(policy: dict) -> float:
+    """Get the interval at which workers send heartbeats for the policy's
+    heartbeat_seconds: half the timeout, less a margin for the latency of
+    the heartbeat calls.
+
+    Args:
+        policy (dict): task retry policy
+
+    Returns:
+        float: seconds between heartbeats
+    """
+    policy = get_task_retry_policy(policy)
+    return max(1.0, policy["heartbeat_seconds"] / 2 - 5)
+
+
+def add_arguments(parser: ArgumentParser) -> None:
+    """Add command line arguments for specifying a task retry policy
+
+    Args:
+        parser (ArgumentParser): the parser to add arguments to
+    """
+    parser.add_argument(
+        "--task_heartbeat_seconds",
+        required=False,
+        type=int,
+        help="seconds without a worker heartbeat after which a task is "
+        "timed out and retried",
+    )
+    parser.add_argument(
+        "--task_retry_initial_delay_seconds",
+        required=False,
+        type=int,
+        help="delay before the first retry of a timed out or failed task",
+    )
+    parser.add_argument(
+        "--task_retry_backoff_rate",
+        required=False,
+        type=float,
+        help="multiplier applied to the retry delay after each retry",
+    )
+    parser.add_argument(
+        "--task_retry_max_delay_seconds",
+        required=False,
+        type=int,
+        help="upper bound on the retry delay",
+    )
+    parser.add_argument(
+        "--task_max_attempts",
+        required=False,
+        type=int,
+        help="total number of attempts at each task",
+    )
+    parser.add_argument(
+        "--task_terminal_failure",
+        required=False,
+        choices=[FAIL, RECORD_ERRORS],
+        help="once a task's attempts are exhausted, either fail the "
+        "execution, or record the error in the task output and carry on",
+    )
+
+
+def from_args(args: Namespace) -> dict:
+    """Get the task retry policy specified by command line arguments added
+    with :py:func:`add_arguments`
+
+    Args:
+        args (Namespace): the parsed arguments
+
+    Returns:
+        dict: the task retry policy
+    """
+    arg_names = dict(
+        heartbeat_seconds="task_heartbeat_seconds",
+        initial_delay_seconds="task_retry_initial_delay_seconds",
+        backoff_rate="task_retry_backoff_rate",
+        max_delay_seconds="task_retry_max_delay_seconds",
+        max_attempts="task_max_attempts",
+        terminal_failure="task_terminal_failure",
+    )
+    policy = {}
+    for key, arg_name in arg_names.items():
+        value = getattr(args, arg_name)
+        if value is not None:
+            policy[key] = value
+    return get_task_retry_policy(policy)
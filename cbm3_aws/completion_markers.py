@@ -0,0 +1,94 @@
+from typing import Union
+from concurrent.futures import ThreadPoolExecutor
+from cbm3_aws.s3_io import S3IO
+
+
+def get_project_etags(
+    s3_io: S3IO, project_codes: list[str], max_workers: int
+) -> dict[str, str]:
+    """Get the S3 ETags of the uploaded projects
+
+    Args:
+        s3_io (S3IO): s3 io for the execution
+        project_codes (list): the projects
+        max_workers (int): maximum number of concurrent S3 requests
+
+    Returns:
+        dict: the ETag of each project code
+    """
+    project_codes = sorted(set(project_codes))
+
+    def get_etag(project_code: str) -> str:
+        return s3_io.get_etag("project", project_code=project_code)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return dict(zip(project_codes, executor.map(get_etag, project_codes)))
+
+
+def get_incomplete_simulations(
+    s3_io: S3IO,
+    simulation_tasks: list[dict],
+    max_workers: int,
+    execution_id: Union[str, None] = None,
+    project_etags: Union[dict[str, str], None] = None,
+) -> list[dict]:
+    """Get the simulations without a completion marker in S3 written by
+    the specified execution
+
+    Args:
+        s3_io (S3IO): s3 io for the execution
+        simulation_tasks (list): the simulations in the task input format
+        max_workers (int): maximum number of concurrent S3 requests
+        execution_id (str, optional): the execution whose markers are
+            counted. Defaults to None.
+        project_etags (dict, optional): if specified, the markers of other
+            executions are also counted when they record the ETag given
+            here for the simulation's project. Defaults to None.
+
+    Returns:
+        list: the incomplete simulations in the task input format, omitting
+            projects with no incomplete simulations
+    """
+    keys = [
+        (x["project_code"], simulation_id)
+        for x in simulation_tasks
+        for simulation_id in x["simulation_ids"]
+    ]
+
+    def is_complete(key: tuple) -> bool:
+        project_code, simulation_id = key
+        marker = s3_io.get_json(
+            "completed", project_code=project_code, simulation_id=simulation_id
+        )
+        if marker is None:
+            return False
+        if marker.get("execution_id") == execution_id:
+            return True
+        # a simulation completed by another execution is complete only if
+        # it ran against the current version of its project
+        return (
+            project_etags is not None
+            and marker.get("project_etag") == project_etags[project_code]
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        completed = set(
+            key
+            for key, complete in zip(keys, executor.map(is_complete, keys))
+            if complete
+        )
+    result = []
+    for x in simulation_tasks:
+        simulation_ids = [
+            simulation_id
+            for simulation_id in x["simulation_ids"]
+            if (x["project_code"], simulation_id) not in completed
+        ]
+        if simulation_ids:
+            result.append(
+                {
+                    "project_code": x["project_code"],
+                    "simulation_ids": simulation_ids,
+                }
+            )
+    return result
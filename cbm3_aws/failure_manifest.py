@@ -0,0 +1,256 @@
+import math
+import time
+from typing import Union
+from concurrent.futures import ThreadPoolExecutor
+from cbm3_aws import task_packer
+from cbm3_aws.s3_io import S3IO
+from cbm3_aws.completion_markers import get_incomplete_simulations
+from cbm3_aws.completion_markers import get_project_etags
+
+
+def create_record(
+    project_code: str,
+    simulation_id: int,
+    task_id: str,
+    error: str,
+    attempts: int,
+    final: bool,
+    instance_id: Union[str, None] = None,
+) -> dict:
+    """Create the failure record of a simulation
+
+    Args:
+        project_code (str): the simulation's project
+        simulation_id (int): the simulation id
+        task_id (str): the task that ran the simulation, see
+            :py:func:`cbm3_aws.instance.failure_policy.get_task_id`
+        error (str): the formatted error
+        attempts (int): the number of failed attempts at the task
+        final (bool): True if the task will not be attempted again
+        instance_id (str, optional): the EC2 instance id. Defaults to None.
+
+    Returns:
+        dict: the record
+    """
+    return dict(
+        project_code=project_code,
+        simulation_id=simulation_id,
+        task_id=task_id,
+        error=error,
+        attempts=attempts,
+        final=final,
+        instance_id=instance_id,
+        failed_time=time.time(),
+    )
+
+
+def write_failures(
+    s3_io: S3IO, records: list[dict], max_workers: int = 4
+) -> None:
+    """Write failure records to the execution's failure manifest in S3,
+    replacing the previous record of each simulation
+
+    Args:
+        s3_io (S3IO): s3 io for the execution
+        records (list): the records created with :py:func:`create_record`
+        max_workers (int, optional): maximum number of concurrent S3
+            requests. Defaults to 4.
+    """
+
+    def put(record: dict) -> None:
+        s3_io.put_json(
+            record,
+            "failures",
+            project_code=record["project_code"],
+            simulation_id=record["simulation_id"],
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        list(executor.map(put, records))
+
+
+def clear_failure(s3_io: S3IO, project_code: str, simulation_id: int) -> None:
+    """Remove a simulation from the failure manifest, once it has completed
+
+    Args:
+        s3_io (S3IO): s3 io for the execution
+        project_code (str): the simulation's project
+        simulation_id (int): the simulation id
+    """
+    s3_io.delete_json(
+        "failures", project_code=project_code, simulation_id=simulation_id
+    )
+
+
+def read_manifest(s3_io: S3IO, max_workers: int = 8) -> list[dict]:
+    """Read the failure records of the simulations of an execution that
+    failed and have not since completed
+
+    Args:
+        s3_io (S3IO): s3 io for the execution
+        max_workers (int, optional): maximum number of concurrent S3
+            requests. Defaults to 8.
+
+    Returns:
+        list: the records, ordered by project code and simulation id
+    """
+    records = s3_io.get_all_json("failures", max_workers=max_workers)
+    return sorted(
+        records, key=lambda r: (r["project_code"], r["simulation_id"])
+    )
+
+
+def get_failed_simulations(records: list[dict]) -> list[dict]:
+    """Get the simulations of failure records
+
+    Args:
+        records (list): the failure records returned by
+            :py:func:`read_manifest`
+
+    Returns:
+        list: dicts with the "project_code" and "simulation_id" of each
+            failed simulation, as accepted by
+            :py:func:`cbm3_aws.task_packer.pack`
+    """
+    return [
+        dict(project_code=r["project_code"], simulation_id=r["simulation_id"])
+        for r in records
+    ]
+
+
+def get_unfinished_simulations(
+    s3_io: S3IO, task_list: list[dict], max_workers: int = 8
+) -> list[dict]:
+    """Get the simulations of an execution's tasks that have no completion
+    marker for the current version of their project.
+
+    Unlike the failure manifest, this includes the simulations of tasks
+    that timed out on every attempt, or that never ran because the
+    execution was stopped.
+
+    Args:
+        s3_io (S3IO): s3 io for the execution
+        task_list (list): the execution's tasks, each with a "simulations"
+            list in the task input format
+        max_workers (int, optional): maximum number of concurrent S3
+            requests. Defaults to 8.
+
+    Returns:
+        list: dicts with the "project_code" and "simulation_id" of each
+            unfinished simulation, as accepted by
+            :py:func:`cbm3_aws.task_packer.pack`
+    """
+    simulation_ids: dict[str, list] = {}
+    for task in task_list:
+        for x in task["simulations"]:
+            simulation_ids.setdefault(x["project_code"], []).extend(
+                x["simulation_ids"]
+            )
+    simulation_tasks = [
+        dict(project_code=project_code, simulation_ids=ids)
+        for project_code, ids in simulation_ids.items()
+    ]
+    incomplete = get_incomplete_simulations(
+        s3_io,
+        simulation_tasks,
+        max_workers,
+        project_etags=get_project_etags(
+            s3_io, list(simulation_ids.keys()), max_workers
+        ),
+    )
+    return [
+        dict(project_code=x["project_code"], simulation_id=simulation_id)
+        for x in incomplete
+        for simulation_id in x["simulation_ids"]
+    ]
+
+
+def get_rerun_simulations(
+    s3_io: S3IO,
+    records: list[dict],
+    task_list: Union[list[dict], None] = None,
+    max_workers: int = 8,
+) -> list[dict]:
+    """Get the simulations of a finished execution to rerun: the failed
+    simulations of the failure manifest and, if the execution's tasks are
+    specified, the simulations with neither a failure record nor a
+    completion marker, which belong to tasks that timed out on every
+    attempt or never ran.
+
+    Args:
+        s3_io (S3IO): s3 io for the execution
+        records (list): the failure records returned by
+            :py:func:`read_manifest`
+        task_list (list, optional): the execution's tasks. If None only the
+            failure manifest's simulations are returned. Defaults to None.
+        max_workers (int, optional): maximum number of concurrent S3
+            requests. Defaults to 8.
+
+    Returns:
+        list: dicts with the "project_code" and "simulation_id" of each
+            simulation to rerun, as accepted by
+            :py:func:`cbm3_aws.task_packer.pack`
+    """
+    simulations = get_failed_simulations(records)
+    if not task_list:
+        return simulations
+    failed = set((x["project_code"], x["simulation_id"]) for x in simulations)
+    # only the simulations without a failure record need a marker check
+    unreported_tasks = [
+        dict(
+            simulations=[
+                dict(
+                    project_code=x["project_code"],
+                    simulation_ids=[
+                        simulation_id
+                        for simulation_id in x["simulation_ids"]
+                        if (x["project_code"], simulation_id) not in failed
+                    ],
+                )
+                for x in task["simulations"]
+            ]
+        )
+        for task in task_list
+    ]
+    return simulations + get_unfinished_simulations(
+        s3_io, unreported_tasks, max_workers
+    )
+
+
+def create_rerun_tasks(
+    simulations: list[dict],
+    upload_s3_key: str,
+    max_concurrency: int = 8,
+    n_tasks: Union[int, None] = None,
+    target_task_runtime: Union[float, None] = None,
+) -> dict:
+    """Repack failed simulations into a task list for a new execution
+
+    Args:
+        simulations (list): the failed simulations, see
+            :py:func:`get_failed_simulations`, optionally with "runtime"
+            estimates
+        upload_s3_key (str): the execution s3 key prefix under which the
+            projects and resources were uploaded
+        max_concurrency (int, optional): the number of simulations a worker
+            runs at once. Defaults to 8.
+        n_tasks (int, optional): the number of tasks. If neither n_tasks
+            nor target_task_runtime is specified, each task has about
+            max_concurrency simulations. Defaults to None.
+        target_task_runtime (float, optional): the desired task duration.
+            Defaults to None.
+
+    Returns:
+        dict: the tasks, with a "task_list" key
+    """
+    if not simulations:
+        return {"task_list": []}
+    if n_tasks is None and target_task_runtime is None:
+        n_tasks = math.ceil(len(simulations) / max_concurrency)
+    return task_packer.pack(
+        simulations=simulations,
+        upload_s3_key=upload_s3_key,
+        max_concurrency=max_concurrency,
+        n_tasks=n_tasks,
+        target_task_runtime=target_task_runtime,
+    )
@@ -0,0 +1,69 @@
+import os
+import time
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock(object):
+    """Exclusive inter-process lock backed by a file on disk.
+
+    Used to coordinate the worker processes launched on a single instance,
+    which do not share memory.
+
+        Example::
+
+            with FileLock("path/to/resource.lock"):
+                # only one process at a time runs this block
+                ...
+
+    Args:
+        path (str): path to the lock file. It is created if it does not
+            exist and is never deleted.
+        poll_interval (float, optional): seconds to wait between attempts
+            to acquire the lock on platforms that do not support blocking
+            locks. Defaults to 0.1.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.1):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._file = None
+
+    def acquire(self) -> None:
+        lock_dir = os.path.dirname(self.path)
+        if lock_dir and not os.path.exists(lock_dir):
+            os.makedirs(lock_dir, exist_ok=True)
+        self._file = open(self.path, "a+b")
+        if os.name == "nt":
+            self._file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                    return
+                except OSError:
+                    time.sleep(self.poll_interval)
+        else:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+
+    def release(self) -> None:
+        if self._file is None:
+            return
+        try:
+            if os.name == "nt":
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
@@ -0,0 +1,156 @@
+import time
+import random
+import datetime
+from logging import Logger
+from typing import Callable
+from typing import Union
+from botocore.exceptions import ClientError
+from botocore.exceptions import ConnectionError as BotoConnectionError
+from botocore.exceptions import ReadTimeoutError
+from cbm3_aws.instance import metrics
+
+# error codes returned by the step functions API that indicate a transient
+# condition, which is handled by backing off and polling again
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException",
+    "Throttling",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "ServiceUnavailable",
+    "InternalFailure",
+    "InternalServerError",
+}
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (BotoConnectionError, ReadTimeoutError)):
+        return True
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code")
+        return code in RETRYABLE_ERROR_CODES
+    return False
+
+
+def get_entered_time(task_input: dict) -> Union[datetime.datetime, None]:
+    """Get the time at which the activity task was scheduled by the task
+    state machine, if it is present in the task input.
+
+    Args:
+        task_input (dict): the parsed activity task input
+
+    Returns:
+        datetime.datetime: the timezone aware scheduled time or None
+    """
+    entered_time = task_input.get("EnteredTime")
+    if not entered_time:
+        return None
+    return datetime.datetime.fromisoformat(entered_time.replace("Z", "+00:00"))
+
+
+class ActivityPoller:
+    """Long polls a step functions activity for tasks.
+
+    A new long poll is started immediately whenever a poll returns without
+    a task, so that a queued task is picked up as soon as a worker is
+    free. Only API errors such as throttling or connection failures cause
+    the poller to wait, using exponential backoff with full jitter.
+
+    Args:
+        client (SFNClient): step functions client configured with a read
+            timeout longer than the 60 second activity long poll
+        activity_arn (str): the resource name of the activity to poll
+        logger (Logger): the worker's logger, used to publish metrics
+        worker_name (str, optional): name reported to step functions for
+            the worker. Defaults to None.
+        initial_backoff (float, optional): the backoff ceiling in seconds
+            after the first consecutive error. Defaults to 1.
+        max_backoff (float, optional): the largest backoff ceiling in
+            seconds. Defaults to 60.
+        sleep_func (Callable, optional): function used to wait. Defaults
+            to time.sleep.
+    """
+
+    def __init__(
+        self,
+        client,
+        activity_arn: str,
+        logger: Logger,
+        worker_name: Union[str, None] = None,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        sleep_func: Callable[[float], None] = time.sleep,
+    ):
+        self.client = client
+        self.activity_arn = activity_arn
+        self.logger = logger
+        self.worker_name = worker_name
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.sleep_func = sleep_func
+
+    def _get_backoff(self, n_errors: int) -> float:
+        ceiling = min(
+            self.max_backoff, self.initial_backoff * 2 ** (n_errors - 1)
+        )
+        return random.uniform(0, ceiling)
+
+    def _get_activity_task(self) -> dict:
+        kwargs = dict(activityArn=self.activity_arn)
+        if self.worker_name:
+            kwargs["workerName"] = self.worker_name
+        return self.client.get_activity_task(**kwargs)
+
+    def poll(self) -> dict:
+        """Poll until a task is available.
+
+        Returns:
+            dict: the get_activity_task response, which is guaranteed to
+                contain a task token
+        """
+        start_time = time.time()
+        n_empty_polls = 0
+        n_errors = 0
+        while True:
+            try:
+                response = self._get_activity_task()
+            except Exception as error:
+                if not _is_retryable(error):
+                    raise
+                n_errors += 1
+                backoff = self._get_backoff(n_errors)
+                self.logger.info(
+                    "get_activity_task failed, retrying in "
+                    f"{backoff:.1f}s: {error}"
+                )
+                metrics.put_metric(self.logger, "PollErrors", 1)
+                self.sleep_func(backoff)
+                continue
+            n_errors = 0
+            if response.get("taskToken"):
+                break
+            # the long poll timed out with no task available
+            n_empty_polls += 1
+
+        metrics.put_metric(
+            self.logger, "PollWaitTime", time.time() - start_time, "Seconds"
+        )
+        metrics.put_metric(self.logger, "EmptyPolls", n_empty_polls)
+        return response
+
+    def record_pickup(self, task_input: dict) -> None:
+        """Publish the time between the task being scheduled by the task
+        state machine and it being received by this worker.
+
+        Args:
+            task_input (dict): the parsed activity task input
+        """
+        entered_time = get_entered_time(task_input)
+        if entered_time is None:
+            return
+        latency = (
+            datetime.datetime.now(datetime.timezone.utc) - entered_time
+        ).total_seconds()
+        self.logger.info(f"task pickup latency {latency:.1f}s")
+        metrics.put_metric(
+            self.logger, "TaskPickupLatency", max(latency, 0.0), "Seconds"
+        )
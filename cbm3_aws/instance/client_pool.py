@@ -0,0 +1,89 @@
+from threading import Lock
+from typing import Union
+import boto3
+from botocore.client import Config
+
+
+class ClientPool:
+    """Creates boto3 clients and resources from a single shared session,
+    and caches them so that the same clients, along with their connection
+    pools, are reused for the lifetime of the worker process rather than
+    being rebuilt for each task.
+
+    boto3 clients are thread safe, and so the clients returned by this
+    class may be shared by the worker's heartbeat, transfer and upload
+    threads.
+
+    Args:
+        region_name (str): AWS region name
+        max_pool_connections (int, optional): the maximum number of
+            connections each client keeps in its connection pool.
+            Defaults to 10.
+    """
+
+    def __init__(self, region_name: str, max_pool_connections: int = 10):
+        self.region_name = region_name
+        self.max_pool_connections = max_pool_connections
+        self.session = boto3.session.Session(region_name=region_name)
+        self._lock = Lock()
+        self._clients = {}
+        self._resources = {}
+
+    def _get_config(
+        self,
+        connect_timeout: Union[float, None],
+        read_timeout: Union[float, None],
+    ) -> Config:
+        kwargs = dict(max_pool_connections=self.max_pool_connections)
+        if connect_timeout is not None:
+            kwargs["connect_timeout"] = connect_timeout
+        if read_timeout is not None:
+            kwargs["read_timeout"] = read_timeout
+        return Config(**kwargs)
+
+    def client(
+        self,
+        service_name: str,
+        connect_timeout: Union[float, None] = None,
+        read_timeout: Union[float, None] = None,
+    ):
+        """Get the pooled client for the specified service and timeouts,
+        creating it on first use.
+
+        Args:
+            service_name (str): the boto3 service name, for example
+                "stepfunctions"
+            connect_timeout (float, optional): connection timeout in
+                seconds. If None the botocore default is used. Defaults to
+                None.
+            read_timeout (float, optional): read timeout in seconds. If
+                None the botocore default is used. Defaults to None.
+
+        Returns:
+            object: the boto3 client
+        """
+        key = (service_name, connect_timeout, read_timeout)
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = self.session.client(
+                    service_name,
+                    config=self._get_config(connect_timeout, read_timeout),
+                )
+            return self._clients[key]
+
+    def resource(self, service_name: str):
+        """Get the pooled resource for the specified service, creating it on
+        first use.
+
+        Args:
+            service_name (str): the boto3 service name, for example "s3"
+
+        Returns:
+            object: the boto3 service resource
+        """
+        with self._lock:
+            if service_name not in self._resources:
+                self._resources[service_name] = self.session.resource(
+                    service_name, config=self._get_config(None, None)
+                )
+            return self._resources[service_name]
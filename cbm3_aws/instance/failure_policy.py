@@ -0,0 +1,135 @@
+import json
+import hashlib
+from typing import Union
+from botocore.exceptions import ClientError
+from cbm3_aws.instance.activity_poller import RETRYABLE_ERROR_CODES
+
+# error name reported to the task state machine with send_task_failure
+# for a retryable failure. The state machine catches this error and
+# restarts the task after a delay.
+RETRYABLE_TASK_ERROR = "cbm3_aws.RetryableTaskError"
+
+# decisions returned by FailurePolicy.classify
+RETRY = "retry"
+QUARANTINE = "quarantine"
+
+# exception types indicating a problem with the task itself, which will
+# fail again on every attempt
+DEFAULT_PERMANENT_EXCEPTIONS = (
+    ValueError,
+    KeyError,
+    TypeError,
+    NotImplementedError,
+)
+
+# S3 and other AWS error codes indicating the task refers to missing or
+# inaccessible data
+DEFAULT_PERMANENT_ERROR_CODES = {
+    "AccessDenied",
+    "NoSuchKey",
+    "NoSuchBucket",
+    "404",
+    "403",
+}
+
+
+class SimulationsFailed(Exception):
+    """Raised when some of a task's simulations failed. The results of the
+    task's other simulations were uploaded, so another attempt at the task
+    only runs the failed simulations.
+
+    Args:
+        failures (list): dicts with the "project_code", "simulation_id"
+            and formatted "error" of each failed simulation
+    """
+
+    def __init__(self, failures: list[dict]):
+        super().__init__(
+            f"{len(failures)} simulations failed: "
+            + ", ".join(
+                f'{f["project_code"]}_{f["simulation_id"]}' for f in failures
+            )
+        )
+        self.failures = failures
+
+
+def get_task_id(
+    task_input: dict, execution_id: Union[str, None] = None
+) -> str:
+    """Get an identifier for a task that is the same for every attempt at
+    the task.
+
+    Args:
+        task_input (dict): the task input, with the "upload_s3_key" and
+            "simulations" entries
+        execution_id (str, optional): if specified, the identifier is also
+            specific to this state machine execution, so that another
+            execution of the same task has a different identifier.
+            Defaults to None.
+
+    Returns:
+        str: the task identifier
+    """
+    token = task_input["simulations"]
+    if execution_id is not None:
+        token = [execution_id, token]
+    return hashlib.sha1(json.dumps(token, sort_keys=True).encode()).hexdigest()
+
+
+class FailurePolicy:
+    """Decides whether a failed task is retried or quarantined.
+
+    Permanent errors, such as malformed task input or missing data, are
+    quarantined immediately. All other errors are retried until the task
+    has failed max_attempts times, after which the task is treated as a
+    poison task and quarantined.
+
+    Args:
+        max_attempts (int, optional): the maximum number of attempts at a
+            task. Defaults to 3.
+        permanent_exceptions (tuple, optional): exception types that are
+            never retried. Defaults to DEFAULT_PERMANENT_EXCEPTIONS.
+        permanent_error_codes (set, optional): AWS error codes that are
+            never retried. Defaults to DEFAULT_PERMANENT_ERROR_CODES.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        permanent_exceptions: tuple = DEFAULT_PERMANENT_EXCEPTIONS,
+        permanent_error_codes: set = DEFAULT_PERMANENT_ERROR_CODES,
+    ):
+        self.max_attempts = max_attempts
+        self.permanent_exceptions = permanent_exceptions
+        self.permanent_error_codes = permanent_error_codes
+
+    def is_retryable(self, error: BaseException) -> bool:
+        """Returns true if the error could succeed on another attempt
+
+        Args:
+            error (BaseException): the error raised by the task
+
+        Returns:
+            bool: True if the error is retryable, False if it is permanent
+        """
+        if isinstance(error, ClientError):
+            code = error.response.get("Error", {}).get("Code")
+            if code in RETRYABLE_ERROR_CODES:
+                return True
+            return code not in self.permanent_error_codes
+        return not isinstance(error, self.permanent_exceptions)
+
+    def classify(self, error: BaseException, attempts: int) -> str:
+        """Decide what to do with a failed task
+
+        Args:
+            error (BaseException): the error raised by the task
+            attempts (int): the number of attempts at the task so far,
+                including the failed attempt
+
+        Returns:
+            str: either :py:data:`RETRY` or :py:data:`QUARANTINE`
+        """
+        if self.is_retryable(error) and attempts < self.max_attempts:
+            return RETRY
+        return QUARANTINE
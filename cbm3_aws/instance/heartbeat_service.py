@@ -0,0 +1,181 @@
+import time
+import heapq
+import random
+import itertools
+from logging import Logger
+from threading import Condition
+from threading import Event
+from threading import Thread
+from typing import Callable
+from typing import Union
+from botocore.exceptions import ClientError
+from cbm3_aws.instance.metrics import put_metric
+
+# send_task_heartbeat error codes meaning the task token can no longer be
+# used, for example because the task timed out or its execution was
+# stopped
+CANCELLED_ERROR_CODES = {"TaskTimedOut", "TaskDoesNotExist", "InvalidToken"}
+
+
+class TaskCancelled(Exception):
+    """Raised when a task is abandoned because its task token was
+    cancelled or timed out.
+    """
+
+    pass
+
+
+class HeartbeatService(Thread):
+    """Daemon thread that sends the heartbeats of all of the task tokens
+    held by a worker process.
+
+    Each registered token is sent a heartbeat every interval seconds. The
+    first heartbeat of each token is scheduled at a random time within the
+    interval, and consecutive calls are separated by at least
+    min_call_spacing seconds, so that the calls for many tokens are spread
+    out rather than sent in bursts. The latency of each call is published
+    as the HeartbeatLatency metric.
+
+    When a heartbeat fails because the token is no longer valid, the
+    token is unregistered and the event returned by :py:func:`register`
+    for the token is set, so that the task holding it can stop.
+
+    Args:
+        client (SFNClient): boto3 step functions client
+        logger (Logger): the worker's logger
+        interval (float, optional): seconds between the heartbeats of each
+            token. Must be less than the task state's HeartbeatSeconds.
+            Defaults to 25.
+        min_call_spacing (float, optional): minimum seconds between
+            consecutive heartbeat calls. Defaults to 0.2.
+        clock (Callable, optional): monotonic clock returning seconds.
+            Defaults to time.monotonic.
+    """
+
+    def __init__(
+        self,
+        client,
+        logger: Logger,
+        interval: float = 25.0,
+        min_call_spacing: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        Thread.__init__(self, daemon=True)
+        self.client = client
+        self.logger = logger
+        self.interval = interval
+        self.min_call_spacing = min_call_spacing
+        self.clock = clock
+        self._condition = Condition()
+        self._tokens: dict[str, Event] = {}
+        self._schedule: list = []
+        self._sequence = itertools.count()
+        self._stopped = False
+
+    def _push(self, due_time: float, task_token: str) -> None:
+        heapq.heappush(
+            self._schedule, (due_time, next(self._sequence), task_token)
+        )
+
+    def register(self, task_token: str) -> Event:
+        """Start sending heartbeats for a task token
+
+        Args:
+            task_token (str): the token of a task held by the worker
+
+        Returns:
+            Event: event that is set if the token is cancelled or timed out
+        """
+        cancelled = Event()
+        with self._condition:
+            self._tokens[task_token] = cancelled
+            self._push(
+                self.clock() + random.uniform(0, self.interval), task_token
+            )
+            self._condition.notify()
+        return cancelled
+
+    def unregister(self, task_token: str) -> None:
+        """Stop sending heartbeats for a task token
+
+        Args:
+            task_token (str): a registered task token
+        """
+        with self._condition:
+            self._tokens.pop(task_token, None)
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def _wait_for_due_token(self) -> Union[str, None]:
+        with self._condition:
+            while not self._stopped:
+                while self._schedule and (
+                    self._schedule[0][2] not in self._tokens
+                ):
+                    # the token was unregistered
+                    heapq.heappop(self._schedule)
+                if not self._schedule:
+                    self._condition.wait()
+                    continue
+                wait_time = self._schedule[0][0] - self.clock()
+                if wait_time > 0:
+                    self._condition.wait(wait_time)
+                    continue
+                return heapq.heappop(self._schedule)[2]
+            return None
+
+    def _cancel(self, task_token: str, error_code: str) -> None:
+        with self._condition:
+            cancelled = self._tokens.pop(task_token, None)
+        if cancelled is None:
+            return
+        self.logger.warning(
+            dict(task_cancelled=error_code, task_token=task_token)
+        )
+        put_metric(
+            self.logger,
+            "TaskCancelled",
+            1,
+            dimensions={"ErrorCode": error_code},
+        )
+        cancelled.set()
+
+    def _send(self, task_token: str) -> None:
+        start_time = self.clock()
+        try:
+            self.client.send_task_heartbeat(taskToken=task_token)
+        except ClientError as error:
+            error_code = error.response.get("Error", {}).get("Code")
+            if error_code in CANCELLED_ERROR_CODES:
+                self._cancel(task_token, error_code)
+                return
+            self.logger.exception("send_task_heartbeat failed")
+            put_metric(self.logger, "HeartbeatErrors", 1)
+        except Exception:
+            # connection errors are retried at the next interval
+            self.logger.exception("send_task_heartbeat failed")
+            put_metric(self.logger, "HeartbeatErrors", 1)
+        else:
+            put_metric(
+                self.logger,
+                "HeartbeatLatency",
+                (self.clock() - start_time) * 1000,
+                unit="Milliseconds",
+            )
+        with self._condition:
+            if task_token in self._tokens:
+                self._push(self.clock() + self.interval, task_token)
+
+    def run(self) -> None:
+        while True:
+            task_token = self._wait_for_due_token()
+            if task_token is None:
+                return
+            self._send(task_token)
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._stopped, self.min_call_spacing
+                )
@@ -1,8 +1,29 @@
 import os
+import time
 import shutil
+import traceback
 from logging import Logger
+from typing import Callable
 from typing import Iterator
+from typing import Union
+from threading import BoundedSemaphore
+from threading import Event
+from typing import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
 from cbm3_aws.s3_io import S3IO
+from cbm3_aws import runtime_history
+from cbm3_aws import failure_manifest
+from cbm3_aws.completion_markers import get_incomplete_simulations
+from cbm3_aws.completion_markers import get_project_etags
+from cbm3_aws.instance.failure_policy import get_task_id
+from cbm3_aws.instance.failure_policy import SimulationsFailed
+from cbm3_aws.instance.process_monitor import run_monitored
+from cbm3_aws.instance.process_monitor import ProcessCancelled
+from cbm3_aws.instance.metrics import put_metric
+from cbm3_aws.instance.spot_interruption import TaskInterrupted
+from cbm3_aws.instance.simulation_slots import TaskSlots
+from cbm3_aws.instance.heartbeat_service import TaskCancelled
 from cbm3_python.simulation import projectsimulator
 
 
@@ -12,8 +33,29 @@ def run_tasks(
     s3_io: S3IO,
     logger: Logger,
     max_concurrency: int,
+    upload_workers: int = 0,
+    max_pending_uploads: int = 2,
+    download_concurrency: int = 1,
+    instance_id: Union[str, None] = None,
+    interrupted: Union[Event, None] = None,
+    simulation_slots: Union[TaskSlots, None] = None,
+    cancelled: Union[Event, None] = None,
+    execution_id: Union[str, None] = None,
+    resume: bool = False,
 ) -> None:
-    """Runs a CBM3 project simulation task
+    """Runs a CBM3 project simulation task.
+
+    A completion marker is written to S3 once both of a simulation's
+    results and tempfiles archives are uploaded. Simulations with a marker
+    written by an earlier attempt in the same execution are skipped, so
+    that a retried task only runs the simulations that are missing. The
+    markers of other executions are ignored unless resume is True, in which
+    case simulations whose marker records the project's current ETag are
+    also skipped.
+
+    A simulation that fails does not stop the task's other simulations,
+    whose results are uploaded before :py:class:`SimulationsFailed` is
+    raised with the failures.
 
         :: Example simulation_tasks
 
@@ -33,63 +75,136 @@ def run_tasks(
         logger (logging.Logger): logger for this EC2 instance
         max_concurrency (int): maximum number of concurrent CBM simulations
             spawned by this process
+        upload_workers (int, optional): if greater than 0, the results of
+            each simulation are uploaded on this number of background
+            threads as soon as the simulation finishes, while the remaining
+            simulations run. If 0, all results are uploaded after all
+            simulations finish. Defaults to 0.
+        max_pending_uploads (int, optional): the maximum number of
+            finished simulations queued for upload or uploading when
+            upload_workers is greater than 0. A finished simulation waits
+            for a place in the queue before its thread starts another
+            simulation, which bounds the disk used by the task's results.
+            Defaults to 2.
+        download_concurrency (int, optional): the maximum number of
+            resources and projects fetched at once at the start of the
+            task. Defaults to 1.
+        instance_id (str, optional): the EC2 instance id, recorded in the
+            runtime history. Defaults to None.
+        interrupted (Event, optional): event set when the instance is about
+            to be interrupted. When set, no further simulations are
+            started, running simulations are killed and the results of
+            finished simulations are uploaded. Defaults to None.
+        simulation_slots (TaskSlots, optional): this task's share of the
+            simulation slots of a worker holding several tasks at once.
+            Each simulation occupies a slot while it runs. Defaults to
+            None.
+        cancelled (Event, optional): event set when the task's token is
+            cancelled, for example because the execution was stopped. When
+            set, running simulations are killed, pending uploads are
+            skipped and the working directory is removed. Defaults to None.
+        execution_id (str, optional): the state machine execution running
+            the task, which scopes the completion markers. Defaults to
+            None.
+        resume (bool, optional): if True, also skip simulations completed
+            by other executions against unchanged projects. Defaults to
+            False.
+
+    Raises:
+        TaskInterrupted: interrupted was set before all simulations
+            finished. The exception holds the unfinished simulations.
+        TaskCancelled: cancelled was set before the task finished
+        SimulationsFailed: one or more of the simulations failed
     """
+    cancel_events = [e for e in (interrupted, cancelled) if e is not None]
+    _raise_if_cancelled(cancelled, local_working_dir)
+    if interrupted and interrupted.is_set():
+        raise TaskInterrupted(simulation_tasks)
 
-    # download resources
-    logger.info("download resources")
-    toolbox_env_path = os.path.join(local_working_dir, "toolbox_env")
-    s3_io.download(
-        local_path=toolbox_env_path,
-        s3_key="resource",
-        resource_name="toolbox_env",
+    # identifies the task by all of its simulations, so that it is the
+    # same for every attempt
+    task_id = get_task_id({"simulations": simulation_tasks})
+    n_simulations = sum(len(x["simulation_ids"]) for x in simulation_tasks)
+    project_etags = get_project_etags(
+        s3_io,
+        [x["project_code"] for x in simulation_tasks],
+        download_concurrency,
     )
-
-    archive_index_path = os.path.join(local_working_dir, "archive_index.mdb")
-    s3_io.download(
-        local_path=archive_index_path,
-        s3_key="resource",
-        resource_name="archive_index_database",
+    simulation_tasks = get_incomplete_simulations(
+        s3_io,
+        simulation_tasks,
+        download_concurrency,
+        execution_id=execution_id,
+        project_etags=project_etags if resume else None,
     )
-
-    cbm_executables_dir = os.path.join(local_working_dir, "cbm_executables")
-    s3_io.download(
-        local_path=cbm_executables_dir,
-        s3_key="resource",
-        resource_name="cbm_executables",
+    n_skipped = n_simulations - sum(
+        len(x["simulation_ids"]) for x in simulation_tasks
     )
+    if n_skipped:
+        logger.info(f"skipping {n_skipped} completed simulations")
+        put_metric(logger, "SkippedSimulations", n_skipped)
+    if not simulation_tasks:
+        logger.info("all simulations in the task are already complete")
+        return
 
-    stand_recovery_rules_dir = os.path.join(
-        local_working_dir, "stand_recovery_rules"
+    # download resources and projects, or fetch them from the instance
+    # caches if the s3_io object is configured with them. Up to
+    # download_concurrency items are fetched at once.
+    logger.info("download resources and projects")
+    local_project_dir = os.path.join(local_working_dir, "projects")
+    if not os.path.exists(local_project_dir):
+        os.makedirs(local_project_dir)
+    required_projects = sorted(
+        set([x["project_code"] for x in simulation_tasks])
     )
-    s3_io.download(
-        local_path=stand_recovery_rules_dir,
-        s3_key="resource",
-        resource_name="stand_recovery_rules",
+    resource_names = [
+        ("toolbox_env", "toolbox_env"),
+        ("archive_index_database", "archive_index.mdb"),
+        ("cbm_executables", "cbm_executables"),
+        ("stand_recovery_rules", "stand_recovery_rules"),
+    ]
+    downloads = [
+        dict(
+            local_path=os.path.join(local_working_dir, local_name),
+            s3_key="resource",
+            resource_name=resource_name,
+        )
+        for resource_name, local_name in resource_names
+    ] + [
+        dict(
+            local_path=os.path.join(local_project_dir, f"{project_code}.mdb"),
+            s3_key="project",
+            project_code=project_code,
+        )
+        for project_code in required_projects
+    ]
+    download_start_time = time.time()
+    bytes_downloaded = s3_io.s3_interface.bytes_downloaded
+    local_paths = prefetch(s3_io, downloads, download_concurrency, logger)
+    download_stats = dict(
+        task_download_bytes=(
+            s3_io.s3_interface.bytes_downloaded - bytes_downloaded
+        ),
+        task_download_seconds=time.time() - download_start_time,
     )
+    _raise_if_cancelled(cancelled, local_working_dir)
+    if interrupted and interrupted.is_set():
+        raise TaskInterrupted(simulation_tasks)
+
+    n_resources = len(resource_names)
+    (
+        toolbox_env_path,
+        archive_index_path,
+        cbm_executables_dir,
+        stand_recovery_rules_dir,
+    ) = local_paths[:n_resources]
     disturbance_rules_path = os.path.join(
         stand_recovery_rules_dir, "99a_disturbance_rules.csv"
     )
     disturbance_classes_path = os.path.join(
         stand_recovery_rules_dir, "99b_disturbance_classes.csv"
     )
-
-    logger.info("download projects")
-    # download projects
-    local_project_dir = os.path.join(local_working_dir, "projects")
-    if not os.path.exists(local_project_dir):
-        os.makedirs(local_project_dir)
-    required_projects = set([x["project_code"] for x in simulation_tasks])
-    local_projects = {}
-    for project_code in required_projects:
-        local_project_path = os.path.join(
-            local_project_dir, f"{project_code}.mdb"
-        )
-        s3_io.download(
-            local_path=local_project_path,
-            s3_key="project",
-            project_code=project_code,
-        )
-        local_projects[project_code] = local_project_path
+    local_projects = dict(zip(required_projects, local_paths[n_resources:]))
 
     local_results_dir = os.path.join(local_working_dir, "results")
     if not os.path.exists(local_results_dir):
@@ -100,6 +215,12 @@ def run_tasks(
     tasks = list(
         iterate_tasks(simulation_tasks, local_projects, local_results_dir)
     )
+    # recorded in each simulation's completion marker
+    for task in tasks:
+        task["execution_id"] = execution_id
+        task["project_etag"] = project_etags[task["project_code"]]
+    if simulation_slots:
+        simulation_slots.set_pending(len(tasks))
 
     for task in tasks:
         os.makedirs(os.path.dirname(task["results_database_path"]))
@@ -121,47 +242,381 @@ def run_tasks(
 
     logger.info("starting CBM3 simulations")
     logger.info(dict(tasks=args_list))
-    # max_workers=1 here since this script is currently run as one of many
-    # duplicate processes.  If we add further conncurrency here it will
-    # make the worker too busy.
-    list(
-        projectsimulator.run_concurrent(
-            args_list, toolbox_env_path, max_workers=max_concurrency
+    runtime_records = []
+    failures: list[dict] = []
+
+    def create_record(task: dict, run_stats: dict) -> dict:
+        record = runtime_history.create_record(
+            execution=s3_io.execution_s3_key_prefix,
+            task_id=task_id,
+            instance_id=instance_id,
+            project_code=task["project_code"],
+            simulation_id=task["simulation_id"],
+            succeeded=True,
+            **run_stats,
+            **download_stats,
         )
-    )
-    logger.info("CBM3 simulations finished")
+        runtime_records.append(record)
+        return record
+
+    try:
+        if upload_workers > 0:
+            _run_pipelined(
+                tasks,
+                args_list,
+                toolbox_env_path,
+                s3_io,
+                logger,
+                max_concurrency,
+                upload_workers,
+                max_pending_uploads,
+                create_record,
+                cancel_events,
+                simulation_slots,
+                cancelled,
+                failures,
+            )
+        else:
+            finished = [
+                (task, create_record(task, run_stats))
+                for task, run_stats in iterate_finished_simulations(
+                    tasks,
+                    args_list,
+                    toolbox_env_path,
+                    max_concurrency,
+                    cancel_events=cancel_events,
+                    simulation_slots=simulation_slots,
+                    failures=failures,
+                )
+            ]
+            logger.info("CBM3 simulations finished")
+            _raise_if_cancelled(cancelled, local_working_dir)
+
+            logger.info("Upload results")
+            for task, record in finished:
+                record.update(_upload_task(s3_io, task, logger, cancelled))
+    except TaskCancelled:
+        shutil.rmtree(local_working_dir, ignore_errors=True)
+        raise
+    finally:
+        # the records of a cancelled task are discarded along with its
+        # results
+        if runtime_records and not (cancelled and cancelled.is_set()):
+            try:
+                runtime_history.write_records(s3_io, task_id, runtime_records)
+            except Exception:
+                logger.exception("failed to write runtime history")
+
+    _raise_if_cancelled(cancelled, local_working_dir)
+    if failures and not (interrupted and interrupted.is_set()):
+        put_metric(logger, "FailedSimulations", len(failures))
+        raise SimulationsFailed(failures)
+    # the failed simulations of an interrupted task are handed back along
+    # with the simulations that did not run
+    remaining_simulations = get_remaining_simulations(tasks, runtime_records)
+    if remaining_simulations:
+        raise TaskInterrupted(remaining_simulations)
+    logger.info("CBM3 tasks finished")
 
-    logger.info("Upload results")
+
+def _raise_if_cancelled(
+    cancelled: Union[Event, None], local_working_dir: str
+) -> None:
+    if cancelled and cancelled.is_set():
+        shutil.rmtree(local_working_dir, ignore_errors=True)
+        raise TaskCancelled("task cancelled")
+
+
+def get_remaining_simulations(
+    tasks: list[dict], finished: list[dict]
+) -> list[dict]:
+    """Get the simulations that have not finished, in the task input
+    format
+
+    Args:
+        tasks (list): the items produced by :py:func:`iterate_tasks`
+        finished (list): dicts with the "project_code" and "simulation_id"
+            of each finished simulation
+
+    Returns:
+        list: the unfinished simulations as a list of dicts with
+            "project_code" and "simulation_ids" keys
+    """
+    finished_keys = set(
+        (f["project_code"], f["simulation_id"]) for f in finished
+    )
+    remaining: dict[str, list] = {}
     for task in tasks:
+        key = (task["project_code"], task["simulation_id"])
+        if key not in finished_keys:
+            remaining.setdefault(task["project_code"], []).append(
+                task["simulation_id"]
+            )
+    return [
+        {"project_code": project_code, "simulation_ids": simulation_ids}
+        for project_code, simulation_ids in remaining.items()
+    ]
+
+
+def prefetch(
+    s3_io: S3IO, downloads: list[dict], max_workers: int, logger: Logger
+) -> list[str]:
+    """Fetch the specified documents with up to max_workers concurrent
+    downloads, logging the time taken for each.
+
+    Args:
+        s3_io (S3IO): object used to fetch the documents
+        downloads (list): list of keyword arguments for
+            :py:func:`cbm3_aws.s3_io.S3IO.download_cached`
+        max_workers (int): maximum number of concurrent downloads
+        logger (logging.Logger): logger for this EC2 instance
+
+    Returns:
+        list: the local path of each document, in the order of downloads
+    """
+
+    def fetch(download: dict) -> str:
+        start_time = time.time()
+        local_path = s3_io.download_cached(**download)
         logger.info(
-            dict(
-                project_code=task["project_code"],
-                simulation_id=task["simulation_id"],
+            "fetched {0} in {1:.1f}s".format(
+                download, time.time() - start_time
             )
         )
-        s3_io.upload(
-            local_path=task["results_database_path"],
-            s3_key="results",
+        return local_path
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        local_paths = list(executor.map(fetch, downloads))
+    logger.info(
+        "fetched {0} items in {1:.1f}s".format(
+            len(downloads), time.time() - start_time
+        )
+    )
+    return local_paths
+
+
+def _upload_task(
+    s3_io: S3IO,
+    task: dict,
+    logger: Logger,
+    cancelled: Union[Event, None] = None,
+) -> dict:
+    if cancelled and cancelled.is_set():
+        raise TaskCancelled("task cancelled, upload skipped")
+    logger.info(
+        dict(
             project_code=task["project_code"],
             simulation_id=task["simulation_id"],
         )
-        # remove the project db so it wont be uploaded in the next step
-        os.unlink(task["results_database_path"])
-        # upload all other files and dirs where the project was loaded as
-        # "tempfiles" This will include the run flat files, stdout file and
-        # the run log.
-        s3_io.upload(
-            local_path=os.path.dirname(task["tempfiles_output_dir"]),
-            s3_key="tempfiles",
+    )
+    start_time = time.time()
+    upload_bytes = s3_io.upload(
+        local_path=task["results_database_path"],
+        s3_key="results",
+        project_code=task["project_code"],
+        simulation_id=task["simulation_id"],
+    )
+    # remove the project db so it wont be uploaded in the next step
+    os.unlink(task["results_database_path"])
+    # upload all other files and dirs where the project was loaded as
+    # "tempfiles" This will include the run flat files, stdout file and
+    # the run log.
+    upload_bytes += s3_io.upload(
+        local_path=os.path.dirname(task["tempfiles_output_dir"]),
+        s3_key="tempfiles",
+        project_code=task["project_code"],
+        simulation_id=task["simulation_id"],
+    )
+
+    # now clean up the rest of the files for the task
+    shutil.rmtree(task["tempfiles_output_dir"], ignore_errors=True)
+    os.unlink(task["stdout_path"])
+    upload_stats = dict(
+        upload_bytes=upload_bytes, upload_seconds=time.time() - start_time
+    )
+    # mark the simulation complete only once all of its output is in S3, so
+    # that retries of the task skip it
+    s3_io.put_json(
+        dict(
             project_code=task["project_code"],
             simulation_id=task["simulation_id"],
+            execution_id=task.get("execution_id"),
+            project_etag=task.get("project_etag"),
+            completed_time=time.time(),
+            **upload_stats,
+        ),
+        "completed",
+        project_code=task["project_code"],
+        simulation_id=task["simulation_id"],
+    )
+    failure_manifest.clear_failure(
+        s3_io, task["project_code"], task["simulation_id"]
+    )
+    return upload_stats
+
+
+def _simulation_process_main(args: dict, toolbox_env_path: str) -> None:
+    list(
+        projectsimulator.run_concurrent(
+            [args], toolbox_env_path, max_workers=1
         )
+    )
 
-        # now clean up the rest of the files for the task
-        shutil.rmtree(task["tempfiles_output_dir"], ignore_errors=True)
-        os.unlink(task["stdout_path"])
 
-    logger.info("CBM3 tasks finished")
+def _run_simulation(
+    args: dict,
+    toolbox_env_path: str,
+    cancel_events: Sequence[Event],
+    simulation_slots: Union[TaskSlots, None],
+    upload_permits: Union[BoundedSemaphore, None] = None,
+) -> dict:
+    if simulation_slots:
+        simulation_slots.acquire()
+    try:
+        # each simulation runs in its own process so that its wall time
+        # and peak memory can be measured independently of the other
+        # simulations
+        run_stats = run_monitored(
+            _simulation_process_main,
+            (args, toolbox_env_path),
+            poll_interval=5,
+            cancel_events=cancel_events,
+        )
+    finally:
+        if simulation_slots:
+            simulation_slots.release()
+    # a finished simulation waits here for an upload permit, and while it
+    # waits its thread does not start another simulation
+    if upload_permits:
+        upload_permits.acquire()
+    return run_stats
+
+
+def iterate_finished_simulations(
+    tasks: list[dict],
+    args_list: list[dict],
+    toolbox_env_path: str,
+    max_concurrency: int,
+    cancel_events: Sequence[Event] = (),
+    simulation_slots: Union[TaskSlots, None] = None,
+    failures: Union[list[dict], None] = None,
+    upload_permits: Union[BoundedSemaphore, None] = None,
+) -> Iterator[tuple[dict, dict]]:
+    """Run the specified simulations with at most max_concurrency running at
+    once, yielding each task as soon as its simulation finishes.
+
+    Args:
+        tasks (list): the items produced by :py:func:`iterate_tasks`
+        args_list (list): the projectsimulator arguments for each task
+        toolbox_env_path (str): path to the toolbox environment
+        max_concurrency (int): maximum number of concurrent simulations
+        cancel_events (Sequence, optional): when any is set, simulations
+            that have not started are skipped and running simulations are
+            killed. Only the simulations that finished are yielded.
+            Defaults to ().
+        simulation_slots (TaskSlots, optional): if specified, each
+            simulation also waits for a slot shared with the worker's other
+            tasks. Defaults to None.
+        failures (list, optional): if specified, the "project_code",
+            "simulation_id" and formatted "error" of each simulation that
+            fails is appended, and the other simulations carry on. If None
+            the first failure is raised. Defaults to None.
+        upload_permits (BoundedSemaphore, optional): if specified, each
+            simulation acquires a permit once it finishes, before it is
+            yielded, and the caller must release the permit once its
+            results are uploaded. Simulations that fail or are cancelled
+            take no permit. Defaults to None.
+
+    Yields:
+        tuple: the task for each finished simulation, in order of
+            completion, and the simulation's "start_time", "wall_time" and
+            "peak_memory_bytes"
+    """
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = {
+            executor.submit(
+                _run_simulation,
+                args,
+                toolbox_env_path,
+                cancel_events,
+                simulation_slots,
+                upload_permits,
+            ): task
+            for task, args in zip(tasks, args_list)
+        }
+        for future in as_completed(futures):
+            try:
+                run_stats = future.result()
+            except ProcessCancelled:
+                continue
+            except Exception:
+                if failures is None:
+                    raise
+                task = futures[future]
+                failures.append(
+                    dict(
+                        project_code=task["project_code"],
+                        simulation_id=task["simulation_id"],
+                        error=traceback.format_exc(),
+                    )
+                )
+                continue
+            yield futures[future], run_stats
+
+
+def _run_pipelined(
+    tasks: list[dict],
+    args_list: list[dict],
+    toolbox_env_path: str,
+    s3_io: S3IO,
+    logger: Logger,
+    max_concurrency: int,
+    upload_workers: int,
+    max_pending_uploads: int,
+    create_record: Callable[[dict, dict], dict],
+    cancel_events: Sequence[Event] = (),
+    simulation_slots: Union[TaskSlots, None] = None,
+    cancelled: Union[Event, None] = None,
+    failures: Union[list[dict], None] = None,
+) -> None:
+    # simulation results are handed to the upload pool as soon as they
+    # finish. To cap disk use, a finished simulation takes a permit before
+    # it is queued and gives it back once its results are uploaded, so at
+    # most max_pending_uploads results are queued or uploading, and at most
+    # max_concurrency more are running or waiting for a permit.
+    pending_uploads = BoundedSemaphore(max_pending_uploads)
+    upload_futures = []
+    with ThreadPoolExecutor(max_workers=upload_workers) as upload_executor:
+        for task, run_stats in iterate_finished_simulations(
+            tasks,
+            args_list,
+            toolbox_env_path,
+            max_concurrency,
+            cancel_events=cancel_events,
+            simulation_slots=simulation_slots,
+            failures=failures,
+            upload_permits=pending_uploads,
+        ):
+            record = create_record(task, run_stats)
+            logger.info(
+                "simulation finished, queueing upload: {0}".format(
+                    dict(
+                        project_code=task["project_code"],
+                        simulation_id=task["simulation_id"],
+                    )
+                )
+            )
+            upload_future = upload_executor.submit(
+                _upload_task, s3_io, task, logger, cancelled
+            )
+            upload_future.add_done_callback(
+                lambda _: pending_uploads.release()
+            )
+            upload_futures.append((record, upload_future))
+        logger.info("CBM3 simulations finished")
+        for record, upload_future in upload_futures:
+            record.update(upload_future.result())
 
 
 def iterate_tasks(
@@ -1,41 +1,43 @@
 import os
 import json
-import time
 import tempfile
 import traceback
+from contextlib import nullcontext
 from typing import Callable
+from typing import Union
 import logging
-from threading import Thread
 from threading import Event
-import boto3
+from threading import BoundedSemaphore
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
 import watchtower
 from ec2_metadata import ec2_metadata
-from botocore.client import Config
 from cbm3_aws.instance import instance_cbm3_task
+from cbm3_aws.instance.client_pool import ClientPool
+from cbm3_aws.instance.activity_poller import ActivityPoller
+from cbm3_aws.instance.scale_in_protection import ScaleInProtection
+from cbm3_aws.instance.spot_interruption import DEFAULT_METADATA_URL
+from cbm3_aws.instance.spot_interruption import SPOT_INTERRUPTION_ERROR
+from cbm3_aws.instance.spot_interruption import SpotInterruptionWatcher
+from cbm3_aws.instance.spot_interruption import TaskInterrupted
+from cbm3_aws.instance.simulation_slots import SimulationSlots
+from cbm3_aws.instance.simulation_slots import TaskSlots
+from cbm3_aws.instance.heartbeat_service import HeartbeatService
+from cbm3_aws.instance.heartbeat_service import TaskCancelled
+from cbm3_aws.instance.metrics import enable_embedded_metrics
+from cbm3_aws.instance.metrics import put_metric
+from cbm3_aws.instance.failure_policy import FailurePolicy
+from cbm3_aws.instance.failure_policy import get_task_id
+from cbm3_aws.instance.failure_policy import RETRY
+from cbm3_aws.instance.failure_policy import RETRYABLE_TASK_ERROR
+from cbm3_aws.instance.failure_policy import SimulationsFailed
+from cbm3_aws import failure_manifest
 from cbm3_aws.s3_interface import S3Interface
 from cbm3_aws.s3_io import S3IO
-from mypy_boto3_stepfunctions.type_defs import GetActivityTaskOutputTypeDef
+from cbm3_aws.resource_cache import ResourceCache
 
-
-class HeartBeatThread(Thread):
-    def __init__(self, event: Event, interval: int, target_func: Callable):
-        Thread.__init__(self)
-        self.stopped = event
-        self.interval = interval
-        self.target_func = target_func
-
-    def run(self) -> None:
-        while not self.stopped.wait(self.interval):
-            self.target_func()
-
-
-def _valid_token(
-    get_activity_task_response: GetActivityTaskOutputTypeDef,
-) -> bool:
-    return (
-        "taskToken" in get_activity_task_response
-        and len(get_activity_task_response["taskToken"]) > 0
-    )
+# the maximum length of the cause reported with send_task_failure
+_MAX_CAUSE_LENGTH = 32768
 
 
 def run(
@@ -44,11 +46,53 @@ def run(
     s3_bucket_name: str,
     region_name: str,
     max_concurrency: int,
+    resource_cache_dir: Union[str, None] = None,
+    resource_cache_max_size: int = 20 * 1024**3,
+    project_cache_dir: Union[str, None] = None,
+    project_cache_max_size: int = 50 * 1024**3,
+    stream_downloads: bool = False,
+    compression_level: int = 6,
+    archive_workers: int = 1,
+    upload_workers: int = 0,
+    max_pending_uploads: int = 2,
+    download_concurrency: int = 1,
+    transfer_profile: Union[dict, None] = None,
+    max_pool_connections: int = 10,
+    max_task_attempts: int = 3,
+    auto_scaling_group_name: Union[str, None] = None,
+    instance_state_dir: Union[str, None] = None,
+    metadata_url: str = DEFAULT_METADATA_URL,
+    dynamic_work_units: bool = False,
+    max_tasks_held: int = 1,
+    heartbeat_interval: float = 25.0,
+    compact_results: bool = False,
 ) -> None:
     """Run a worker persistently on a single thread.
 
-    The worker will call get_activity_task repeatedly with delayed retries
-    until it gets a response from the cbm3_aws state machine.
+    The worker long polls get_activity_task, starting a new poll as soon
+    as the previous one returns without a task, until it gets a response
+    from the cbm3_aws state machine. API errors are retried with jittered
+    exponential backoff. See
+    :py:class:`cbm3_aws.instance.activity_poller.ActivityPoller`
+
+    The worker stops polling once the instance receives a spot interruption
+    notice, and hands the unfinished simulations of its current task back
+    to the state machine. See
+    :py:class:`cbm3_aws.instance.spot_interruption.SpotInterruptionWatcher`
+
+    With dynamic_work_units, the worker runs up to max_concurrency tasks at
+    once, each with a single simulation slot, and polls for a new task as
+    soon as a slot frees up. This is intended for executions whose tasks
+    are split into simulation-sized work units, see
+    :py:func:`cbm3_aws.task_packer.create_work_units`.
+
+    With max_tasks_held greater than 1, the worker leases its next task
+    while the current one finishes: whenever one of its max_concurrency
+    simulation slots is free and not claimed by a simulation of a task it
+    already holds, it leases another task, up to max_tasks_held at once.
+    The held tasks share the slots, and each task sends its own
+    heartbeats. See
+    :py:class:`cbm3_aws.instance.simulation_slots.SimulationSlots`
 
 
         ::task input format (the content of activity_task_response["input"])
@@ -66,83 +110,321 @@ def run(
         region_name (str): AWS region name
         max_concurrency (int): the maximum number of sub processes this
             process will spawn
+        resource_cache_dir (str, optional): directory for the instance wide
+            cache of downloaded resources, shared by all worker processes
+            on the instance. If None, resources are downloaded for every
+            task. Defaults to None.
+        resource_cache_max_size (int, optional): size in bytes above which
+            the least recently used cached resources are evicted. Defaults
+            to 20GiB.
+        project_cache_dir (str, optional): directory for the instance wide
+            cache of downloaded project databases. If None, projects are
+            downloaded for every task. Defaults to None.
+        project_cache_max_size (int, optional): size in bytes above which
+            the least recently used cached projects are evicted. Defaults
+            to 50GiB.
+        stream_downloads (bool, optional): if True, archives are extracted
+            directly from ranged S3 GET requests rather than first being
+            downloaded to disk. Defaults to False.
+        compression_level (int, optional): deflate compression level from 0
+            (store only) to 9 for uploaded archives. Defaults to 6.
+        archive_workers (int, optional): number of threads used to compress
+            uploaded directories. Defaults to 1.
+        upload_workers (int, optional): if greater than 0, simulation
+            results are uploaded on this number of background threads as
+            each simulation finishes. Defaults to 0.
+        max_pending_uploads (int, optional): bound on the number of
+            finished simulations queued for upload or uploading. Defaults
+            to 2.
+        download_concurrency (int, optional): maximum number of resources
+            and projects fetched at once at the start of each task.
+            Defaults to 1.
+        transfer_profile (dict, optional): S3 multipart transfer settings,
+            see :py:func:`cbm3_aws.transfer_profile.get_transfer_profile`.
+            If None the default profile is used. Defaults to None.
+        max_pool_connections (int, optional): the maximum number of
+            connections kept by each of the AWS clients shared by this
+            process' tasks. Defaults to 10.
+        max_task_attempts (int, optional): the number of attempts made at
+            a task failing with retryable errors before it is quarantined.
+            See :py:class:`cbm3_aws.instance.failure_policy.FailurePolicy`.
+            Defaults to 3.
+        auto_scaling_group_name (str, optional): the name of the instance's
+            autoscaling group. If specified along with instance_state_dir,
+            the instance is protected from scale-in while any worker
+            process on it holds a task. Defaults to None.
+        instance_state_dir (str, optional): directory shared by the worker
+            processes on the instance for coordinating scale-in protection.
+            Defaults to None.
+        metadata_url (str, optional): the EC2 instance metadata endpoint
+            polled for spot interruption notices, which may be replaced
+            with a local stub for testing. Defaults to the EC2 instance
+            metadata service.
+        dynamic_work_units (bool, optional): if True, lease tasks as
+            simulation slots free up rather than running one task at a
+            time. Resources and projects are cached for reuse across tasks,
+            in a process specific temporary directory if no cache
+            directories are specified. Defaults to False.
+        max_tasks_held (int, optional): the maximum number of tasks held at
+            once when leasing tasks ahead of the current one finishing. If
+            dynamic_work_units is True, max_concurrency tasks are held.
+            Defaults to 1.
+        heartbeat_interval (float, optional): seconds between the
+            heartbeats sent for each held task by the process' heartbeat
+            service, see
+            :py:class:`cbm3_aws.instance.heartbeat_service.HeartbeatService`.
+            Must be less than the task state's HeartbeatSeconds. Defaults
+            to 25.
+        compact_results (bool, optional): if True, each task's simulations
+            and errors are written to a status record in S3, and the task
+            output sent to the state machine carries only counts and the
+            record's S3 key. See :py:func:`send_task_result`. Defaults to
+            False.
     """
 
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger("cbm3_aws.instance.instance_task")
     instance_id = ec2_metadata.instance_id
+    client_pool = ClientPool(
+        region_name=region_name, max_pool_connections=max_pool_connections
+    )
+    logs_client = client_pool.client("logs")
+    enable_embedded_metrics(logs_client)
     cloud_watch_log_handler = watchtower.CloudWatchLogHandler(
         log_group="cbm3_aws",
         stream_name=f"{instance_id}/process{process_index}",
-        boto3_client=boto3.client("logs", region_name=region_name),
+        boto3_client=logs_client,
     )
     logger.addHandler(cloud_watch_log_handler)
 
     # config here is based on the AWS recommendation found in the boto
     # docs, and the pull request here:
     # https://github.com/boto/botocore/pull/634
-    client = boto3.client(
-        "stepfunctions",
-        region_name=region_name,
-        config=Config(connect_timeout=65, read_timeout=65),
+    client = client_pool.client(
+        "stepfunctions", connect_timeout=65, read_timeout=65
     )
 
-    try:
-        while True:
-            logger.info("get_activity_task")
-            get_activity_task_response = client.get_activity_task(
-                activityArn=activity_arn
-            )
+    if dynamic_work_units:
+        # work units share their downloads through the caches
+        process_cache_dir = os.path.join(
+            tempfile.gettempdir(), "cbm3_aws_cache", f"process{process_index}"
+        )
+        if not resource_cache_dir:
+            resource_cache_dir = os.path.join(process_cache_dir, "resources")
+        if not project_cache_dir:
+            project_cache_dir = os.path.join(process_cache_dir, "projects")
+
+    resource_cache = None
+    if resource_cache_dir:
+        resource_cache = ResourceCache(
+            cache_dir=resource_cache_dir,
+            max_size_bytes=resource_cache_max_size,
+        )
+    project_cache = None
+    if project_cache_dir:
+        project_cache = ResourceCache(
+            cache_dir=project_cache_dir,
+            max_size_bytes=project_cache_max_size,
+        )
+
+    failure_policy = FailurePolicy(max_attempts=max_task_attempts)
+    # one heartbeat thread serves all of the tasks held by this process
+    heartbeat_service = HeartbeatService(
+        client=client_pool.client("stepfunctions"),
+        logger=logger,
+        interval=heartbeat_interval,
+    )
+    heartbeat_service.start()
+    scale_in_protection = None
+    if auto_scaling_group_name and instance_state_dir:
+        scale_in_protection = ScaleInProtection(
+            autoscale_client=client_pool.client("autoscaling"),
+            auto_scaling_group_name=auto_scaling_group_name,
+            instance_id=instance_id,
+            state_dir=instance_state_dir,
+            process_index=process_index,
+            logger=logger,
+        )
+    poller = ActivityPoller(
+        client=client,
+        activity_arn=activity_arn,
+        logger=logger,
+        worker_name=f"{instance_id}/process{process_index}",
+    )
+
+    spot_interruption_watcher = SpotInterruptionWatcher(
+        logger=logger, metadata_url=metadata_url
+    )
+    spot_interruption_watcher.start()
 
-            retry_interval = 30
-            if not _valid_token(get_activity_task_response):
-                time.sleep(retry_interval)
-                logger.info("no activity task, retrying")
-                # If there is a null task token it means there is no task
-                # available. Sleep the worker and try again
-                while not _valid_token(get_activity_task_response):
-                    get_activity_task_response = client.get_activity_task(
-                        activityArn=activity_arn
-                    )
-                    time.sleep(retry_interval)
-                    logger.info("no activity task, retrying")
-
-            task_token = get_activity_task_response["taskToken"]
-            logger.info(f"got activity task, task_token {task_token}")
-            task_input = json.loads(get_activity_task_response["input"])
-            logger.info(dict(input=task_input))
-            process_task(
-                client=client,
-                task_token=task_token,
-                task_input=task_input["Input"],
-                s3_bucket_name=s3_bucket_name,
+    interrupted = spot_interruption_watcher.interrupted
+
+    if dynamic_work_units:
+        max_tasks_held = max_concurrency
+    simulation_slots = None
+    if max_tasks_held > 1:
+        simulation_slots = SimulationSlots(max_concurrency)
+
+    def run_activity_task(
+        task_token: str,
+        task_input: dict,
+        task_max_concurrency: int,
+        task_slots: Union[TaskSlots, None] = None,
+    ) -> None:
+        logger.info(f"got activity task, task_token {task_token}")
+        logger.info(dict(input=task_input))
+        poller.record_pickup(task_input)
+        protection = (
+            scale_in_protection.hold()
+            if scale_in_protection
+            else nullcontext()
+        )
+        try:
+            with protection:
+                process_task(
+                    client_pool=client_pool,
+                    task_token=task_token,
+                    task_input=task_input["Input"],
+                    s3_bucket_name=s3_bucket_name,
+                    logger=logger,
+                    max_concurrency=task_max_concurrency,
+                    resource_cache=resource_cache,
+                    project_cache=project_cache,
+                    stream_downloads=stream_downloads,
+                    compression_level=compression_level,
+                    archive_workers=archive_workers,
+                    upload_workers=upload_workers,
+                    max_pending_uploads=max_pending_uploads,
+                    download_concurrency=download_concurrency,
+                    transfer_profile=transfer_profile,
+                    failure_policy=failure_policy,
+                    instance_id=instance_id,
+                    interrupted=interrupted,
+                    simulation_slots=task_slots,
+                    heartbeat_service=heartbeat_service,
+                    compact_results=compact_results,
+                    execution_id=task_input.get("ExecutionId"),
+                )
+        finally:
+            if task_slots:
+                task_slots.close()
+
+    try:
+        if simulation_slots:
+            _run_held_tasks(
+                poller=poller,
+                run_activity_task=run_activity_task,
+                max_tasks_held=max_tasks_held,
+                task_max_concurrency=(
+                    1 if dynamic_work_units else max_concurrency
+                ),
+                simulation_slots=simulation_slots,
+                interrupted=interrupted,
                 logger=logger,
-                max_concurrency=max_concurrency,
             )
+        else:
+            while not interrupted.is_set():
+                logger.info("get_activity_task")
+                # returns once a task is available, polling again
+                # immediately after each empty long poll
+                response = poller.poll()
+                run_activity_task(
+                    response["taskToken"],
+                    json.loads(response["input"]),
+                    max_concurrency,
+                )
+        logger.info("spot interruption: stopped polling for tasks")
 
     except Exception:
         logger.exception("")
+    finally:
+        spot_interruption_watcher.stop()
+        heartbeat_service.stop()
+
 
+def _run_held_tasks(
+    poller: ActivityPoller,
+    run_activity_task: Callable[
+        [str, dict, int, Union[TaskSlots, None]], None
+    ],
+    max_tasks_held: int,
+    task_max_concurrency: int,
+    simulation_slots: SimulationSlots,
+    interrupted: Event,
+    logger: logging.Logger,
+) -> None:
+    # each held task runs on its own thread, and the next task is polled
+    # for as soon as a simulation slot is free for it
+    tasks_held = BoundedSemaphore(max_tasks_held)
 
-def get_heart_beat_func(client, task_token, logger):
-    def heart_beat():
-        client.send_task_heartbeat(taskToken=task_token)
+    def on_done(future: Future) -> None:
+        tasks_held.release()
+        if future.exception():
+            logger.error("task failed", exc_info=future.exception())
 
-    return heart_beat
+    with ThreadPoolExecutor(max_workers=max_tasks_held) as executor:
+        while not interrupted.is_set():
+            tasks_held.acquire()
+            simulation_slots.wait_for_free_slot()
+            if interrupted.is_set():
+                break
+            logger.info("get_activity_task")
+            response = poller.poll()
+            task_input = json.loads(response["input"])
+            # the task's simulations are reserved before its thread starts,
+            # so that the next wait for a free slot accounts for them
+            task_slots = simulation_slots.reserve(
+                sum(
+                    len(x["simulation_ids"])
+                    for x in task_input["Input"]["simulations"]
+                )
+            )
+            future = executor.submit(
+                run_activity_task,
+                response["taskToken"],
+                task_input,
+                task_max_concurrency,
+                task_slots,
+            )
+            future.add_done_callback(on_done)
 
 
 def process_task(
-    client, task_token, task_input, s3_bucket_name, logger, max_concurrency
+    client_pool,
+    task_token,
+    task_input,
+    s3_bucket_name,
+    logger,
+    max_concurrency,
+    resource_cache=None,
+    project_cache=None,
+    stream_downloads=False,
+    compression_level=6,
+    archive_workers=1,
+    upload_workers=0,
+    max_pending_uploads=2,
+    download_concurrency=1,
+    transfer_profile=None,
+    failure_policy=None,
+    instance_id=None,
+    interrupted=None,
+    simulation_slots=None,
+    heartbeat_service=None,
+    compact_results=False,
+    execution_id=None,
 ):
-    heart_beat_stop_flag = Event()
+    if failure_policy is None:
+        failure_policy = FailurePolicy()
+    # the task completion calls are short, so they use a client without the
+    # long poll timeouts
+    client = client_pool.client("stepfunctions")
+    stop_heartbeat_service = False
+    if heartbeat_service is None:
+        heartbeat_service = HeartbeatService(client, logger)
+        heartbeat_service.start()
+        stop_heartbeat_service = True
+    cancelled = heartbeat_service.register(task_token)
     try:
-        heart_beat_thread = HeartBeatThread(
-            heart_beat_stop_flag,
-            25,
-            target_func=get_heart_beat_func(client, task_token, logger),
-        )
-        heart_beat_thread.start()
-
         with tempfile.TemporaryDirectory() as temp_dir:
             s3_working_dir = os.path.join(temp_dir, "s3_working")
             os.makedirs(s3_working_dir)
@@ -150,53 +432,307 @@ def process_task(
             s3_io = S3IO(
                 execution_s3_key_prefix=task_input["upload_s3_key"],
                 s3_interface=S3Interface(
-                    s3_resource=boto3.resource("s3"),
+                    s3_resource=client_pool.resource("s3"),
                     bucket_name=s3_bucket_name,
                     local_temp_dir=s3_working_dir,
+                    stream_downloads=stream_downloads,
+                    compression_level=compression_level,
+                    archive_workers=archive_workers,
+                    transfer_profile=transfer_profile,
                 ),
+                resource_cache=resource_cache,
+                project_cache=project_cache,
             )
 
             cbm3_working_dir = os.path.join(temp_dir, "cbm3_working")
             os.makedirs(cbm3_working_dir)
             logger.info("starting simulations")
-            instance_cbm3_task.run_tasks(
-                simulation_tasks=task_input["simulations"],
-                local_working_dir=cbm3_working_dir,
-                s3_io=s3_io,
-                logger=logger,
-                max_concurrency=max_concurrency,
-            )
+            try:
+                instance_cbm3_task.run_tasks(
+                    simulation_tasks=task_input["simulations"],
+                    local_working_dir=cbm3_working_dir,
+                    s3_io=s3_io,
+                    logger=logger,
+                    max_concurrency=max_concurrency,
+                    upload_workers=upload_workers,
+                    max_pending_uploads=max_pending_uploads,
+                    download_concurrency=download_concurrency,
+                    instance_id=instance_id,
+                    interrupted=interrupted,
+                    simulation_slots=simulation_slots,
+                    cancelled=cancelled,
+                    execution_id=execution_id,
+                    resume=task_input.get("resume", False),
+                )
+            finally:
+                # the cached resources and projects used by the task may
+                # now be evicted
+                s3_io.release_cached()
+        if cancelled.is_set():
+            # the token is no longer valid, so the result can't be sent
+            logger.info("task cancelled, not reporting its result")
+            return
         logger.info("send task success to state machine")
-        client.send_task_success(
-            taskToken=task_token,
-            output=json.dumps(
-                {
-                    "output": {
-                        "simulations": task_input["simulations"],
-                        "errors": None,
-                    }
-                }
+        send_task_result(
+            client=client,
+            task_token=task_token,
+            task_input=task_input,
+            s3_io=s3_io,
+            errors=None,
+            compact_results=compact_results,
+        )
+    except TaskCancelled:
+        # the simulations were killed and the working directory removed,
+        # so the worker can return to polling
+        logger.info("task cancelled, abandoning it")
+    except TaskInterrupted as interruption:
+        heartbeat_service.unregister(task_token)
+        if cancelled.is_set():
+            logger.info("task cancelled, not handing it back")
+            return
+        _hand_back_task(
+            client=client,
+            task_token=task_token,
+            task_input=task_input,
+            remaining_simulations=interruption.remaining_simulations,
+            logger=logger,
+        )
+    except Exception as error:
+        exception_string = traceback.format_exc()
+        logger.info(exception_string)
+        heartbeat_service.unregister(task_token)
+        if cancelled.is_set():
+            logger.info("task cancelled, not reporting its failure")
+            return
+        _handle_task_failure(
+            client=client,
+            task_token=task_token,
+            task_input=task_input,
+            s3_io=S3IO(
+                execution_s3_key_prefix=task_input["upload_s3_key"],
+                s3_interface=S3Interface(
+                    s3_resource=client_pool.resource("s3"),
+                    bucket_name=s3_bucket_name,
+                ),
             ),
+            failure_policy=failure_policy,
+            error=error,
+            exception_string=exception_string,
+            logger=logger,
+            compact_results=compact_results,
+            instance_id=instance_id,
+            execution_id=execution_id,
         )
+    finally:
+        heartbeat_service.unregister(task_token)
+        if stop_heartbeat_service:
+            heartbeat_service.stop()
+
+
+def _hand_back_task(
+    client, task_token, task_input, remaining_simulations, logger
+):
+    # the state machine catches this error and restarts the task
+    # immediately with the cause as its input, so that only the unfinished
+    # simulations are run again
+    remaining_input = dict(task_input, simulations=remaining_simulations)
+    cause = json.dumps(remaining_input)
+    logger.info(dict(spot_interruption_hand_back=remaining_input))
+    put_metric(logger, "SpotInterruptions", 1)
+    if len(cause) > _MAX_CAUSE_LENGTH:
+        # too large to hand back, so the whole task is retried
+        client.send_task_failure(
+            taskToken=task_token,
+            error=RETRYABLE_TASK_ERROR,
+            cause="spot interruption",
+        )
+        return
+    client.send_task_failure(
+        taskToken=task_token, error=SPOT_INTERRUPTION_ERROR, cause=cause
+    )
+
+
+def _handle_task_failure(
+    client,
+    task_token,
+    task_input,
+    s3_io,
+    failure_policy,
+    error,
+    exception_string,
+    logger,
+    compact_results=False,
+    instance_id=None,
+    execution_id=None,
+):
+    # the number of attempts at each task is stored in S3 since the retried
+    # attempts may be run by other workers. The record is specific to the
+    # execution, so that a later execution of the same task starts over.
+    task_id = get_task_id(task_input)
+    attempts_id = get_task_id(task_input, execution_id)
+    failure_record = {"attempts": 0, "errors": []}
+    try:
+        existing_record = s3_io.get_json("task_failures", task_id=attempts_id)
+        if existing_record:
+            failure_record = existing_record
+        failure_record["attempts"] += 1
+        failure_record["errors"].append(exception_string)
+        s3_io.put_json(failure_record, "task_failures", task_id=attempts_id)
     except Exception:
-        # need to send task_success here to avoid interrupting the entire
-        # state machine
+        # fall back to classifying this failure as the first attempt
+        logger.exception("failed to update the task failure record")
+        failure_record = {"attempts": 1, "errors": [exception_string]}
 
-        exception_string = traceback.format_exc()
-        logger.info(exception_string)
-        client.send_task_success(
+    decision = failure_policy.classify(error, failure_record["attempts"])
+    logger.info(
+        dict(
+            task_id=task_id,
+            attempts=failure_record["attempts"],
+            decision=decision,
+        )
+    )
+    put_metric(
+        logger,
+        "TaskFailures",
+        1,
+        dimensions={"Decision": decision},
+    )
+    try:
+        _record_simulation_failures(
+            s3_io=s3_io,
+            task_id=task_id,
+            task_input=task_input,
+            error=error,
+            exception_string=exception_string,
+            attempts=failure_record["attempts"],
+            final=decision != RETRY,
+            instance_id=instance_id,
+        )
+    except Exception:
+        logger.exception("failed to update the failure manifest")
+    if decision == RETRY:
+        # the task state machine catches this error and restarts the task
+        # after a delay, so this worker can poll for the next task
+        # immediately
+        client.send_task_failure(
             taskToken=task_token,
-            output=json.dumps(
-                {
-                    "output": {
-                        "simulations": task_input["simulations"],
-                        "errors": exception_string,
-                    }
-                }
+            error=RETRYABLE_TASK_ERROR,
+            cause=exception_string[-_MAX_CAUSE_LENGTH:],
+        )
+        return
+
+    # poison task: record it for inspection and report it as finished with
+    # errors to avoid interrupting the entire state machine
+    s3_io.put_json(
+        dict(
+            task_id=task_id,
+            task_input=task_input,
+            attempts=failure_record["attempts"],
+            errors=failure_record["errors"],
+        ),
+        "quarantine",
+        task_id=task_id,
+    )
+    send_task_result(
+        client=client,
+        task_token=task_token,
+        task_input=task_input,
+        s3_io=s3_io,
+        errors=exception_string,
+        compact_results=compact_results,
+    )
+
+
+def _record_simulation_failures(
+    s3_io,
+    task_id,
+    task_input,
+    error,
+    exception_string,
+    attempts,
+    final,
+    instance_id,
+):
+    # each failed simulation is recorded in the execution's failure
+    # manifest, and its record removed once it completes. A failure of the
+    # task as a whole is recorded against each of its incomplete
+    # simulations.
+    if isinstance(error, SimulationsFailed):
+        failures = error.failures
+    else:
+        failures = [
+            dict(
+                project_code=x["project_code"],
+                simulation_id=simulation_id,
+                error=exception_string,
+            )
+            for x in instance_cbm3_task.get_incomplete_simulations(
+                s3_io, task_input["simulations"], max_workers=4
+            )
+            for simulation_id in x["simulation_ids"]
+        ]
+    failure_manifest.write_failures(
+        s3_io,
+        [
+            failure_manifest.create_record(
+                task_id=task_id,
+                attempts=attempts,
+                final=final,
+                instance_id=instance_id,
+                **failure,
+            )
+            for failure in failures
+        ],
+    )
+
+
+def send_task_result(
+    client, task_token, task_input, s3_io, errors, compact_results=False
+):
+    """Report a finished task to the state machine with send_task_success.
+
+    By default the output echoes the task's simulations along with its
+    errors. With compact_results, the simulations and errors are written
+    to the task's "task_status" record in S3, and the output carries only
+    counts and the record's S3 key, so that the output of executions with
+    many tasks stays well within the Step Functions payload limit::
+
+        {"output": {"projects": 3, "simulations": 24, "failed": false,
+                    "status_key": "cbm3_aws/.../task_status/<task_id>.json"}}
+
+    Args:
+        client (SFNClient): boto3 step functions client
+        task_token (str): the task token
+        task_input (dict): the task input
+        s3_io (S3IO): S3IO for the task's upload_s3_key
+        errors (str): the errors of a task finished with errors, or None
+        compact_results (bool, optional): if True report counts and the
+            status record's S3 key. Defaults to False.
+    """
+    if not compact_results:
+        output = {
+            "simulations": task_input["simulations"],
+            "errors": errors,
+        }
+    else:
+        task_id = get_task_id(task_input)
+        s3_io.put_json(
+            dict(
+                task_id=task_id,
+                simulations=task_input["simulations"],
+                errors=errors,
             ),
+            "task_status",
+            task_id=task_id,
         )
-        heart_beat_stop_flag.set()
-        time.sleep(60)
-    finally:
-        if not heart_beat_stop_flag.is_set():
-            heart_beat_stop_flag.set()
+        output = {
+            "projects": len(task_input["simulations"]),
+            "simulations": sum(
+                len(x["simulation_ids"]) for x in task_input["simulations"]
+            ),
+            "failed": errors is not None,
+            "status_key": s3_io.get_json_key("task_status", task_id=task_id),
+        }
+    client.send_task_success(
+        taskToken=task_token, output=json.dumps({"output": output})
+    )
@@ -0,0 +1,83 @@
+import time
+from logging import Logger
+from typing import Union
+
+NAMESPACE = "cbm3_aws"
+
+
+def enable_embedded_metrics(logs_client) -> None:
+    """Configure a CloudWatch Logs client so that the log events it sends
+    are parsed for metrics in the CloudWatch embedded metric format.
+
+    Args:
+        logs_client (CloudWatchLogsClient): the boto3 logs client used by
+            the worker's watchtower log handler
+    """
+
+    def add_header(request, **kwargs):
+        request.headers["x-amzn-logs-format"] = "json/emf"
+
+    logs_client.meta.events.register(
+        "before-sign.logs.PutLogEvents", add_header
+    )
+
+
+def get_metric_record(
+    name: str,
+    value: float,
+    unit: str = "Count",
+    dimensions: Union[dict, None] = None,
+) -> dict:
+    """Get a log record in the CloudWatch embedded metric format for a
+    single metric value.
+
+    Args:
+        name (str): the metric name
+        value (float): the metric value
+        unit (str, optional): CloudWatch metric unit, for example "Count"
+            or "Seconds". Defaults to "Count".
+        dimensions (dict, optional): metric dimension names and values.
+            Defaults to None.
+
+    Returns:
+        dict: the embedded metric format record
+    """
+    dimensions = dimensions if dimensions else {}
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": NAMESPACE,
+                    "Dimensions": [sorted(dimensions.keys())],
+                    "Metrics": [{"Name": name, "Unit": unit}],
+                }
+            ],
+        },
+        name: value,
+    }
+    record.update(dimensions)
+    return record
+
+
+def put_metric(
+    logger: Logger,
+    name: str,
+    value: float,
+    unit: str = "Count",
+    dimensions: Union[dict, None] = None,
+) -> None:
+    """Publish a metric by logging it in the CloudWatch embedded metric
+    format. The metric is extracted by CloudWatch when the logger has a
+    watchtower handler whose client was passed to
+    :py:func:`enable_embedded_metrics`.
+
+    Args:
+        logger (Logger): the worker's logger
+        name (str): the metric name
+        value (float): the metric value
+        unit (str, optional): CloudWatch metric unit. Defaults to "Count".
+        dimensions (dict, optional): metric dimension names and values.
+            Defaults to None.
+    """
+    logger.info(get_metric_record(name, value, unit, dimensions))
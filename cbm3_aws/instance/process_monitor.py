@@ -0,0 +1,116 @@
+import time
+import multiprocessing
+from threading import Event
+from typing import Callable
+from typing import Sequence
+import psutil
+
+
+class ProcessCancelled(Exception):
+    """Raised by :py:func:`run_monitored` when the process was killed
+    because one of its cancel events was set.
+    """
+
+    pass
+
+
+def get_tree_memory(pid: int) -> int:
+    """Get the total resident memory of a process and all of its
+    descendants.
+
+    Args:
+        pid (int): the process id of the root process
+
+    Returns:
+        int: resident memory in bytes, or 0 if the process has exited
+    """
+    try:
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return 0
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            # processes may exit between listing and sampling
+            pass
+    return total
+
+
+def kill_tree(pid: int) -> None:
+    """Kill a process and all of its descendants.
+
+    Args:
+        pid (int): the process id of the root process
+    """
+    try:
+        root = psutil.Process(pid)
+        processes = root.children(recursive=True) + [root]
+    except psutil.NoSuchProcess:
+        return
+    for process in processes:
+        try:
+            process.kill()
+        except psutil.NoSuchProcess:
+            pass
+    psutil.wait_procs(processes, timeout=10)
+
+
+def run_monitored(
+    target: Callable,
+    args: tuple,
+    poll_interval: float = 1.0,
+    cancel_events: Sequence[Event] = (),
+) -> dict:
+    """Run a function in a new process, sampling the memory of the process
+    and its descendants until it exits.
+
+    The spawn start method is used so that the child process does not
+    inherit the threads and open handles of the worker.
+
+    Args:
+        target (Callable): module level function to run
+        args (tuple): picklable arguments for target
+        poll_interval (float, optional): seconds between memory samples.
+            Defaults to 1.0.
+        cancel_events (Sequence, optional): events which, if any is set
+            before the process exits, cause the process and its
+            descendants to be killed. Defaults to ().
+
+    Raises:
+        ProcessCancelled: the process was killed because one of
+            cancel_events was set
+        RuntimeError: the process exited with a non-zero exit code
+
+    Returns:
+        dict: the "start_time" as a unix timestamp, the "wall_time" in
+            seconds and the "peak_memory_bytes" of the process
+    """
+    if any(e.is_set() for e in cancel_events):
+        raise ProcessCancelled(f"{target.__name__} cancelled before start")
+    context = multiprocessing.get_context("spawn")
+    start_time = time.time()
+    process = context.Process(target=target, args=args)
+    process.start()
+    peak_memory = 0
+    while process.is_alive():
+        if any(e.is_set() for e in cancel_events):
+            kill_tree(process.pid)
+            process.join()
+            raise ProcessCancelled(f"process running {target.__name__} killed")
+        peak_memory = max(peak_memory, get_tree_memory(process.pid))
+        process.join(poll_interval)
+    process.join()
+    wall_time = time.time() - start_time
+    if process.exitcode != 0:
+        raise RuntimeError(
+            f"process running {target.__name__} exited with code "
+            f"{process.exitcode}"
+        )
+    return dict(
+        start_time=start_time,
+        wall_time=wall_time,
+        peak_memory_bytes=peak_memory,
+    )
@@ -0,0 +1,122 @@
+import os
+import glob
+import json
+from logging import Logger
+from threading import Lock
+from contextlib import contextmanager
+from typing import Iterator
+from cbm3_aws import process_identity
+from cbm3_aws.file_lock import FileLock
+
+
+class ScaleInProtection:
+    """Keeps an instance protected from autoscaling scale-in while any of
+    its worker processes holds a task.
+
+    The worker processes on an instance share a state directory. Each
+    process writes a marker file while it holds a task, and the first
+    process to become busy sets the instance's scale-in protection, while
+    the last process to become idle clears it. Markers left by processes
+    that have exited are ignored. Within a process, the marker is held
+    while any of the process' threads holds a task. Markers record the
+    process' id and creation time, since process ids are reused.
+
+    Args:
+        autoscale_client (AutoScalingClient): boto3 autoscaling client
+        auto_scaling_group_name (str): the name of the instance's group
+        instance_id (str): the EC2 instance id
+        state_dir (str): directory shared by the worker processes on the
+            instance
+        process_index (int): identifies this worker process on the
+            instance
+        logger (Logger): the worker's logger
+    """
+
+    def __init__(
+        self,
+        autoscale_client,
+        auto_scaling_group_name: str,
+        instance_id: str,
+        state_dir: str,
+        process_index: int,
+        logger: Logger,
+    ):
+        self.autoscale_client = autoscale_client
+        self.auto_scaling_group_name = auto_scaling_group_name
+        self.instance_id = instance_id
+        self.state_dir = state_dir
+        self.process_index = process_index
+        self.logger = logger
+        self._lock = FileLock(os.path.join(state_dir, "protection.lock"))
+        self._marker_path = os.path.join(state_dir, f"busy_{process_index}")
+        self._thread_lock = Lock()
+        self._holds = 0
+
+    def _get_busy_processes(self) -> list[str]:
+        busy = []
+        for path in glob.glob(os.path.join(self.state_dir, "busy_*")):
+            try:
+                with open(path) as marker:
+                    identity = json.load(marker)
+            except ValueError:
+                # markers are written while holding the lock, so a partial
+                # marker was left by a process that crashed
+                identity = None
+            if identity and process_identity.is_running(identity):
+                busy.append(path)
+            else:
+                # the process exited without clearing its marker
+                os.remove(path)
+        return busy
+
+    def _set_protection(self, protected: bool) -> None:
+        try:
+            self.autoscale_client.set_instance_protection(
+                InstanceIds=[self.instance_id],
+                AutoScalingGroupName=self.auto_scaling_group_name,
+                ProtectedFromScaleIn=protected,
+            )
+            self.logger.info(f"instance scale-in protection: {protected}")
+        except Exception:
+            # failing to update the protection should not fail the task
+            self.logger.exception("failed to set instance protection")
+
+    def acquire(self) -> None:
+        """Mark this process busy, protecting the instance if it is the
+        first busy process.
+        """
+        with self._thread_lock:
+            self._holds += 1
+            if self._holds > 1:
+                return
+            with self._lock:
+                first = len(self._get_busy_processes()) == 0
+                with open(self._marker_path, "w") as marker:
+                    json.dump(process_identity.get_process_identity(), marker)
+                if first:
+                    self._set_protection(True)
+
+    def release(self) -> None:
+        """Mark this process idle, removing the instance's protection if
+        no other process is busy.
+        """
+        with self._thread_lock:
+            self._holds -= 1
+            if self._holds > 0:
+                return
+            with self._lock:
+                if os.path.exists(self._marker_path):
+                    os.remove(self._marker_path)
+                if not self._get_busy_processes():
+                    self._set_protection(False)
+
+    @contextmanager
+    def hold(self) -> Iterator[None]:
+        """Context manager that keeps the instance protected while the
+        block runs.
+        """
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
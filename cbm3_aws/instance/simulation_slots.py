@@ -0,0 +1,105 @@
+from threading import Condition
+from typing import Union
+
+
+class SimulationSlots:
+    """Simulation slots shared by the tasks a worker process holds at once.
+
+    Each held task reserves its simulations with :py:func:`reserve` when it
+    is leased. A simulation occupies one of the slots from the time it
+    starts until it finishes, and simulations of held tasks that have not
+    started yet are pending. A slot is free for a new task only when it is
+    not occupied by a running simulation or claimed by a pending one, so
+    that the worker leases another task only when the tasks it holds can
+    not fill its slots, for example while the last simulations of a task
+    run and upload.
+
+    Args:
+        n_slots (int): the number of simulations run at once
+    """
+
+    def __init__(self, n_slots: int):
+        self.n_slots = n_slots
+        self._condition = Condition()
+        self._running = 0
+        self._pending = 0
+
+    def reserve(self, n_simulations: int) -> "TaskSlots":
+        """Reserve slots for the simulations of a newly leased task
+
+        Args:
+            n_simulations (int): the number of simulations in the task
+
+        Returns:
+            TaskSlots: the task's handle for running its simulations
+        """
+        with self._condition:
+            self._pending += n_simulations
+        return TaskSlots(self, n_simulations)
+
+    def wait_for_free_slot(self, timeout: Union[float, None] = None) -> bool:
+        """Wait until a slot is neither running nor claimed by a pending
+        simulation
+
+        Args:
+            timeout (float, optional): seconds to wait. If None wait
+                indefinitely. Defaults to None.
+
+        Returns:
+            bool: True if a slot is free, False if the wait timed out
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._running + self._pending < self.n_slots,
+                timeout,
+            )
+
+
+class TaskSlots:
+    """One task's share of :py:class:`SimulationSlots`, used to start and
+    finish each of the task's simulations.
+
+    Args:
+        slots (SimulationSlots): the worker process' slots
+        n_pending (int): the number of simulations reserved
+    """
+
+    def __init__(self, slots: SimulationSlots, n_pending: int):
+        self._slots = slots
+        self._pending = n_pending
+
+    def set_pending(self, n_pending: int) -> None:
+        """Update the number of the task's simulations that have not
+        started, for example after skipping completed simulations
+
+        Args:
+            n_pending (int): the number of pending simulations
+        """
+        slots = self._slots
+        with slots._condition:
+            slots._pending += n_pending - self._pending
+            self._pending = n_pending
+            slots._condition.notify_all()
+
+    def acquire(self) -> None:
+        """Wait for a slot and occupy it with one of the task's
+        simulations
+        """
+        slots = self._slots
+        with slots._condition:
+            slots._condition.wait_for(lambda: slots._running < slots.n_slots)
+            slots._running += 1
+            if self._pending > 0:
+                self._pending -= 1
+                slots._pending -= 1
+
+    def release(self) -> None:
+        """Free the slot of a finished simulation"""
+        slots = self._slots
+        with slots._condition:
+            slots._running -= 1
+            slots._condition.notify_all()
+
+    def close(self) -> None:
+        """Release the reservation of any simulations that did not start"""
+        self.set_pending(0)
@@ -0,0 +1,142 @@
+import json
+import urllib.error
+import urllib.request
+from logging import Logger
+from threading import Event
+from threading import Thread
+from typing import Union
+
+# the EC2 instance metadata service endpoint
+DEFAULT_METADATA_URL = "http://169.254.169.254"
+
+# error name reported to the task state machine with send_task_failure
+# when a task is handed back because of a spot interruption. The cause is
+# the json task input for the task's unfinished simulations, which the
+# state machine restarts immediately.
+SPOT_INTERRUPTION_ERROR = "cbm3_aws.SpotInterruption"
+
+_TOKEN_TTL_SECONDS = 21600
+
+
+class TaskInterrupted(Exception):
+    """Raised when a task is stopped because the instance is about to be
+    interrupted.
+
+    Args:
+        remaining_simulations (list): the simulations of the task that did
+            not finish, in the task input "simulations" format
+    """
+
+    def __init__(self, remaining_simulations: list[dict]):
+        super().__init__(
+            f"task interrupted with {len(remaining_simulations)} projects "
+            "remaining"
+        )
+        self.remaining_simulations = remaining_simulations
+
+
+class MetadataClient:
+    """Minimal EC2 instance metadata (IMDSv2) client for the spot
+    interruption notice.
+
+    Args:
+        metadata_url (str, optional): the metadata service endpoint, which
+            may be replaced with a local stub for testing. Defaults to
+            :py:data:`DEFAULT_METADATA_URL`.
+        timeout (float, optional): seconds to wait on each request.
+            Defaults to 2.
+    """
+
+    def __init__(
+        self, metadata_url: str = DEFAULT_METADATA_URL, timeout: float = 2.0
+    ):
+        self.metadata_url = metadata_url.rstrip("/")
+        self.timeout = timeout
+        self._token: Union[str, None] = None
+
+    def _get_token(self) -> str:
+        request = urllib.request.Request(
+            f"{self.metadata_url}/latest/api/token",
+            method="PUT",
+            headers={
+                "X-aws-ec2-metadata-token-ttl-seconds": str(_TOKEN_TTL_SECONDS)
+            },
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.read().decode()
+
+    def _get(self, path: str) -> Union[str, None]:
+        if self._token is None:
+            self._token = self._get_token()
+        request = urllib.request.Request(
+            f"{self.metadata_url}/latest/meta-data/{path}",
+            headers={"X-aws-ec2-metadata-token": self._token},
+        )
+        try:
+            with urllib.request.urlopen(
+                request, timeout=self.timeout
+            ) as response:
+                return response.read().decode()
+        except urllib.error.HTTPError as error:
+            if error.code == 404:
+                return None
+            if error.code == 401:
+                # the token expired, get a new one on the next request
+                self._token = None
+            raise
+
+    def get_interruption_notice(self) -> Union[dict, None]:
+        """Get the spot interruption notice for this instance
+
+        Returns:
+            dict: the notice, with the "action" and its "time", or None if
+                the instance is not scheduled for interruption
+        """
+        notice = self._get("spot/instance-action")
+        if notice is None:
+            return None
+        return json.loads(notice)
+
+
+class SpotInterruptionWatcher(Thread):
+    """Daemon thread that polls the instance metadata for a spot
+    interruption notice, and sets :py:attr:`interrupted` when one is
+    issued. EC2 issues the notice two minutes before the instance is
+    stopped or terminated.
+
+    Args:
+        logger (Logger): the worker's logger
+        metadata_url (str, optional): the metadata service endpoint.
+            Defaults to :py:data:`DEFAULT_METADATA_URL`.
+        poll_interval (float, optional): seconds between polls. Defaults
+            to 5.
+    """
+
+    def __init__(
+        self,
+        logger: Logger,
+        metadata_url: str = DEFAULT_METADATA_URL,
+        poll_interval: float = 5.0,
+    ):
+        Thread.__init__(self, daemon=True)
+        self.logger = logger
+        self.metadata_client = MetadataClient(metadata_url)
+        self.poll_interval = poll_interval
+        self.interrupted = Event()
+        self.stopped = Event()
+
+    def run(self) -> None:
+        while not self.stopped.is_set():
+            try:
+                notice = self.metadata_client.get_interruption_notice()
+                if notice is not None:
+                    self.logger.warning(dict(spot_interruption=notice))
+                    self.interrupted.set()
+                    return
+            except Exception:
+                # metadata errors must not stop the worker
+                self.logger.exception("failed to poll instance metadata")
+            self.stopped.wait(self.poll_interval)
+
+    def stop(self) -> None:
+        self.stopped.set()
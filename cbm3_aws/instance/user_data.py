@@ -1,12 +1,49 @@
 import base64
+from typing import Union
+from cbm3_aws import transfer_profile as transfer
 
 
 def create_userdata(
-    activity_arn: str, s3_bucket_name: str, region_name: str
+    activity_arn: str,
+    s3_bucket_name: str,
+    region_name: str,
+    transfer_profile: Union[dict, None] = None,
+    auto_scaling_group_name: Union[str, None] = None,
+    dynamic_work_units: bool = False,
+    heartbeat_interval: Union[float, None] = None,
+    compact_results: bool = False,
+    max_task_attempts: Union[int, None] = None,
 ) -> str:
     """Creates the script to run at the start of each instance worker,
     passed to the ec2 instance launch user-data parameter.
 
+    Args:
+        activity_arn (str): the resource name for the activity task polled
+            by the instance workers
+        s3_bucket_name (str): the name of the s3 bucket the instance
+            workers interact with
+        region_name (str): AWS region name
+        transfer_profile (dict, optional): S3 multipart transfer settings
+            for the instance workers, see
+            :py:func:`cbm3_aws.transfer_profile.get_transfer_profile`. If
+            None the default profile is used. Defaults to None.
+        auto_scaling_group_name (str, optional): the name of the instances'
+            autoscaling group, used by the workers to protect busy
+            instances from scale-in. Defaults to None.
+        dynamic_work_units (bool, optional): if True the workers lease
+            simulation-sized work units to keep each of their simulation
+            slots busy. Defaults to False.
+        heartbeat_interval (float, optional): seconds between the
+            heartbeats the workers send for each task. If None the
+            worker default is used. Defaults to None.
+        compact_results (bool, optional): if True the workers write each
+            task's result to S3 and report only counts and the S3 key to
+            the state machine. Defaults to False.
+        max_task_attempts (int, optional): the number of attempts at a
+            task failing with retryable errors before the workers
+            quarantine it, which should match the state machine's retry
+            policy. If None the worker default is used. Defaults to None.
+
     Returns:
         str: lines of commands to run in AWS EC2 user-data at EC2 startup
     """
@@ -15,8 +52,25 @@ def create_userdata(
         "cbm3_aws_instance "
         f"--activity_arn {activity_arn} "
         f"--s3_bucket_name {s3_bucket_name} "
-        f"--region_name {region_name}"
+        f"--region_name {region_name} "
+        + " ".join(transfer.to_command_line(transfer_profile))
     )
+    if auto_scaling_group_name:
+        instance_run_script_command += (
+            f" --auto_scaling_group_name {auto_scaling_group_name}"
+        )
+    if dynamic_work_units:
+        instance_run_script_command += " --dynamic_work_units"
+    if heartbeat_interval is not None:
+        instance_run_script_command += (
+            f" --heartbeat_interval {heartbeat_interval}"
+        )
+    if compact_results:
+        instance_run_script_command += " --compact_results"
+    if max_task_attempts is not None:
+        instance_run_script_command += (
+            f" --max_task_attempts {max_task_attempts}"
+        )
 
     commands = [
         "<powershell>",
@@ -0,0 +1,221 @@
+import os
+import sys
+import zlib
+import shutil
+import zipfile
+from collections import deque
+from tempfile import SpooledTemporaryFile
+from concurrent.futures import ThreadPoolExecutor
+
+# members with these extensions are already compressed, so they are stored
+# rather than deflated
+STORED_EXTENSIONS = {
+    ".zip",
+    ".gz",
+    ".bz2",
+    ".xz",
+    ".7z",
+    ".rar",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+}
+
+# members smaller than this number of bytes are stored rather than deflated
+STORE_SIZE_THRESHOLD = 1024
+
+_CHUNK_SIZE = 1024**2
+
+# compressed members up to this size are held in memory before being
+# written to the archive, larger members are spooled to disk
+_SPOOL_MAX_SIZE = 16 * 1024**2
+
+# zipfile has no public API for writing an already compressed member, so
+# _write_member relies on ZipFile internals that are verified for each
+# minor version up to this one. Later versions compress sequentially.
+MAX_VERIFIED_PYTHON_VERSION = (3, 13)
+
+_ZIPFILE_INTERNALS = (
+    "fp",
+    "start_dir",
+    "filelist",
+    "NameToInfo",
+    "_writecheck",
+    "_didModify",
+)
+
+
+def _is_stored(path: str, compression_level: int) -> bool:
+    if compression_level == 0:
+        return True
+    if os.path.splitext(path)[1].lower() in STORED_EXTENSIONS:
+        return True
+    return os.path.getsize(path) < STORE_SIZE_THRESHOLD
+
+
+def get_compression(path: str, compression_level: int) -> int:
+    """Gets the zipfile compression type to use for the specified file
+
+    Args:
+        path (str): path to the file to archive
+        compression_level (int): the deflate compression level, where 0
+            means every file is stored without compression
+
+    Returns:
+        int: either zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED
+    """
+    if _is_stored(path, compression_level):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def _compress_member(
+    path: str, arcname: str, compression_level: int
+) -> tuple[zipfile.ZipInfo, SpooledTemporaryFile]:
+    zinfo = zipfile.ZipInfo.from_file(path, arcname)
+    zinfo.compress_type = get_compression(path, compression_level)
+    compressor = None
+    if zinfo.compress_type == zipfile.ZIP_DEFLATED:
+        # negative wbits produces the raw deflate stream used in zip files
+        compressor = zlib.compressobj(
+            compression_level, zlib.DEFLATED, -zlib.MAX_WBITS
+        )
+    crc = 0
+    data = SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE)
+    with open(path, "rb") as src:
+        while True:
+            chunk = src.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            data.write(compressor.compress(chunk) if compressor else chunk)
+    if compressor:
+        data.write(compressor.flush())
+    zinfo.CRC = crc
+    zinfo.compress_size = data.tell()
+    return zinfo, data
+
+
+def supports_parallel_compression(zip: zipfile.ZipFile) -> bool:
+    """Check if compressed members can be appended to the specified
+    archive, which requires the ZipFile internals of a verified Python
+    version.
+
+    Args:
+        zip (zipfile.ZipFile): an archive open for writing
+
+    Returns:
+        bool: True if members can be compressed in parallel
+    """
+    return sys.version_info[:2] <= MAX_VERIFIED_PYTHON_VERSION and all(
+        hasattr(zip, name) for name in _ZIPFILE_INTERNALS
+    )
+
+
+def _write_member(
+    zip: zipfile.ZipFile,
+    zinfo: zipfile.ZipInfo,
+    data: SpooledTemporaryFile,
+) -> None:
+    # appends an already compressed member, following the steps taken by
+    # ZipFile.open(zinfo, "w") and the close method of the file object it
+    # returns.
+    zip.fp.seek(zip.start_dir)
+    zinfo.header_offset = zip.fp.tell()
+    zip._writecheck(zinfo)
+    zip._didModify = True
+    zip.fp.write(zinfo.FileHeader())
+    data.seek(0)
+    shutil.copyfileobj(data, zip.fp, _CHUNK_SIZE)
+    data.close()
+    zip.filelist.append(zinfo)
+    zip.NameToInfo[zinfo.filename] = zinfo
+    zip.start_dir = zip.fp.tell()
+
+
+def _iterate_members(source_dir: str):
+    relroot = os.path.abspath(source_dir)
+    for root, dirs, files in os.walk(source_dir):
+        # add directory (needed for empty dirs)
+        yield False, root, os.path.relpath(root, relroot)
+        for _file in files:
+            filename = os.path.join(root, _file)
+            if os.path.isfile(filename):  # regular files only
+                yield True, filename, os.path.join(
+                    os.path.relpath(root, relroot), _file
+                )
+
+
+def make_zipfile(
+    output_filename: str,
+    source_dir: str,
+    compression_level: int = 6,
+    max_workers: int = 4,
+) -> None:
+    """Create a zip archive of a directory, compressing its files in
+    parallel on a thread pool.
+
+    zlib releases the GIL while compressing, so members are compressed
+    concurrently by the pool and then appended to the archive in directory
+    walk order by the calling thread. Files with an extension in
+    :py:data:`STORED_EXTENSIONS`, or smaller than
+    :py:data:`STORE_SIZE_THRESHOLD` bytes are stored without compression.
+
+    On Python versions newer than :py:data:`MAX_VERIFIED_PYTHON_VERSION`
+    the members are compressed one at a time with the public zipfile API.
+
+    Args:
+        output_filename (str): path to the zip file to create
+        source_dir (str): the directory to archive
+        compression_level (int, optional): the deflate compression level
+            from 0 to 9, where 0 stores every file without compression.
+            Defaults to 6.
+        max_workers (int, optional): the number of compression threads.
+            Defaults to 4.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        with zipfile.ZipFile(
+            output_filename, "w", zipfile.ZIP_DEFLATED, allowZip64=True
+        ) as zip:
+            if not supports_parallel_compression(zip):
+                for is_file, path, arcname in _iterate_members(source_dir):
+                    if is_file:
+                        zip.write(
+                            path,
+                            arcname,
+                            get_compression(path, compression_level),
+                            compression_level,
+                        )
+                    else:
+                        zip.write(path, arcname)
+                return
+            pending = deque()
+
+            def write_next():
+                is_file, member = pending.popleft()
+                if is_file:
+                    _write_member(zip, *member.result())
+                else:
+                    zip.write(*member)
+
+            for is_file, path, arcname in _iterate_members(source_dir):
+                if is_file:
+                    pending.append(
+                        (
+                            True,
+                            executor.submit(
+                                _compress_member,
+                                path,
+                                arcname,
+                                compression_level,
+                            ),
+                        )
+                    )
+                else:
+                    pending.append((False, (path, arcname)))
+                # bound the number of compressed members held at once
+                while len(pending) > 2 * max_workers:
+                    write_next()
+            while pending:
+                write_next()
@@ -0,0 +1,39 @@
+import os
+from typing import Union
+import psutil
+
+
+def get_process_identity(pid: Union[int, None] = None) -> dict:
+    """Get a value identifying a running process, for recording in marker
+    files shared by the worker processes on an instance.
+
+    Process ids are reused once a process exits, in particular on Windows,
+    so the process' creation time is recorded along with its id.
+
+    Args:
+        pid (int, optional): the process id. If None the current process
+            is identified. Defaults to None.
+
+    Returns:
+        dict: the "pid" and "create_time" of the process
+    """
+    process = psutil.Process(os.getpid() if pid is None else pid)
+    return dict(pid=process.pid, create_time=process.create_time())
+
+
+def is_running(identity: dict) -> bool:
+    """Check if the process identified by a value returned by
+    :py:func:`get_process_identity` is still running.
+
+    Args:
+        identity (dict): the process identity
+
+    Returns:
+        bool: True if a process with the recorded id exists and was created
+            at the recorded time
+    """
+    try:
+        process = psutil.Process(identity["pid"])
+        return process.create_time() == identity["create_time"]
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return False
@@ -0,0 +1,327 @@
+import os
+import glob
+import json
+import uuid
+import shutil
+import hashlib
+import tempfile
+from threading import Lock
+from typing import Union
+from cbm3_aws import log_helper
+from cbm3_aws import process_identity
+from cbm3_aws.file_lock import FileLock
+from cbm3_aws.s3_interface import S3Interface
+
+logger = log_helper.get_logger(__name__)
+
+
+def _get_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for _file in files:
+            size += os.path.getsize(os.path.join(root, _file))
+    return size
+
+
+class ResourceCache(object):
+    """Persistent, instance wide cache of unpacked S3 documents.
+
+    Entries are addressed by the S3 ETag and size of the compressed
+    document, so an unchanged document is downloaded and unpacked once per
+    instance no matter how many tasks or worker processes request it.
+    Population of each entry is guarded by a file lock so that concurrent
+    worker processes share a single copy. When the total size of the cache
+    exceeds the specified budget the least recently used entries are
+    evicted.
+
+    An entry returned by :py:func:`get` is pinned until it is passed to
+    :py:func:`release`, and pinned entries are never evicted. Pins are
+    recorded in marker files so that they are seen by all of the worker
+    processes, and the pins of processes that have exited are ignored.
+
+    The last seen ETag of each S3 key is recorded so that subsequent
+    requests for the key revalidate the cached copy with a conditional HEAD
+    request.
+
+    Cached content is shared and must be treated as read only by callers.
+
+    Args:
+        cache_dir (str): directory in which cached entries are stored. It
+            is created if it does not exist.
+        max_size_bytes (int): the total size of unpacked entries above which
+            the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_size_bytes: int):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        # identifies this cache object's pin markers
+        self._pin_name = "{0}_{1}.json".format(os.getpid(), uuid.uuid4().hex)
+        self._pin_lock = Lock()
+        self._pin_counts: dict[str, int] = {}
+        self._pinned_addresses: dict[str, str] = {}
+
+    def _get_address(self, head: dict, local_name: str) -> str:
+        token = "{0}:{1}:{2}".format(
+            head["ETag"], head["ContentLength"], local_name
+        )
+        return hashlib.sha1(token.encode()).hexdigest()
+
+    def _get_entry_dir(self, address: str) -> str:
+        return os.path.join(self.cache_dir, address)
+
+    def _get_entry_lock(self, address: str) -> FileLock:
+        return FileLock(os.path.join(self.cache_dir, f"{address}.lock"))
+
+    def _get_pin_path(self, address: str, pin_name: str = "*") -> str:
+        return os.path.join(self.cache_dir, "pins", address, pin_name)
+
+    def _pin(self, address: str, content_path: str) -> None:
+        with self._pin_lock:
+            count = self._pin_counts.get(address, 0)
+            if count == 0:
+                path = self._get_pin_path(address, self._pin_name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as pin_file:
+                    json.dump(
+                        process_identity.get_process_identity(), pin_file
+                    )
+            self._pin_counts[address] = count + 1
+            self._pinned_addresses[content_path] = address
+
+    def _is_pinned(self, address: str) -> bool:
+        pinned = False
+        for path in glob.glob(self._get_pin_path(address)):
+            try:
+                with open(path) as pin_file:
+                    identity = json.load(pin_file)
+            except FileNotFoundError:
+                # the pin was released
+                continue
+            except ValueError:
+                # pins are written while holding the entry lock, so a
+                # partial pin was left by a process that crashed
+                identity = None
+            if identity and process_identity.is_running(identity):
+                pinned = True
+            else:
+                # the pinning process exited without releasing the pin
+                os.remove(path)
+        return pinned
+
+    def release(self, content_path: str) -> None:
+        """Release a pin taken on an entry by :py:func:`get`, allowing the
+        entry to be evicted once no other task uses it.
+
+        Args:
+            content_path (str): a path returned by :py:func:`get`
+        """
+        with self._pin_lock:
+            address = self._pinned_addresses.get(content_path)
+            if address is None:
+                return
+            self._pin_counts[address] -= 1
+            if self._pin_counts[address] > 0:
+                return
+            del self._pin_counts[address]
+            del self._pinned_addresses[content_path]
+            path = self._get_pin_path(address, self._pin_name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _get_metadata_path(self, address: str) -> str:
+        return os.path.join(self._get_entry_dir(address), "entry.json")
+
+    def _get_key_record_path(self, key: str, local_name: str) -> str:
+        token = "{0}:{1}".format(key, local_name)
+        return os.path.join(
+            self.cache_dir,
+            "keys",
+            "{0}.json".format(hashlib.sha1(token.encode()).hexdigest()),
+        )
+
+    def _read_key_record(self, key: str, local_name: str) -> Union[dict, None]:
+        path = self._get_key_record_path(key, local_name)
+        if not os.path.isfile(path):
+            return None
+        with open(path) as record_file:
+            return json.load(record_file)
+
+    def _write_key_record(
+        self, key: str, local_name: str, address: str, head: dict
+    ) -> None:
+        path = self._get_key_record_path(key, local_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write then rename so that concurrent readers never see a partially
+        # written record
+        with tempfile.NamedTemporaryFile(
+            "w", dir=os.path.dirname(path), delete=False
+        ) as record_file:
+            json.dump(dict(address=address, head=head), record_file)
+        os.replace(record_file.name, path)
+
+    def _list_entries(self) -> list[dict]:
+        entries = []
+        for address in os.listdir(self.cache_dir):
+            metadata_path = self._get_metadata_path(address)
+            if not os.path.isfile(metadata_path):
+                continue
+            with open(metadata_path) as metadata_file:
+                metadata = json.load(metadata_file)
+            metadata["address"] = address
+            metadata["last_used"] = os.path.getmtime(metadata_path)
+            entries.append(metadata)
+        return entries
+
+    def _populate(
+        self,
+        s3_interface: S3Interface,
+        key_name_prefix: str,
+        document_name: str,
+        address: str,
+        content_path: str,
+        head: dict,
+    ) -> None:
+        entry_dir = self._get_entry_dir(address)
+        # remove the remains of any previously interrupted download
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        try:
+            s3_interface.download_compressed(
+                key_name_prefix=key_name_prefix,
+                document_name=document_name,
+                local_path=content_path,
+            )
+            metadata = dict(
+                key=s3_interface.get_compressed_key(
+                    key_name_prefix, document_name
+                ),
+                etag=head["ETag"],
+                version_id=head["VersionId"],
+                size=_get_size(content_path),
+            )
+            # the metadata file is written last: its presence marks the
+            # entry as complete
+            with open(self._get_metadata_path(address), "w") as out_file:
+                json.dump(metadata, out_file)
+        except Exception:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            raise
+
+    def evict(self, keep: Union[str, None] = None) -> None:
+        """Evict least recently used entries until the total cache size is
+        under the budget. Pinned entries are not evicted.
+
+        Args:
+            keep (str, optional): the address of an entry that will not be
+                evicted. Defaults to None.
+        """
+        with FileLock(os.path.join(self.cache_dir, "cache.lock")):
+            entries = sorted(
+                self._list_entries(), key=lambda x: x["last_used"]
+            )
+            total_size = sum([x["size"] for x in entries])
+            for entry in entries:
+                if total_size <= self.max_size_bytes:
+                    break
+                if entry["address"] == keep:
+                    continue
+                with self._get_entry_lock(entry["address"]):
+                    # entries are pinned while holding their lock, so the
+                    # check can not miss a pin taken by another process
+                    if self._is_pinned(entry["address"]):
+                        continue
+                    logger.info(
+                        "resource cache evicting '{0}' ({1} bytes)".format(
+                            entry["key"], entry["size"]
+                        )
+                    )
+                    shutil.rmtree(
+                        self._get_entry_dir(entry["address"]),
+                        ignore_errors=True,
+                    )
+                total_size -= entry["size"]
+
+    def get(
+        self,
+        s3_interface: S3Interface,
+        key_name_prefix: str,
+        document_name: str,
+        local_name: str,
+    ) -> str:
+        """Get the local path to the unpacked content of a document uploaded
+        with :py:func:`cbm3_aws.s3_interface.S3Interface.upload_compressed`,
+        downloading it only if the cache does not already hold a copy with
+        a matching ETag. The entry is pinned until the returned path is
+        passed to :py:func:`release`.
+
+        Args:
+            s3_interface (S3Interface): object used to access the document
+            key_name_prefix (str): the key prefix of the document
+            document_name (str): the name of the document
+            local_name (str): the file or directory name given to the
+                unpacked content
+
+        Returns:
+            str: the path to the unpacked file or directory
+        """
+        key = s3_interface.get_compressed_key(key_name_prefix, document_name)
+        record = self._read_key_record(key, local_name)
+        if record is not None and os.path.isfile(
+            self._get_metadata_path(record["address"])
+        ):
+            # a changed object is returned by the conditional request, so a
+            # single HEAD request is made either way
+            head = s3_interface.head_object(
+                key, if_none_match=record["head"]["ETag"]
+            )
+        else:
+            head = s3_interface.head_object(key)
+        if head is None:
+            self.revalidations += 1
+            address = record["address"]
+            head = record["head"]
+        else:
+            address = self._get_address(head, local_name)
+        content_path = os.path.join(
+            self._get_entry_dir(address), "content", local_name
+        )
+        with self._get_entry_lock(address):
+            metadata_path = self._get_metadata_path(address)
+            if os.path.isfile(metadata_path):
+                self.hits += 1
+                cache_status = "hit"
+                # the modification time of the metadata file tracks use
+                os.utime(metadata_path)
+            else:
+                self.misses += 1
+                cache_status = "miss"
+                self._populate(
+                    s3_interface,
+                    key_name_prefix,
+                    document_name,
+                    address,
+                    content_path,
+                    head,
+                )
+            self._write_key_record(key, local_name, address, head)
+            self._pin(address, content_path)
+        logger.info(
+            "resource cache {0} for '{1}/{2}' "
+            "(hits={3}, misses={4}, revalidations={5})".format(
+                cache_status,
+                key_name_prefix,
+                document_name,
+                self.hits,
+                self.misses,
+                self.revalidations,
+            )
+        )
+        self.evict(keep=address)
+        return content_path
@@ -0,0 +1,210 @@
+import sqlite3
+import statistics
+from typing import Union
+from cbm3_aws.s3_io import S3IO
+
+# the fields of each simulation runtime record. Download fields are
+# measured for the whole task, since all downloads happen before the task's
+# simulations start, and are repeated in the record of each of the task's
+# simulations.
+RECORD_FIELDS = [
+    ("execution", "TEXT"),
+    ("task_id", "TEXT"),
+    ("instance_id", "TEXT"),
+    ("project_code", "TEXT"),
+    ("simulation_id", "INTEGER"),
+    ("start_time", "REAL"),
+    ("wall_time", "REAL"),
+    ("peak_memory_bytes", "INTEGER"),
+    ("upload_bytes", "INTEGER"),
+    ("upload_seconds", "REAL"),
+    ("task_download_bytes", "INTEGER"),
+    ("task_download_seconds", "REAL"),
+    ("succeeded", "INTEGER"),
+]
+
+
+def create_record(**kwargs) -> dict:
+    """Create a runtime record with a value, or None, for each of
+    :py:data:`RECORD_FIELDS`
+
+    Returns:
+        dict: the record
+    """
+    unknown = set(kwargs.keys()) - set(f[0] for f in RECORD_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown runtime record fields: {unknown}")
+    return {name: kwargs.get(name) for name, _ in RECORD_FIELDS}
+
+
+def write_records(s3_io: S3IO, task_id: str, records: list[dict]) -> None:
+    """Write the runtime records for a task to the execution's runtime
+    history in S3, as a json lines document.
+
+    Args:
+        s3_io (S3IO): s3 io for the execution
+        task_id (str): identifies the task, see
+            :py:func:`cbm3_aws.instance.failure_policy.get_task_id`
+        records (list): the records created with :py:func:`create_record`
+    """
+    s3_io.put_jsonl(records, "runtime_history", task_id=task_id)
+
+
+def read_records(s3_io: S3IO) -> list[dict]:
+    """Read all runtime records written to the execution's runtime history
+    in S3
+
+    Args:
+        s3_io (S3IO): s3 io for the execution
+
+    Returns:
+        list: the records
+    """
+    return s3_io.get_all_jsonl("runtime_history")
+
+
+class RuntimeHistory:
+    """Local SQLite store of simulation runtime records, pulled from the
+    runtime history of one or more executions, with queries for runtime
+    estimates.
+
+    Args:
+        db_path (str): path to the SQLite database, which is created if it
+            does not exist
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        columns = ", ".join(f"{name} {kind}" for name, kind in RECORD_FIELDS)
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS simulation_runtime ({columns}, "
+            "PRIMARY KEY (execution, project_code, simulation_id, "
+            "start_time))"
+        )
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_records(self, records: list[dict]) -> None:
+        """Add or replace the specified records
+
+        Args:
+            records (list): runtime records
+        """
+        names = [name for name, _ in RECORD_FIELDS]
+        placeholders = ", ".join("?" for _ in names)
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO simulation_runtime ({', '.join(names)}) "
+            f"VALUES ({placeholders})",
+            [[record.get(name) for name in names] for record in records],
+        )
+        self.connection.commit()
+
+    def pull(self, s3_io: S3IO) -> int:
+        """Add the runtime records of an execution from S3
+
+        Args:
+            s3_io (S3IO): s3 io for the execution
+
+        Returns:
+            int: the number of records pulled
+        """
+        records = read_records(s3_io)
+        self.add_records(records)
+        return len(records)
+
+    def _get_wall_times(
+        self, project_code: str, simulation_id: Union[int, None]
+    ) -> list[float]:
+        query = (
+            "SELECT wall_time FROM simulation_runtime WHERE succeeded = 1 "
+            "AND wall_time IS NOT NULL AND project_code = ?"
+        )
+        params = [project_code]
+        if simulation_id is not None:
+            query += " AND simulation_id = ?"
+            params.append(simulation_id)
+        return [row[0] for row in self.connection.execute(query, params)]
+
+    def get_estimate(
+        self, project_code: str, simulation_id: Union[int, None] = None
+    ) -> Union[float, None]:
+        """Estimate the runtime of a simulation as the median of the
+        successful runs of the same simulation, or if there are none, of
+        the successful runs of all simulations of the project.
+
+        Args:
+            project_code (str): the project code
+            simulation_id (int, optional): the simulation id. If None the
+                project wide estimate is returned. Defaults to None.
+
+        Returns:
+            float: the estimated wall time in seconds, or None if there is
+                no history for the project
+        """
+        wall_times = []
+        if simulation_id is not None:
+            wall_times = self._get_wall_times(project_code, simulation_id)
+        if not wall_times:
+            wall_times = self._get_wall_times(project_code, None)
+        if not wall_times:
+            return None
+        return statistics.median(wall_times)
+
+    def add_estimates(self, simulations: list[dict]) -> list[dict]:
+        """Fill in the "runtime" of the specified simulations that have no
+        runtime, for use with :py:mod:`cbm3_aws.task_packer`
+
+        Args:
+            simulations (list): list of dicts with "project_code",
+                "simulation_id" and optionally "runtime" keys
+
+        Returns:
+            list: copies of the simulations, with estimated runtimes where
+                history is available
+        """
+        result = []
+        for simulation in simulations:
+            simulation = dict(simulation)
+            if simulation.get("runtime") is None:
+                estimate = self.get_estimate(
+                    simulation["project_code"], simulation["simulation_id"]
+                )
+                if estimate is not None:
+                    simulation["runtime"] = estimate
+            result.append(simulation)
+        return result
+
+    def get_project_summary(self) -> list[dict]:
+        """Summarize the history of each project for capacity planning
+
+        Returns:
+            list: for each project the number of successful runs, and the
+                mean and max wall time, max peak memory and mean upload
+                bytes of those runs
+        """
+        rows = self.connection.execute(
+            "SELECT project_code, COUNT(*), AVG(wall_time), MAX(wall_time), "
+            "MAX(peak_memory_bytes), AVG(upload_bytes) "
+            "FROM simulation_runtime WHERE succeeded = 1 "
+            "GROUP BY project_code ORDER BY project_code"
+        )
+        return [
+            dict(
+                project_code=row[0],
+                runs=row[1],
+                mean_wall_time=row[2],
+                max_wall_time=row[3],
+                max_peak_memory_bytes=row[4],
+                mean_upload_bytes=row[5],
+            )
+            for row in rows
+        ]
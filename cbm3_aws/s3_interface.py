@@ -1,24 +1,90 @@
 import os
+import json
+import time
 import shutil
 import zipfile
+from typing import Union
+from typing import Iterator
+from threading import Lock
+from contextlib import contextmanager
 from tempfile import TemporaryDirectory
 from cbm3_aws import log_helper
+from cbm3_aws.s3_range_reader import S3RangeReader
+from cbm3_aws import parallel_zip
+from cbm3_aws import transfer_profile as transfer
 from mypy_boto3_s3.service_resource import S3ServiceResource
-from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
 
 logger = log_helper.get_logger(__name__)
 
 
 class S3Interface(object):
+    """Upload and download files and compressed documents to an S3 bucket
+
+    Args:
+        s3_resource (S3ServiceResource): boto3 s3 resource
+        bucket_name (str): the name of the bucket
+        local_temp_dir (str, optional): directory for temporary archives.
+            If None a new temporary directory is used for each transfer.
+            Defaults to None.
+        stream_downloads (bool, optional): if True
+            :py:func:`download_compressed` reads archives with ranged GET
+            requests and extracts each member directly to its destination
+            rather than first downloading the archive to disk. Defaults to
+            False.
+        stream_block_size (int, optional): the size in bytes of each ranged
+            GET request when stream_downloads is set. Defaults to 8MiB.
+        compression_level (int, optional): deflate compression level from 0
+            to 9 for archives created by :py:func:`upload_compressed`. 0
+            stores files without compression. Defaults to 6.
+        archive_workers (int, optional): if greater than 1, directories are
+            archived by compressing files in parallel on this number of
+            threads. Defaults to 1.
+        transfer_profile (dict, optional): multipart transfer settings, see
+            :py:func:`cbm3_aws.transfer_profile.get_transfer_profile`. If
+            None the default profile is used. Defaults to None.
+    """
+
     def __init__(
         self,
         s3_resource: S3ServiceResource,
         bucket_name: str,
+        local_temp_dir: Union[str, None] = None,
+        stream_downloads: bool = False,
+        stream_block_size: int = 8 * 1024**2,
+        compression_level: int = 6,
+        archive_workers: int = 1,
+        transfer_profile: Union[dict, None] = None,
     ):
         self.bucket_name = bucket_name
         self.bucket = s3_resource.Bucket(bucket_name)
+        self.local_temp_dir = local_temp_dir
+        self.stream_downloads = stream_downloads
+        self.stream_block_size = stream_block_size
+        self.compression_level = compression_level
+        self.archive_workers = archive_workers
+        self.transfer_profile = transfer.get_transfer_profile(transfer_profile)
         self._format = "zip"
         self._singleFileFlag = "__is__single__file_archive__"
+        # running totals of the bytes transferred by this object
+        self.bytes_downloaded = 0
+        self.bytes_uploaded = 0
+        self._counter_lock = Lock()
+
+    def _count_bytes(
+        self, downloaded: Union[int, None] = 0, uploaded: Union[int, None] = 0
+    ) -> None:
+        with self._counter_lock:
+            self.bytes_downloaded += downloaded or 0
+            self.bytes_uploaded += uploaded or 0
+
+    @contextmanager
+    def _temp_dir(self) -> Iterator[str]:
+        if self.local_temp_dir:
+            yield self.local_temp_dir
+        else:
+            with TemporaryDirectory() as temp_dir:
+                yield temp_dir
 
     def download_file(self, keyName, localPath) -> None:
         logger.info(
@@ -26,16 +92,195 @@ class S3Interface(object):
                 keyName, localPath
             )
         )
+        object_size = None
+        if self.transfer_profile["adaptive"]:
+            object_size = self.head_object(keyName)["ContentLength"]
+        start_time = time.time()
         self.bucket.download_file(
-            keyName, localPath, Config=TransferConfig(num_download_attempts=10)
+            keyName,
+            localPath,
+            Config=transfer.get_transfer_config(
+                self.transfer_profile, object_size
+            ),
         )
+        n_bytes = self._get_local_size(localPath)
+        self._count_bytes(downloaded=n_bytes)
+        self._log_throughput("downloaded", keyName, n_bytes, start_time)
 
     def upload_file(self, localPath: str, keyName: str) -> None:
         logger.info(
             "uploading file '{0}' to S3 '{1}'".format(localPath, keyName)
         )
+        object_size = self._get_local_size(localPath)
+        start_time = time.time()
         self.bucket.upload_file(
-            localPath, keyName, Config=TransferConfig(num_download_attempts=10)
+            localPath,
+            keyName,
+            Config=transfer.get_transfer_config(
+                self.transfer_profile, object_size
+            ),
+        )
+        self._count_bytes(uploaded=object_size)
+        self._log_throughput("uploaded", keyName, object_size, start_time)
+
+    def _get_local_size(self, localPath: str) -> Union[int, None]:
+        if os.path.isfile(localPath):
+            return os.path.getsize(localPath)
+        return None
+
+    def _log_throughput(
+        self,
+        action: str,
+        keyName: str,
+        n_bytes: Union[int, None],
+        start_time: float,
+    ) -> None:
+        if n_bytes is None:
+            return
+        elapsed = max(time.time() - start_time, 1e-6)
+        logger.info(
+            "{0} '{1}': {2} bytes in {3:.1f}s ({4:.0f} bytes/sec)".format(
+                action, keyName, n_bytes, elapsed, n_bytes / elapsed
+            )
+        )
+
+    def head_object(
+        self, keyName: str, if_none_match: Union[str, None] = None
+    ) -> Union[dict, None]:
+        """Get the metadata for the object stored at the specified key
+        without downloading it.
+
+        Args:
+            keyName (str): the S3 key of the object
+            if_none_match (str, optional): if specified, a conditional
+                request is made and None is returned if the object's ETag
+                matches this value. Defaults to None.
+
+        Returns:
+            dict: dictionary with the "ETag", "ContentLength" and
+                "VersionId" (None if the bucket is not versioned) of
+                the object, or None if the object is not modified.
+        """
+        kwargs = dict(Bucket=self.bucket_name, Key=keyName)
+        if if_none_match:
+            kwargs["IfNoneMatch"] = if_none_match
+        try:
+            response = self.bucket.meta.client.head_object(**kwargs)
+        except ClientError as err:
+            if if_none_match and err.response["Error"]["Code"] == "304":
+                return None
+            raise
+        return dict(
+            ETag=response["ETag"],
+            ContentLength=response["ContentLength"],
+            VersionId=response.get("VersionId"),
+        )
+
+    def put_bytes(
+        self,
+        keyName: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+    ) -> None:
+        """Store a small object at the specified key with a single request.
+
+        Args:
+            keyName (str): the S3 key to write
+            data (bytes): the object contents
+            content_type (str, optional): the object's content type.
+                Defaults to "application/octet-stream".
+        """
+        self.bucket.meta.client.put_object(
+            Bucket=self.bucket_name,
+            Key=keyName,
+            Body=data,
+            ContentType=content_type,
+        )
+
+    def get_bytes(self, keyName: str) -> Union[bytes, None]:
+        """Get the contents of a small object with a single request.
+
+        Args:
+            keyName (str): the S3 key to read
+
+        Returns:
+            bytes: the object contents, or None if no object exists at the
+                specified key.
+        """
+        try:
+            response = self.bucket.meta.client.get_object(
+                Bucket=self.bucket_name, Key=keyName
+            )
+        except ClientError as err:
+            if err.response["Error"]["Code"] in ["NoSuchKey", "404"]:
+                return None
+            raise
+        return response["Body"].read()
+
+    def list_keys(self, prefix: str) -> list[str]:
+        """List the keys of all objects starting with the specified prefix
+
+        Args:
+            prefix (str): the key prefix
+
+        Returns:
+            list: the matching keys
+        """
+        paginator = self.bucket.meta.client.get_paginator("list_objects_v2")
+        keys = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            keys.extend(x["Key"] for x in page.get("Contents", []))
+        return keys
+
+    def put_json(self, keyName: str, data: object) -> None:
+        """Store a json serializable object at the specified key.
+
+        Args:
+            keyName (str): the S3 key to write
+            data (object): json serializable object
+        """
+        self.put_bytes(keyName, json.dumps(data).encode(), "application/json")
+
+    def get_json(self, keyName: str) -> object:
+        """Get an object stored with :py:func:`put_json`.
+
+        Args:
+            keyName (str): the S3 key to read
+
+        Returns:
+            object: the deserialized object, or None if no object exists
+                at the specified key.
+        """
+        data = self.get_bytes(keyName)
+        if data is None:
+            return None
+        return json.loads(data)
+
+    def delete_object(self, keyName: str) -> None:
+        """Delete the object at the specified key, if it exists.
+
+        Args:
+            keyName (str): the S3 key to delete
+        """
+        self.bucket.meta.client.delete_object(
+            Bucket=self.bucket_name, Key=keyName
+        )
+
+    def get_compressed_key(
+        self, key_name_prefix: str, document_name: str
+    ) -> str:
+        """Gets the S3 key used by :py:func:`upload_compressed` and
+        :py:func:`download_compressed` for the specified document
+
+        Args:
+            key_name_prefix (str): the key prefix for the document
+            document_name (str): the name of the document
+
+        Returns:
+            str: the S3 key of the compressed document
+        """
+        return "/".join(
+            [key_name_prefix, "{0}.{1}".format(document_name, self._format)]
         )
 
     def make_zipfile(self, output_filename, source_dir) -> None:
@@ -43,9 +288,21 @@ class S3Interface(object):
         mostly borrowed from an answer on Stack overflow
         https://stackoverflow.com/questions/1855095/how-to-create-a-zip-archive-of-a-directory
         """
+        if self.archive_workers > 1:
+            parallel_zip.make_zipfile(
+                output_filename,
+                source_dir,
+                compression_level=self.compression_level,
+                max_workers=self.archive_workers,
+            )
+            return
         relroot = os.path.abspath(source_dir)
         with zipfile.ZipFile(
-            output_filename, "w", zipfile.ZIP_DEFLATED, allowZip64=True
+            output_filename,
+            "w",
+            zipfile.ZIP_DEFLATED,
+            allowZip64=True,
+            compresslevel=self.compression_level,
         ) as zip:
             for root, dirs, files in os.walk(source_dir):
                 # add directory (needed for empty dirs)
@@ -56,11 +313,22 @@ class S3Interface(object):
                         arcname = os.path.join(
                             os.path.relpath(root, relroot), _file
                         )
-                        zip.write(filename, arcname)
+                        zip.write(
+                            filename,
+                            arcname,
+                            parallel_zip.get_compression(
+                                filename, self.compression_level
+                            ),
+                        )
 
     def archive_file_or_directory(
-        self, pathToArchive: str, archiveName: str, temp_dir: str
+        self,
+        pathToArchive: str,
+        archiveName: str,
+        temp_dir: Union[str, None] = None,
     ) -> str:
+        if temp_dir is None:
+            temp_dir = self.local_temp_dir
         if os.path.isdir(pathToArchive):
             archivePath = os.path.join(temp_dir, archiveName)
             logger.debug(
@@ -81,13 +349,22 @@ class S3Interface(object):
                 )
             )
             with zipfile.ZipFile(
-                outputPath, "w", zipfile.ZIP_DEFLATED, True
+                outputPath,
+                "w",
+                zipfile.ZIP_DEFLATED,
+                True,
+                compresslevel=self.compression_level,
             ) as z:
-                z.write(pathToArchive, os.path.basename(pathToArchive))
-                singleFilePath = os.path.join(temp_dir, self._singleFileFlag)
-                with open(singleFilePath, mode="w"):
-                    z.write(singleFilePath, self._singleFileFlag)
-                os.remove(singleFilePath)
+                z.write(
+                    pathToArchive,
+                    os.path.basename(pathToArchive),
+                    parallel_zip.get_compression(
+                        pathToArchive, self.compression_level
+                    ),
+                )
+                # the flag is written from memory, since a flag file in
+                # the shared temp dir would be removed by concurrent calls
+                z.writestr(self._singleFileFlag, "")
             return outputPath
         else:
             raise ValueError(
@@ -104,37 +381,50 @@ class S3Interface(object):
             )
         )
         with zipfile.ZipFile(archive_name, "r", allowZip64=True) as z:
-            files = z.namelist()
-            if self._singleFileFlag in files:
-                if len(files) != 2:
-                    raise ValueError(
-                        "single file archive expected to have a single file"
-                    )
-                # it's a single file archive, so the destination path is
-                # assumed to be the full path to the filename
-                destinationDir = os.path.dirname(destination_path)
-                if not os.path.exists(destinationDir):
-                    os.makedirs(destinationDir)
-                destinationFileName = os.path.basename(destination_path)
-                compressedFileName = [
-                    x for x in files if x != self._singleFileFlag
-                ][0]
-                with TemporaryDirectory() as extraction_dir:
-                    z.extractall(extraction_dir)
-                    shutil.copyfile(
-                        src=os.path.join(extraction_dir, compressedFileName),
-                        dst=os.path.join(destinationDir, destinationFileName),
-                    )
-
-            else:
-                if not os.path.exists(destination_path):
-                    os.makedirs(destination_path)
-                z.extractall(destination_path)
+            self._extract_archive(z, destination_path)
+
+    def _extract_archive(
+        self, z: zipfile.ZipFile, destination_path: str
+    ) -> None:
+        files = z.namelist()
+        if self._singleFileFlag in files:
+            if len(files) != 2:
+                raise ValueError(
+                    "single file archive expected to have a single file"
+                )
+            # it's a single file archive, so the destination path is
+            # assumed to be the full path to the filename
+            destinationDir = os.path.dirname(destination_path)
+            if not os.path.exists(destinationDir):
+                os.makedirs(destinationDir)
+            compressedFileName = [
+                x for x in files if x != self._singleFileFlag
+            ][0]
+            # write the member directly to its destination
+            with z.open(compressedFileName) as src, open(
+                destination_path, "wb"
+            ) as dst:
+                shutil.copyfileobj(src, dst, length=1024**2)
+
+        else:
+            if not os.path.exists(destination_path):
+                os.makedirs(destination_path)
+            z.extractall(destination_path)
 
     def upload_compressed(
         self, key_name_prefix: str, document_name: str, local_path: str
-    ) -> None:
-        with TemporaryDirectory() as tempdir:
+    ) -> int:
+        """Archive and upload the specified file or directory
+
+        Args:
+            key_name_prefix (str): the key prefix for the document
+            document_name (str): the name of the document
+            local_path (str): path to the file or directory to upload
+
+        Returns:
+            int: the size in bytes of the uploaded archive
+        """
+        with self._temp_dir() as tempdir:
             fn = self.archive_file_or_directory(
                 local_path, document_name, tempdir
             )
@@ -142,21 +432,60 @@ class S3Interface(object):
             ext = os.path.splitext(fn)[1]
             document_name = document_name + ext
             s3_key = "/".join([key_name_prefix, document_name])
+            n_bytes = os.path.getsize(fn)
             self.upload_file(fn, s3_key)
             os.remove(fn)
+        return n_bytes
 
     def download_compressed(
         self, key_name_prefix: str, document_name: str, local_path: str
     ) -> None:
-        with TemporaryDirectory() as tempdir:
-            document_name = "{0}.{1}".format(document_name, self._format)
+        if self.stream_downloads:
+            self._download_compressed_streaming(
+                key_name_prefix, document_name, local_path
+            )
+            return
+        with self._temp_dir() as tempdir:
             archiveName = os.path.join(
-                tempdir, document_name.replace("/", "_")
+                tempdir,
+                "{0}.{1}".format(document_name, self._format).replace(
+                    "/", "_"
+                ),
             )
             # for the above replace: if the documentname itself represents a
             # nested S3 key, convert it to something that can be written to
             # file systems for the local temp file
-            s3_key = "/".join([key_name_prefix, document_name])
+            s3_key = self.get_compressed_key(key_name_prefix, document_name)
             self.download_file(s3_key, archiveName)
             self.unpack_file_or_directory(archiveName, local_path)
             os.remove(archiveName)
+
+    def _download_compressed_streaming(
+        self, key_name_prefix: str, document_name: str, local_path: str
+    ) -> None:
+        s3_key = self.get_compressed_key(key_name_prefix, document_name)
+        logger.info(
+            "streaming archive from S3 '{0}' to '{1}'".format(
+                s3_key, local_path
+            )
+        )
+        start_time = time.time()
+        head = self.head_object(s3_key)
+        with S3RangeReader(
+            client=self.bucket.meta.client,
+            bucket_name=self.bucket_name,
+            key=s3_key,
+            size=head["ContentLength"],
+            etag=head["ETag"],
+            block_size=self.stream_block_size,
+        ) as reader:
+            with zipfile.ZipFile(reader, "r", allowZip64=True) as z:
+                self._extract_archive(z, local_path)
+            bytes_fetched = reader.bytes_fetched
+        self._count_bytes(downloaded=bytes_fetched)
+        elapsed = max(time.time() - start_time, 1e-6)
+        logger.info(
+            "streamed '{0}': {1} bytes in {2:.1f}s ({3:.0f} bytes/sec)".format(
+                s3_key, bytes_fetched, elapsed, bytes_fetched / elapsed
+            )
+        )
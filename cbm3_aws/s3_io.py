@@ -1,12 +1,24 @@
+import os
+import json
+from typing import Union
+from concurrent.futures import ThreadPoolExecutor
 from cbm3_aws.s3_interface import S3Interface
+from cbm3_aws.resource_cache import ResourceCache
 
 
 class S3IO:
     def __init__(
-        self, execution_s3_key_prefix: str, s3_interface: S3Interface
+        self,
+        execution_s3_key_prefix: str,
+        s3_interface: S3Interface,
+        resource_cache: Union[ResourceCache, None] = None,
+        project_cache: Union[ResourceCache, None] = None,
     ):
         self.s3_interface = s3_interface
         self.execution_s3_key_prefix = execution_s3_key_prefix
+        self.resource_cache = resource_cache
+        self.project_cache = project_cache
+        self._cached_paths: list[tuple[ResourceCache, str]] = []
         self._register_methods()
 
     def _create_key_name_prefix(self, key_token) -> str:
@@ -22,6 +34,20 @@ class S3IO:
             ),
             "project": lambda **kwargs: f'{kwargs["project_code"]}',
             "resource": lambda **kwargs: f'{kwargs["resource_name"]}',
+            "task_failures": lambda **kwargs: f'{kwargs["task_id"]}',
+            "quarantine": lambda **kwargs: f'{kwargs["task_id"]}',
+            "runtime_history": lambda **kwargs: f'{kwargs["task_id"]}',
+            "task_status": lambda **kwargs: f'{kwargs["task_id"]}',
+            "completed": lambda **kwargs: (
+                f'{kwargs["project_code"]}_{kwargs["simulation_id"]}'
+            ),
+            "failures": lambda **kwargs: (
+                f'{kwargs["project_code"]}_{kwargs["simulation_id"]}'
+            ),
+        }
+        self.caches = {
+            "resource": self.resource_cache,
+            "project": self.project_cache,
         }
 
     def download(self, local_path, s3_key, **kwargs):
@@ -31,9 +57,128 @@ class S3IO:
             local_path=local_path,
         )
 
-    def upload(self, local_path, s3_key, **kwargs):
-        self.s3_interface.upload_compressed(
+    def download_cached(self, local_path, s3_key, **kwargs) -> str:
+        """Download the specified document using the cache configured for
+        the s3_key, if any, falling back to :py:func:`download`.
+
+        Args:
+            local_path (str): the path to download to if the s3_key is not
+                cached. When cached, only the base name of this path is used
+                to name the content in the cache.
+            s3_key (str): the type of document to download
+
+        Returns:
+            str: the path to the downloaded content, which is either
+                local_path or a path in the cache
+        """
+        cache = self.caches.get(s3_key)
+        if cache is None:
+            self.download(local_path, s3_key, **kwargs)
+            return local_path
+        cached_path = cache.get(
+            s3_interface=self.s3_interface,
+            key_name_prefix=self._create_key_name_prefix(s3_key),
+            document_name=self.doc_name_methods[s3_key](**kwargs),
+            local_name=os.path.basename(local_path),
+        )
+        self._cached_paths.append((cache, cached_path))
+        return cached_path
+
+    def release_cached(self) -> None:
+        """Release the cache entries returned by :py:func:`download_cached`
+        so that they can be evicted. Called once the task using them has
+        finished.
+        """
+        while self._cached_paths:
+            cache, cached_path = self._cached_paths.pop()
+            cache.release(cached_path)
+
+    def get_etag(self, s3_key, **kwargs) -> str:
+        """Get the S3 ETag of a document uploaded with :py:func:`upload`
+
+        Args:
+            s3_key (str): the type of document
+
+        Returns:
+            str: the ETag
+        """
+        key = self.s3_interface.get_compressed_key(
+            self._create_key_name_prefix(s3_key),
+            self.doc_name_methods[s3_key](**kwargs),
+        )
+        return self.s3_interface.head_object(key)["ETag"]
+
+    def upload(self, local_path, s3_key, **kwargs) -> int:
+        return self.s3_interface.upload_compressed(
             key_name_prefix=self._create_key_name_prefix(s3_key),
             document_name=self.doc_name_methods[s3_key](**kwargs),
             local_path=local_path,
         )
+
+    def _get_json_key(self, s3_key, extension=".json", **kwargs) -> str:
+        return "/".join(
+            [
+                self._create_key_name_prefix(s3_key),
+                f"{self.doc_name_methods[s3_key](**kwargs)}{extension}",
+            ]
+        )
+
+    def get_json_key(self, s3_key, **kwargs) -> str:
+        """Get the S3 key of a document stored with :py:func:`put_json`"""
+        return self._get_json_key(s3_key, **kwargs)
+
+    def put_json(self, data, s3_key, **kwargs):
+        self.s3_interface.put_json(self._get_json_key(s3_key, **kwargs), data)
+
+    def get_json(self, s3_key, **kwargs):
+        return self.s3_interface.get_json(self._get_json_key(s3_key, **kwargs))
+
+    def delete_json(self, s3_key, **kwargs):
+        self.s3_interface.delete_object(self._get_json_key(s3_key, **kwargs))
+
+    def get_all_json(self, s3_key, max_workers=1) -> list:
+        """Get all json documents stored with :py:func:`put_json` for the
+        specified s3_key.
+
+        Args:
+            s3_key (str): the type of document to get
+            max_workers (int, optional): maximum number of concurrent
+                requests. Defaults to 1.
+
+        Returns:
+            list: the documents
+        """
+        prefix = self._create_key_name_prefix(s3_key) + "/"
+        keys = [
+            key
+            for key in self.s3_interface.list_keys(prefix)
+            if key.endswith(".json")
+        ]
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            documents = executor.map(self.s3_interface.get_json, keys)
+            return [d for d in documents if d is not None]
+
+    def put_jsonl(self, records, s3_key, **kwargs):
+        """Store a list of json serializable records as a single json lines
+        document.
+        """
+        self.s3_interface.put_bytes(
+            self._get_json_key(s3_key, extension=".jsonl", **kwargs),
+            "".join(json.dumps(r) + "\n" for r in records).encode(),
+            "application/x-ndjson",
+        )
+
+    def get_all_jsonl(self, s3_key) -> list:
+        """Get the records from all json lines documents stored with
+        :py:func:`put_jsonl` for the specified s3_key.
+        """
+        records = []
+        prefix = self._create_key_name_prefix(s3_key) + "/"
+        for key in self.s3_interface.list_keys(prefix):
+            if not key.endswith(".jsonl"):
+                continue
+            data = self.s3_interface.get_bytes(key)
+            for line in data.decode().splitlines():
+                if line.strip():
+                    records.append(json.loads(line))
+        return records
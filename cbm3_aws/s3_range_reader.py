@@ -0,0 +1,138 @@
+import io
+from threading import Lock
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
+
+
+class S3RangeReader(io.RawIOBase):
+    """Read only, seekable file object over an S3 object, backed by ranged
+    GET requests.
+
+    The object is fetched in fixed size blocks, and the blocks following
+    the most recently read block are requested in the background, so that
+    sequential readers such as :py:class:`zipfile.ZipFile` can consume an
+    archive directly from S3 without first writing it to disk.
+
+    Args:
+        client (S3Client): boto3 s3 client
+        bucket_name (str): the name of the bucket containing the object
+        key (str): the S3 key of the object
+        size (int): the size of the object in bytes
+        etag (str, optional): if specified, every request is conditional on
+            the object's ETag matching this value so that a concurrent
+            overwrite of the object is detected. Defaults to None.
+        block_size (int, optional): size of each ranged GET request in
+            bytes. Defaults to 8MiB.
+        read_ahead (int, optional): number of blocks to request ahead of
+            the current read position. Defaults to 2.
+    """
+
+    def __init__(
+        self,
+        client,
+        bucket_name: str,
+        key: str,
+        size: int,
+        etag: Union[str, None] = None,
+        block_size: int = 8 * 1024**2,
+        read_ahead: int = 2,
+    ):
+        io.RawIOBase.__init__(self)
+        self.client = client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.size = size
+        self.etag = etag
+        self.block_size = block_size
+        self.read_ahead = read_ahead
+        self.bytes_fetched = 0
+        # blocks are fetched on the read ahead threads
+        self._bytes_fetched_lock = Lock()
+        self._position = 0
+        self._blocks: dict[int, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, read_ahead))
+
+    def _fetch_block(self, block_index: int) -> bytes:
+        start = block_index * self.block_size
+        end = min(start + self.block_size, self.size) - 1
+        kwargs = dict(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            Range=f"bytes={start}-{end}",
+        )
+        if self.etag:
+            kwargs["IfMatch"] = self.etag
+        data = self.client.get_object(**kwargs)["Body"].read()
+        if len(data) != end - start + 1:
+            raise IOError(
+                f"expected {end - start + 1} bytes from range request on "
+                f"'{self.key}', got {len(data)}"
+            )
+        with self._bytes_fetched_lock:
+            self.bytes_fetched += len(data)
+        return data
+
+    def _request_block(self, block_index: int) -> Future:
+        if block_index not in self._blocks:
+            self._blocks[block_index] = self._executor.submit(
+                self._fetch_block, block_index
+            )
+        return self._blocks[block_index]
+
+    def _get_block(self, block_index: int) -> bytes:
+        n_blocks = (self.size + self.block_size - 1) // self.block_size
+        future = self._request_block(block_index)
+        for i in range(block_index + 1, block_index + 1 + self.read_ahead):
+            if i < n_blocks:
+                self._request_block(i)
+        # drop blocks behind the read position, keeping the final block
+        # which holds the zip central directory
+        for i in list(self._blocks.keys()):
+            if i < block_index and i != n_blocks - 1:
+                del self._blocks[i]
+        return future.result()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"invalid whence value {whence}")
+        if position < 0:
+            raise ValueError(f"negative seek position {position}")
+        self._position = position
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast("B")
+        n_read = 0
+        while n_read < len(view) and self._position < self.size:
+            block_index = self._position // self.block_size
+            block = self._get_block(block_index)
+            block_offset = self._position - block_index * self.block_size
+            n = min(len(view) - n_read, len(block) - block_offset)
+            view_end = n_read + n
+            block_end = block_offset + n
+            view[n_read:view_end] = block[block_offset:block_end]
+            n_read += n
+            self._position += n
+        return n_read
+
+    def close(self) -> None:
+        if not self.closed:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._blocks.clear()
+        io.RawIOBase.close(self)
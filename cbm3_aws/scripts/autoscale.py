@@ -0,0 +1,106 @@
+import os
+import json
+import boto3
+from argparse import ArgumentParser
+from cbm3_aws import log_helper
+from cbm3_aws.aws.autoscale_controller import AutoscaleController
+from cbm3_aws.aws.autoscale_controller import get_tasks_per_instance
+
+
+def main():
+    parser = ArgumentParser(
+        description="Runs a controller that sets the desired capacity of a "
+        "cbm3_aws cluster's autoscaling group from the number of queued "
+        "and running tasks"
+    )
+
+    parser.add_argument(
+        "--resource_description_path",
+        required=True,
+        type=os.path.abspath,
+        help="Path to a json formatted file containing the allocated AWS "
+        "cbm3_aws cluster",
+    )
+    parser.add_argument(
+        "--interval",
+        required=False,
+        type=float,
+        default=60.0,
+        help="seconds between scaling decisions",
+    )
+    parser.add_argument(
+        "--tasks_per_instance",
+        required=False,
+        type=int,
+        help="number of tasks run at once by each instance. If omitted it is "
+        "derived from the instance size, the cluster's dynamic work units "
+        "setting and --max_tasks_held",
+    )
+    parser.add_argument(
+        "--max_tasks_held",
+        required=False,
+        type=int,
+        default=1,
+        help="the --max_tasks_held of the cluster's worker processes, used "
+        "to derive --tasks_per_instance",
+    )
+    parser.add_argument(
+        "--scale_down_delay",
+        required=False,
+        type=float,
+        default=300.0,
+        help="seconds that demand must stay below the current capacity "
+        "before the group is scaled down",
+    )
+    parser.add_argument(
+        "--idle_timeout",
+        required=False,
+        type=float,
+        default=600.0,
+        help="seconds with no running executions before the group is "
+        "scaled to its minimum size",
+    )
+
+    log_helper.start_logging("autoscale", level="INFO")
+    logger = log_helper.get_logger("autoscale")
+    try:
+        args = parser.parse_args()
+        logger.info("autoscale start up")
+        logger.info(vars(args))
+
+        with open(args.resource_description_path, "r") as resources_fp:
+            rd = json.load(resources_fp)
+        tasks_per_instance = args.tasks_per_instance
+        if tasks_per_instance is None:
+            tasks_per_instance = get_tasks_per_instance(
+                rd.get("dynamic_work_units", False), args.max_tasks_held
+            )
+            logger.info(f"tasks_per_instance: {tasks_per_instance}")
+        controller = AutoscaleController(
+            autoscale_client=boto3.client(
+                "autoscaling", region_name=rd["region_name"]
+            ),
+            sfn_client=boto3.client(
+                "stepfunctions", region_name=rd["region_name"]
+            ),
+            auto_scaling_group_name=rd["autoscale_group_context"][
+                "auto_scaling_group_name"
+            ],
+            task_state_machine_arn=rd["state_machine_context"].get(
+                "task_state_machine_arn"
+            ),
+            app_state_machine_arn=rd["state_machine_context"][
+                "app_state_machine_arn"
+            ],
+            tasks_per_instance=tasks_per_instance,
+            scale_down_delay=args.scale_down_delay,
+            idle_timeout=args.idle_timeout,
+        )
+        controller.run(interval=args.interval)
+
+    except Exception:
+        logger.exception("")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import os
+import json
 from argparse import ArgumentParser
 from cbm3_aws import log_helper
 from cbm3_aws.aws import resources
+from cbm3_aws.aws import cbm3_run_state_machine
+from cbm3_aws.aws import task_retry_policy
 
 
 def main():
@@ -50,6 +53,68 @@ def main():
         "cloud (VPC). This is required if no default VPC is set in your "
         "AWS account/region",
     )
+    parser.add_argument(
+        "--transfer_profile_path",
+        required=False,
+        help="path to a json file containing the S3 multipart transfer "
+        "settings used by the instance workers. See "
+        "cbm3_aws.transfer_profile.get_transfer_profile. If omitted the "
+        "default settings are used.",
+    )
+    parser.add_argument(
+        "--distributed_map",
+        action="store_true",
+        help="run tasks with a Step Functions Distributed Map reading the "
+        "task list from S3, rather than an inline Map over a task list "
+        "passed in the execution input",
+    )
+    parser.add_argument(
+        "--map_max_concurrency",
+        required=False,
+        type=int,
+        default=0,
+        help="maximum number of concurrent Distributed Map child "
+        "executions. 0 means no limit.",
+    )
+    parser.add_argument(
+        "--map_max_items_per_batch",
+        required=False,
+        type=int,
+        default=1,
+        help="number of tasks launched by each Distributed Map child "
+        "execution",
+    )
+
+    parser.add_argument(
+        "--dynamic_work_units",
+        action="store_true",
+        help="split each task into one task per simulation at execution "
+        "start, and have workers lease these work units as their "
+        "simulation slots free up",
+    )
+
+    parser.add_argument(
+        "--task_layout",
+        required=False,
+        choices=[
+            cbm3_run_state_machine.CHILD_EXECUTION_LAYOUT,
+            cbm3_run_state_machine.INLINE_LAYOUT,
+        ],
+        default=cbm3_run_state_machine.CHILD_EXECUTION_LAYOUT,
+        help="run each task with a child execution of the task state "
+        "machine, or embed the task's run, catch and retry states "
+        "inline in the application state machine's Map iterator",
+    )
+
+    parser.add_argument(
+        "--compact_results",
+        action="store_true",
+        help="have workers write each task's result to a status record in "
+        "S3, so that the execution output carries only counts and S3 keys "
+        "rather than echoing the task inputs",
+    )
+
+    task_retry_policy.add_arguments(parser)
 
     log_helper.start_logging("aws_deploy", level="INFO")
     logger = log_helper.get_logger("aws_deploy")
@@ -60,6 +125,11 @@ def main():
         logger.info("aws_deploy start up")
         logger.info(vars(args))
 
+        transfer_profile = None
+        if args.transfer_profile_path:
+            with open(args.transfer_profile_path) as transfer_profile_file:
+                transfer_profile = json.load(transfer_profile_file)
+
         resources.deploy(
             region_name=args.region_name,
             s3_bucket_name=args.s3_bucket_name,
@@ -70,6 +140,14 @@ def main():
                 args.resource_description_path
             ),
             vpc_zone_identifier=args.vpc_zone_identifier,
+            transfer_profile=transfer_profile,
+            distributed_map=args.distributed_map,
+            map_max_concurrency=args.map_max_concurrency,
+            map_max_items_per_batch=args.map_max_items_per_batch,
+            dynamic_work_units=args.dynamic_work_units,
+            task_retry_policy=task_retry_policy.from_args(args),
+            task_layout=args.task_layout,
+            compact_results=args.compact_results,
         )
     except Exception:
         logger.exception("")
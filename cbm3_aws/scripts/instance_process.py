@@ -1,5 +1,7 @@
 from argparse import ArgumentParser
 from cbm3_aws import log_helper
+from cbm3_aws import transfer_profile
+from cbm3_aws.instance.spot_interruption import DEFAULT_METADATA_URL
 from cbm3_aws.instance import instance_task
 
 
@@ -34,6 +36,147 @@ def main():
         help="Maximum number of concurrent sub processes to run in this "
         "instance",
     )
+    parser.add_argument(
+        "--resource_cache_dir",
+        required=False,
+        help="directory for caching downloaded resources between tasks. "
+        "The directory is shared by all processes on the instance. If "
+        "omitted, resources are downloaded for every task.",
+    )
+    parser.add_argument(
+        "--resource_cache_max_size_gb",
+        required=False,
+        type=float,
+        default=20.0,
+        help="size in GB above which the least recently used cached "
+        "resources are evicted",
+    )
+    parser.add_argument(
+        "--project_cache_dir",
+        required=False,
+        help="directory for caching downloaded project databases between "
+        "tasks. The directory is shared by all processes on the instance. "
+        "If omitted, projects are downloaded for every task.",
+    )
+    parser.add_argument(
+        "--project_cache_max_size_gb",
+        required=False,
+        type=float,
+        default=50.0,
+        help="size in GB above which the least recently used cached "
+        "projects are evicted",
+    )
+    parser.add_argument(
+        "--stream_downloads",
+        action="store_true",
+        help="extract downloaded archives directly from ranged S3 requests "
+        "instead of first writing the archive to disk",
+    )
+    parser.add_argument(
+        "--compression_level",
+        required=False,
+        type=int,
+        default=6,
+        choices=range(0, 10),
+        help="deflate compression level for uploaded archives, 0 stores "
+        "files without compression",
+    )
+    parser.add_argument(
+        "--archive_workers",
+        required=False,
+        type=int,
+        default=1,
+        help="number of threads used to compress uploaded directories",
+    )
+    parser.add_argument(
+        "--upload_workers",
+        required=False,
+        type=int,
+        default=0,
+        help="if greater than 0, upload each simulation's results on this "
+        "number of background threads as soon as it finishes, rather than "
+        "after all simulations in the task finish",
+    )
+    parser.add_argument(
+        "--max_pending_uploads",
+        required=False,
+        type=int,
+        default=2,
+        help="maximum number of finished simulations queued for upload or "
+        "uploading when --upload_workers is set, bounding the disk used by "
+        "results",
+    )
+    parser.add_argument(
+        "--download_concurrency",
+        required=False,
+        type=int,
+        default=1,
+        help="maximum number of resources and projects downloaded at once "
+        "at the start of each task",
+    )
+    parser.add_argument(
+        "--max_pool_connections",
+        required=False,
+        type=int,
+        default=10,
+        help="maximum number of connections kept open by each AWS client "
+        "in a worker process",
+    )
+    parser.add_argument(
+        "--max_task_attempts",
+        required=False,
+        type=int,
+        default=3,
+        help="number of attempts made at a task failing with retryable "
+        "errors before the task is quarantined",
+    )
+    parser.add_argument(
+        "--auto_scaling_group_name",
+        required=False,
+        help="name of the instance's autoscaling group. If specified the "
+        "instance is protected from scale-in while it is running tasks",
+    )
+    parser.add_argument(
+        "--instance_state_dir",
+        required=False,
+        help="directory shared by the worker processes on the instance for "
+        "coordinating scale-in protection",
+    )
+    parser.add_argument(
+        "--metadata_url",
+        required=False,
+        default=DEFAULT_METADATA_URL,
+        help="EC2 instance metadata endpoint polled for spot interruption "
+        "notices",
+    )
+    parser.add_argument(
+        "--dynamic_work_units",
+        action="store_true",
+        help="run up to max_concurrency tasks at once, leasing a new task "
+        "as each simulation slot frees up",
+    )
+    parser.add_argument(
+        "--max_tasks_held",
+        required=False,
+        type=int,
+        default=1,
+        help="maximum number of tasks held at once. If greater than 1, the "
+        "next task is leased and started while the current one finishes",
+    )
+    parser.add_argument(
+        "--heartbeat_interval",
+        required=False,
+        type=float,
+        default=25.0,
+        help="seconds between the heartbeats sent for each held task",
+    )
+    parser.add_argument(
+        "--compact_results",
+        action="store_true",
+        help="write each task's result to a status record in S3, and report "
+        "only its counts and the record's key to the state machine",
+    )
+    transfer_profile.add_arguments(parser)
 
     try:
         args = parser.parse_args()
@@ -45,6 +188,30 @@ def main():
             s3_bucket_name=args.s3_bucket_name,
             region_name=args.region_name,
             max_concurrency=args.max_concurrency,
+            resource_cache_dir=args.resource_cache_dir,
+            resource_cache_max_size=int(
+                args.resource_cache_max_size_gb * 1024**3
+            ),
+            project_cache_dir=args.project_cache_dir,
+            project_cache_max_size=int(
+                args.project_cache_max_size_gb * 1024**3
+            ),
+            stream_downloads=args.stream_downloads,
+            compression_level=args.compression_level,
+            archive_workers=args.archive_workers,
+            upload_workers=args.upload_workers,
+            max_pending_uploads=args.max_pending_uploads,
+            download_concurrency=args.download_concurrency,
+            transfer_profile=transfer_profile.from_args(args),
+            max_pool_connections=args.max_pool_connections,
+            max_task_attempts=args.max_task_attempts,
+            auto_scaling_group_name=args.auto_scaling_group_name,
+            instance_state_dir=args.instance_state_dir,
+            metadata_url=args.metadata_url,
+            dynamic_work_units=args.dynamic_work_units,
+            max_tasks_held=args.max_tasks_held,
+            heartbeat_interval=args.heartbeat_interval,
+            compact_results=args.compact_results,
         )
     except Exception:
         logger.exception("")
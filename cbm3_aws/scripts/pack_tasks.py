@@ -0,0 +1,121 @@
+import os
+import json
+from argparse import ArgumentParser
+from cbm3_aws import log_helper
+from cbm3_aws import task_packer
+from cbm3_aws.runtime_history import RuntimeHistory
+
+
+def main():
+    parser = ArgumentParser(
+        description="Pack simulations into a balanced task list for "
+        "cbm3_aws_start_execution"
+    )
+
+    parser.add_argument(
+        "--simulations_path",
+        required=True,
+        type=os.path.abspath,
+        help="Path to a json formatted list of simulations, each with "
+        "'project_code', 'simulation_id' and optionally 'runtime' keys",
+    )
+    parser.add_argument(
+        "--upload_s3_key",
+        required=True,
+        help="The s3 key prefix under which the projects and resources "
+        "were uploaded with cbm3_aws_s3_upload",
+    )
+    parser.add_argument(
+        "--tasks_file_path",
+        required=True,
+        type=os.path.abspath,
+        help="Path of the json formatted tasks file to write, for use with "
+        "cbm3_aws_start_execution",
+    )
+    parser.add_argument(
+        "--max_concurrency",
+        required=False,
+        type=int,
+        default=8,
+        help="number of simulations each worker process runs at once",
+    )
+    parser.add_argument(
+        "--n_tasks",
+        required=False,
+        type=int,
+        help="the number of tasks to create",
+    )
+    parser.add_argument(
+        "--target_task_runtime",
+        required=False,
+        type=float,
+        help="the desired duration of each task, in the units of the "
+        "simulation runtimes. Used to choose the number of tasks if "
+        "--n_tasks is not specified",
+    )
+    parser.add_argument(
+        "--runtime_history_path",
+        required=False,
+        type=os.path.abspath,
+        help="path to a runtime history database created by "
+        "cbm3_aws_pull_runtime_history. If specified, simulations without "
+        "a 'runtime' value are assigned the runtime estimated from the "
+        "history",
+    )
+    parser.add_argument(
+        "--default_runtime",
+        required=False,
+        type=float,
+        default=1.0,
+        help="runtime assumed for simulations without a 'runtime' value",
+    )
+    parser.add_argument(
+        "--affinity_tolerance",
+        required=False,
+        type=float,
+        default=0.1,
+        help="fraction by which a task's expected runtime may exceed the "
+        "best choice while still being preferred for keeping simulations "
+        "of the same project together",
+    )
+
+    log_helper.start_logging("pack_tasks", level="INFO")
+    logger = log_helper.get_logger("pack_tasks")
+    try:
+        args = parser.parse_args()
+        logger.info("pack_tasks")
+        logger.info(vars(args))
+
+        if os.path.exists(args.tasks_file_path):
+            raise ValueError(
+                "specified tasks_file_path already exists: "
+                f"'{args.tasks_file_path}'"
+            )
+        with open(args.simulations_path, "r") as simulations_fp:
+            simulations = json.load(simulations_fp)
+        if args.runtime_history_path:
+            with RuntimeHistory(args.runtime_history_path) as history:
+                simulations = history.add_estimates(simulations)
+
+        tasks = task_packer.pack(
+            simulations=simulations,
+            upload_s3_key=args.upload_s3_key,
+            max_concurrency=args.max_concurrency,
+            n_tasks=args.n_tasks,
+            target_task_runtime=args.target_task_runtime,
+            default_runtime=args.default_runtime,
+            affinity_tolerance=args.affinity_tolerance,
+        )
+        logger.info(
+            f"packed {len(simulations)} simulations into "
+            f"{len(tasks['task_list'])} tasks"
+        )
+        with open(args.tasks_file_path, "w") as out_file:
+            json.dump(tasks, out_file, indent=4)
+
+    except Exception:
+        logger.exception("")
+
+
+if __name__ == "__main__":
+    main()
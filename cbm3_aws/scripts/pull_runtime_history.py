@@ -0,0 +1,73 @@
+import os
+import json
+import boto3
+from argparse import ArgumentParser
+from cbm3_aws import log_helper
+from cbm3_aws.s3_io import S3IO
+from cbm3_aws.s3_interface import S3Interface
+from cbm3_aws.runtime_history import RuntimeHistory
+
+
+def main():
+    parser = ArgumentParser(
+        description="Pulls the simulation runtime history of an execution "
+        "from AWS S3 into a local SQLite database"
+    )
+
+    parser.add_argument(
+        "--s3_bucket_name",
+        required=True,
+        help="name of the AWS s3 bucket used by the cbm3_aws cluster",
+    )
+    parser.add_argument(
+        "--execution_s3_key_prefix",
+        required=True,
+        help="the s3 key prefix of the execution, which is the "
+        "upload_s3_key of its tasks",
+    )
+    parser.add_argument(
+        "--db_path",
+        required=True,
+        type=os.path.abspath,
+        help="path to the SQLite database to add the runtime history to. "
+        "The database is created if it does not exist.",
+    )
+    parser.add_argument(
+        "--summary_output_path",
+        required=False,
+        type=os.path.abspath,
+        help="if specified, a json formatted summary of the runtime history "
+        "of each project in the database is written to this path",
+    )
+
+    log_helper.start_logging("pull_runtime_history", level="INFO")
+    logger = log_helper.get_logger("pull_runtime_history")
+    try:
+        args = parser.parse_args()
+        logger.info("pull_runtime_history")
+        logger.info(vars(args))
+
+        s3_io = S3IO(
+            execution_s3_key_prefix=args.execution_s3_key_prefix,
+            s3_interface=S3Interface(
+                s3_resource=boto3.resource("s3", verify=False),
+                bucket_name=args.s3_bucket_name,
+            ),
+        )
+        with RuntimeHistory(args.db_path) as runtime_history:
+            n_records = runtime_history.pull(s3_io)
+            logger.info(f"pulled {n_records} runtime records")
+            if args.summary_output_path:
+                with open(args.summary_output_path, "w") as out_file:
+                    json.dump(
+                        runtime_history.get_project_summary(),
+                        out_file,
+                        indent=4,
+                    )
+
+    except Exception:
+        logger.exception("")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import os
+import json
+import boto3
+from argparse import ArgumentParser
+from cbm3_aws import log_helper
+from cbm3_aws import failure_manifest
+from cbm3_aws.aws import execution
+from cbm3_aws.s3_io import S3IO
+from cbm3_aws.s3_interface import S3Interface
+from cbm3_aws.runtime_history import RuntimeHistory
+
+
+def main():
+    parser = ArgumentParser(
+        description="Starts an execution on a cbm3_aws cluster that reruns "
+        "the failed simulations recorded in the failure manifest of a "
+        "finished execution"
+    )
+
+    parser.add_argument(
+        "--resource_description_path",
+        required=True,
+        type=os.path.abspath,
+        help="Path to a json formatted file containing the allocated AWS "
+        "cbm3_aws cluster",
+    )
+    parser.add_argument(
+        "--execution_s3_key_prefix",
+        required=True,
+        help="the s3 key prefix of the previous execution, which is the "
+        "upload_s3_key of its tasks",
+    )
+    parser.add_argument(
+        "--source_execution_name",
+        required=True,
+        help="the name of the previous execution, which must no longer be "
+        "running",
+    )
+    parser.add_argument(
+        "--source_tasks_file_path",
+        required=False,
+        type=os.path.abspath,
+        help="Path to the json formatted tasks file of the previous "
+        "execution. If specified, the simulations of its tasks with "
+        "neither a failure record nor a completion marker, such as those "
+        "of tasks that timed out, are also rerun",
+    )
+    parser.add_argument(
+        "--execution_name",
+        required=True,
+        help="The name of the new execution, which must be unique for the "
+        "state machine",
+    )
+    parser.add_argument(
+        "--tasks_file_path",
+        required=True,
+        type=os.path.abspath,
+        help="Path of the json formatted tasks file to write with the "
+        "repacked simulations to rerun",
+    )
+    parser.add_argument(
+        "--response_output_path",
+        required=True,
+        type=os.path.abspath,
+        help="Path of the json formatted start_execution response to write",
+    )
+    parser.add_argument(
+        "--max_concurrency",
+        required=False,
+        type=int,
+        default=8,
+        help="number of simulations each worker process runs at once",
+    )
+    parser.add_argument(
+        "--n_tasks",
+        required=False,
+        type=int,
+        help="the number of tasks to create. If neither this nor "
+        "--target_task_runtime is specified, each task has about "
+        "max_concurrency simulations",
+    )
+    parser.add_argument(
+        "--target_task_runtime",
+        required=False,
+        type=float,
+        help="the desired duration of each task, in the units of the "
+        "simulation runtimes",
+    )
+    parser.add_argument(
+        "--runtime_history_path",
+        required=False,
+        type=os.path.abspath,
+        help="path to a runtime history database created by "
+        "cbm3_aws_pull_runtime_history, used to estimate the runtime of "
+        "each simulation to rerun",
+    )
+    parser.add_argument(
+        "--dry_run",
+        action="store_true",
+        help="write the tasks file without starting an execution",
+    )
+
+    log_helper.start_logging("rerun_failed", level="INFO")
+    logger = log_helper.get_logger("rerun_failed")
+    try:
+        args = parser.parse_args()
+        logger.info("rerun_failed")
+        logger.info(vars(args))
+
+        for path in [args.tasks_file_path, args.response_output_path]:
+            if os.path.exists(path):
+                raise ValueError(f"specified path already exists: '{path}'")
+
+        with open(args.resource_description_path, "r") as resources_fp:
+            rd = json.load(resources_fp)
+        state_machine_arn = rd["state_machine_context"][
+            "app_state_machine_arn"
+        ]
+
+        # the simulations of a running execution may still be retried, so
+        # they can't yet be told apart from the simulations to rerun
+        sfn_client = boto3.client(
+            "stepfunctions", region_name=rd["region_name"], verify=False
+        )
+        status = sfn_client.describe_execution(
+            executionArn=execution.get_execution_arn(
+                state_machine_arn, args.source_execution_name
+            )
+        )["status"]
+        if status == "RUNNING":
+            raise ValueError(
+                f"execution '{args.source_execution_name}' is still running"
+            )
+
+        source_task_list = None
+        if args.source_tasks_file_path:
+            with open(args.source_tasks_file_path, "r") as tasks_fp:
+                source_task_list = [
+                    task
+                    for task in json.load(tasks_fp)["task_list"]
+                    if task["upload_s3_key"] == args.execution_s3_key_prefix
+                ]
+        s3_io = S3IO(
+            execution_s3_key_prefix=args.execution_s3_key_prefix,
+            s3_interface=S3Interface(
+                s3_resource=boto3.resource(
+                    "s3", region_name=rd["region_name"], verify=False
+                ),
+                bucket_name=rd["s3_bucket_name"],
+            ),
+        )
+        records = failure_manifest.read_manifest(s3_io)
+        logger.info(f"{len(records)} simulations in the failure manifest")
+        # tasks that timed out on every attempt leave no failure records,
+        # so their simulations are found by their missing completion
+        # markers
+        simulations = failure_manifest.get_rerun_simulations(
+            s3_io, records, source_task_list
+        )
+        logger.info(f"{len(simulations)} simulations to rerun")
+        if not simulations:
+            return
+        if args.runtime_history_path:
+            with RuntimeHistory(args.runtime_history_path) as history:
+                simulations = history.add_estimates(simulations)
+
+        tasks = failure_manifest.create_rerun_tasks(
+            simulations=simulations,
+            upload_s3_key=args.execution_s3_key_prefix,
+            max_concurrency=args.max_concurrency,
+            n_tasks=args.n_tasks,
+            target_task_runtime=args.target_task_runtime,
+        )
+        logger.info(
+            f"packed {len(simulations)} simulations into "
+            f"{len(tasks['task_list'])} tasks"
+        )
+        with open(args.tasks_file_path, "w") as out_file:
+            json.dump(tasks, out_file, indent=4)
+        if args.dry_run:
+            return
+
+        start_execution_response = execution.start_execution(
+            execution_name=args.execution_name,
+            state_machine_arn=state_machine_arn,
+            region_name=rd["region_name"],
+            tasks=tasks,
+            distributed_map=rd.get("distributed_map", False),
+            s3_bucket_name=rd["s3_bucket_name"],
+            dynamic_work_units=rd.get("dynamic_work_units", False),
+            resume=True,
+        )
+        logger.info(json.dumps(start_execution_response, indent=4))
+        with open(args.response_output_path, "w") as out_file:
+            json.dump(start_execution_response, out_file)
+
+    except Exception:
+        logger.exception("")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
+import os
 import psutil
 import math
+import tempfile
 import subprocess
 from argparse import ArgumentParser
 from cbm3_aws import log_helper
+from cbm3_aws import transfer_profile
+from cbm3_aws.instance.spot_interruption import DEFAULT_METADATA_URL
 
 
 def main():
@@ -23,6 +27,141 @@ def main():
         help="Name of the s3 bucket that the instance will interact with",
     )
     parser.add_argument("--region_name", required=True, help="AWS region name")
+    parser.add_argument(
+        "--cache_dir",
+        required=False,
+        default=os.path.join(tempfile.gettempdir(), "cbm3_aws_cache"),
+        help="directory for the cache of downloaded data shared by all "
+        "worker processes on this instance",
+    )
+    parser.add_argument(
+        "--resource_cache_max_size_gb",
+        required=False,
+        type=float,
+        default=20.0,
+        help="size in GB above which the least recently used cached "
+        "resources are evicted",
+    )
+    parser.add_argument(
+        "--project_cache_max_size_gb",
+        required=False,
+        type=float,
+        default=50.0,
+        help="size in GB above which the least recently used cached "
+        "projects are evicted",
+    )
+    parser.add_argument(
+        "--stream_downloads",
+        action="store_true",
+        help="extract downloaded archives directly from ranged S3 requests "
+        "instead of first writing the archive to disk",
+    )
+    parser.add_argument(
+        "--compression_level",
+        required=False,
+        type=int,
+        default=6,
+        choices=range(0, 10),
+        help="deflate compression level for uploaded archives, 0 stores "
+        "files without compression",
+    )
+    parser.add_argument(
+        "--archive_workers",
+        required=False,
+        type=int,
+        default=1,
+        help="number of threads used to compress uploaded directories",
+    )
+    parser.add_argument(
+        "--upload_workers",
+        required=False,
+        type=int,
+        default=0,
+        help="if greater than 0, upload each simulation's results on this "
+        "number of background threads as soon as it finishes, rather than "
+        "after all simulations in the task finish",
+    )
+    parser.add_argument(
+        "--max_pending_uploads",
+        required=False,
+        type=int,
+        default=2,
+        help="maximum number of finished simulations queued for upload or "
+        "uploading when --upload_workers is set, bounding the disk used by "
+        "results",
+    )
+    parser.add_argument(
+        "--download_concurrency",
+        required=False,
+        type=int,
+        default=1,
+        help="maximum number of resources and projects downloaded at once "
+        "at the start of each task",
+    )
+    parser.add_argument(
+        "--max_pool_connections",
+        required=False,
+        type=int,
+        default=10,
+        help="maximum number of connections kept open by each AWS client "
+        "in a worker process",
+    )
+    parser.add_argument(
+        "--max_task_attempts",
+        required=False,
+        type=int,
+        default=3,
+        help="number of attempts made at a task failing with retryable "
+        "errors before the task is quarantined",
+    )
+    parser.add_argument(
+        "--auto_scaling_group_name",
+        required=False,
+        help="name of the instance's autoscaling group. If specified the "
+        "instance is protected from scale-in while it is running tasks",
+    )
+    parser.add_argument(
+        "--instance_state_dir",
+        required=False,
+        default=os.path.join(tempfile.gettempdir(), "cbm3_aws_state"),
+        help="directory shared by the worker processes on this instance "
+        "for coordinating instance wide state",
+    )
+    parser.add_argument(
+        "--metadata_url",
+        required=False,
+        default=DEFAULT_METADATA_URL,
+        help="EC2 instance metadata endpoint polled for spot interruption "
+        "notices",
+    )
+    parser.add_argument(
+        "--dynamic_work_units",
+        action="store_true",
+        help="run up to max_concurrency tasks at once, leasing a new task "
+        "as each simulation slot frees up",
+    )
+    parser.add_argument(
+        "--max_tasks_held",
+        required=False,
+        type=int,
+        default=1,
+        help="maximum number of tasks held at once. If greater than 1, the "
+        "next task is leased and started while the current one finishes",
+    )
+    parser.add_argument(
+        "--heartbeat_interval",
+        required=False,
+        type=float,
+        default=25.0,
+        help="seconds between the heartbeats sent for each held task",
+    )
+    parser.add_argument(
+        "--compact_results",
+        action="store_true",
+        help="write each task's result to a status record in S3, and report "
+        "only its counts and the record's key to the state machine",
+    )
+    transfer_profile.add_arguments(parser)
 
     try:
         args = parser.parse_args()
@@ -49,7 +188,55 @@ def main():
                 args.region_name,
                 "--max_concurrency",
                 str(8),
+                "--resource_cache_dir",
+                os.path.join(args.cache_dir, "resources"),
+                "--resource_cache_max_size_gb",
+                str(args.resource_cache_max_size_gb),
+                "--project_cache_dir",
+                os.path.join(args.cache_dir, "projects"),
+                "--project_cache_max_size_gb",
+                str(args.project_cache_max_size_gb),
+                "--compression_level",
+                str(args.compression_level),
+                "--archive_workers",
+                str(args.archive_workers),
+                "--upload_workers",
+                str(args.upload_workers),
+                "--max_pending_uploads",
+                str(args.max_pending_uploads),
+                "--download_concurrency",
+                str(args.download_concurrency),
+                "--max_pool_connections",
+                str(args.max_pool_connections),
+                "--max_task_attempts",
+                str(args.max_task_attempts),
+                "--instance_state_dir",
+                args.instance_state_dir,
+                "--metadata_url",
+                args.metadata_url,
+                "--max_tasks_held",
+                str(args.max_tasks_held),
+                "--heartbeat_interval",
+                str(args.heartbeat_interval),
             ]
+            if args.auto_scaling_group_name:
+                popen_args.extend(
+                    [
+                        "--auto_scaling_group_name",
+                        args.auto_scaling_group_name,
+                    ]
+                )
+            if args.stream_downloads:
+                popen_args.append("--stream_downloads")
+            if args.dynamic_work_units:
+                popen_args.append("--dynamic_work_units")
+            if args.compact_results:
+                popen_args.append("--compact_results")
+            popen_args.extend(
+                transfer_profile.to_command_line(
+                    transfer_profile.from_args(args)
+                )
+            )
             subprocess.Popen(popen_args)
 
     except Exception:
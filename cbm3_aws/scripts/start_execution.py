@@ -40,6 +40,13 @@ def main():
         type=os.path.abspath,
         help="Path",
     )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip the simulations already completed by earlier executions "
+        "of the tasks, provided their projects have not been uploaded "
+        "again since. By default every simulation is run",
+    )
 
     log_helper.start_logging("start_execution", level="INFO")
     logger = log_helper.get_logger("start_execution")
@@ -69,6 +76,10 @@ def main():
                 state_machine_arn=state_machine_arn,
                 region_name=rd["region_name"],
                 tasks=tasks,
+                distributed_map=rd.get("distributed_map", False),
+                s3_bucket_name=rd["s3_bucket_name"],
+                dynamic_work_units=rd.get("dynamic_work_units", False),
+                resume=args.resume,
             )
             logger.info(json.dumps(start_execution_response, indent=4))
             json.dump(start_execution_response, out_file)
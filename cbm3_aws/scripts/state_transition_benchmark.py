@@ -0,0 +1,54 @@
+import os
+import json
+from argparse import ArgumentParser
+from cbm3_aws import log_helper
+from cbm3_aws.aws import task_retry_policy
+from cbm3_aws.aws.state_transition_benchmark import run_benchmark
+
+
+def main():
+    parser = ArgumentParser(
+        description="Compares the Step Functions state transitions per task "
+        "of the child execution and inline task layouts of the application "
+        "state machine"
+    )
+
+    parser.add_argument(
+        "--n_tasks",
+        required=False,
+        type=int,
+        default=100,
+        help="number of tasks in each benchmarked execution",
+    )
+    parser.add_argument(
+        "--output_path",
+        required=False,
+        type=os.path.abspath,
+        help="if specified, the json formatted benchmark results are "
+        "written to this path",
+    )
+    task_retry_policy.add_arguments(parser)
+
+    log_helper.start_logging("state_transition_benchmark", level="INFO")
+    logger = log_helper.get_logger("state_transition_benchmark")
+    try:
+        args = parser.parse_args()
+        logger.info("state_transition_benchmark")
+        logger.info(vars(args))
+
+        rows = run_benchmark(
+            n_tasks=args.n_tasks,
+            task_retry_policy=task_retry_policy.from_args(args),
+        )
+        for row in rows:
+            logger.info(row)
+        if args.output_path:
+            with open(args.output_path, "w") as out_file:
+                json.dump(rows, out_file, indent=4)
+
+    except Exception:
+        logger.exception("")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import math
+import heapq
+from typing import Union
+
+
+class _Task:
+    def __init__(self, index: int, max_concurrency: int):
+        self.index = index
+        # each slot is the total expected runtime of the simulations that
+        # a worker process runs one after another on one of its
+        # max_concurrency concurrent simulation slots
+        self.slots = [0.0] * max_concurrency
+        self.simulations: list[dict] = []
+        self.projects: set[str] = set()
+
+    @property
+    def makespan(self) -> float:
+        return max(self.slots)
+
+    def makespan_with(self, runtime: float) -> float:
+        return max(self.makespan, self.slots[0] + runtime)
+
+    def add(self, simulation: dict, runtime: float) -> None:
+        heapq.heapreplace(self.slots, self.slots[0] + runtime)
+        self.simulations.append(simulation)
+        self.projects.add(simulation["project_code"])
+
+
+def get_task_count(
+    simulations: list[dict],
+    max_concurrency: int,
+    target_task_runtime: float,
+    default_runtime: float = 1.0,
+) -> int:
+    """Get the number of tasks needed for the specified simulations so
+    that each task runs for roughly target_task_runtime.
+
+    Args:
+        simulations (list): list of dicts with "project_code",
+            "simulation_id" and optionally "runtime" keys
+        max_concurrency (int): the number of simulations a worker runs at
+            once
+        target_task_runtime (float): the desired task duration, in the same
+            units as the simulation runtimes
+        default_runtime (float, optional): runtime for simulations without
+            a "runtime" value. Defaults to 1.0.
+
+    Returns:
+        int: the number of tasks
+    """
+    total_runtime = sum(_get_runtime(s, default_runtime) for s in simulations)
+    longest = max(
+        [_get_runtime(s, default_runtime) for s in simulations], default=0
+    )
+    target_task_runtime = max(target_task_runtime, longest)
+    if target_task_runtime <= 0:
+        return 1
+    return max(
+        1, math.ceil(total_runtime / (max_concurrency * target_task_runtime))
+    )
+
+
+def _get_runtime(simulation: dict, default_runtime: float) -> float:
+    runtime = simulation.get("runtime")
+    if runtime is None:
+        return default_runtime
+    return float(runtime)
+
+
+def pack_tasks(
+    simulations: list[dict],
+    n_tasks: int,
+    max_concurrency: int = 8,
+    default_runtime: float = 1.0,
+    affinity_tolerance: float = 0.1,
+) -> list[list[dict]]:
+    """Distribute simulations among tasks so that the tasks finish at
+    roughly the same time.
+
+    Simulations are assigned longest first (longest processing time
+    scheduling). Each task is modelled as max_concurrency slots, matching
+    the number of concurrent simulations run by a worker, and a simulation
+    is assigned to the task whose expected finish time increases least. A
+    task already containing simulations of the same project is preferred
+    if its finish time is within affinity_tolerance of the best task, to
+    limit the number of project databases each task downloads.
+
+    Args:
+        simulations (list): list of dicts with "project_code",
+            "simulation_id" and optionally "runtime" keys
+        n_tasks (int): the number of tasks to create
+        max_concurrency (int, optional): the number of simulations a worker
+            runs at once. Defaults to 8.
+        default_runtime (float, optional): runtime for simulations without
+            a "runtime" value. Defaults to 1.0.
+        affinity_tolerance (float, optional): the fraction by which a
+            task's expected finish time may exceed the best task's finish
+            time and still be preferred for holding the same project.
+            Defaults to 0.1.
+
+    Returns:
+        list: for each non-empty task, the list of simulations assigned to
+            it
+    """
+    if n_tasks < 1:
+        raise ValueError("n_tasks must be at least 1")
+    tasks = [_Task(i, max_concurrency) for i in range(n_tasks)]
+    ordered = sorted(
+        simulations,
+        key=lambda s: (
+            -_get_runtime(s, default_runtime),
+            s["project_code"],
+            s["simulation_id"],
+        ),
+    )
+    for simulation in ordered:
+        runtime = _get_runtime(simulation, default_runtime)
+        best = min(tasks, key=lambda t: (t.makespan_with(runtime), t.index))
+        best_makespan = best.makespan_with(runtime)
+        affine = [
+            t
+            for t in tasks
+            if simulation["project_code"] in t.projects
+            and t.makespan_with(runtime)
+            <= best_makespan * (1 + affinity_tolerance)
+        ]
+        if affine:
+            best = min(
+                affine, key=lambda t: (t.makespan_with(runtime), t.index)
+            )
+        best.add(simulation, runtime)
+    return [t.simulations for t in tasks if t.simulations]
+
+
+def create_task_list(
+    upload_s3_key: str, packed_tasks: list[list[dict]]
+) -> dict:
+    """Create the tasks document accepted by
+    :py:func:`cbm3_aws.aws.execution.start_execution` from the result of
+    :py:func:`pack_tasks`
+
+    Args:
+        upload_s3_key (str): the execution s3 key prefix under which the
+            projects and resources were uploaded
+        packed_tasks (list): the packed simulations
+
+    Returns:
+        dict: the tasks, with a "task_list" key
+    """
+    task_list = []
+    for task in packed_tasks:
+        by_project: dict[str, list] = {}
+        for simulation in task:
+            by_project.setdefault(simulation["project_code"], []).append(
+                simulation["simulation_id"]
+            )
+        task_list.append(
+            {
+                "upload_s3_key": upload_s3_key,
+                "simulations": [
+                    {
+                        "project_code": project_code,
+                        "simulation_ids": sorted(simulation_ids),
+                    }
+                    for project_code, simulation_ids in sorted(
+                        by_project.items()
+                    )
+                ],
+            }
+        )
+    return {"task_list": task_list}
+
+
+def create_work_units(tasks: dict) -> dict:
+    """Split each task in a task list into one task per simulation, for
+    clusters whose workers lease simulation-sized work units.
+
+    Args:
+        tasks (dict): the tasks, with a "task_list" key
+
+    Returns:
+        dict: the tasks with one simulation each, with a "task_list" key
+    """
+    task_list = []
+    for task in tasks["task_list"]:
+        for simulation in task["simulations"]:
+            for simulation_id in simulation["simulation_ids"]:
+                task_list.append(
+                    dict(
+                        task,
+                        simulations=[
+                            {
+                                "project_code": simulation["project_code"],
+                                "simulation_ids": [simulation_id],
+                            }
+                        ],
+                    )
+                )
+    return dict(tasks, task_list=task_list)
+
+
+def get_expected_runtimes(
+    packed_tasks: list[list[dict]],
+    max_concurrency: int = 8,
+    default_runtime: float = 1.0,
+) -> list[float]:
+    """Get the expected runtime of each packed task
+
+    Args:
+        packed_tasks (list): the result of :py:func:`pack_tasks`
+        max_concurrency (int, optional): the number of simulations a worker
+            runs at once. Defaults to 8.
+        default_runtime (float, optional): runtime for simulations without
+            a "runtime" value. Defaults to 1.0.
+
+    Returns:
+        list: the expected runtime of each task
+    """
+    result = []
+    for i, task in enumerate(packed_tasks):
+        t = _Task(i, max_concurrency)
+        for simulation in sorted(
+            task, key=lambda s: -_get_runtime(s, default_runtime)
+        ):
+            t.add(simulation, _get_runtime(simulation, default_runtime))
+        result.append(t.makespan)
+    return result
+
+
+def pack(
+    simulations: list[dict],
+    upload_s3_key: str,
+    max_concurrency: int = 8,
+    n_tasks: Union[int, None] = None,
+    target_task_runtime: Union[float, None] = None,
+    default_runtime: float = 1.0,
+    affinity_tolerance: float = 0.1,
+) -> dict:
+    """Pack simulations into a balanced task list.
+
+    Exactly one of n_tasks or target_task_runtime must be specified.
+
+    Args:
+        simulations (list): list of dicts with "project_code",
+            "simulation_id" and optionally "runtime" keys
+        upload_s3_key (str): the execution s3 key prefix under which the
+            projects and resources were uploaded
+        max_concurrency (int, optional): the number of simulations a worker
+            runs at once. Defaults to 8.
+        n_tasks (int, optional): the number of tasks. Defaults to None.
+        target_task_runtime (float, optional): the desired task duration,
+            used to compute the number of tasks. Defaults to None.
+        default_runtime (float, optional): runtime for simulations without
+            a "runtime" value. Defaults to 1.0.
+        affinity_tolerance (float, optional): see :py:func:`pack_tasks`.
+            Defaults to 0.1.
+
+    Returns:
+        dict: the tasks, with a "task_list" key
+    """
+    if (n_tasks is None) == (target_task_runtime is None):
+        raise ValueError(
+            "specify exactly one of n_tasks or target_task_runtime"
+        )
+    if n_tasks is None:
+        n_tasks = get_task_count(
+            simulations, max_concurrency, target_task_runtime, default_runtime
+        )
+    packed = pack_tasks(
+        simulations,
+        n_tasks,
+        max_concurrency=max_concurrency,
+        default_runtime=default_runtime,
+        affinity_tolerance=affinity_tolerance,
+    )
+    return create_task_list(upload_s3_key, packed)
@@ -0,0 +1,196 @@
+import math
+from typing import Union
+from argparse import ArgumentParser
+from argparse import Namespace
+from boto3.s3.transfer import TransferConfig
+
+MB = 1024**2
+
+# the smallest part size permitted by S3 multipart uploads is 5MB, and the
+# largest number of parts is 10000
+_MIN_CHUNKSIZE_MB = 8
+_MAX_CHUNKSIZE_MB = 512
+# adaptive mode sizes chunks so that each transfer thread handles roughly
+# this many parts
+_PARTS_PER_THREAD = 4
+
+DEFAULT_TRANSFER_PROFILE = dict(
+    multipart_threshold_mb=8,
+    multipart_chunksize_mb=8,
+    max_concurrency=10,
+    use_threads=True,
+    num_download_attempts=10,
+    adaptive=False,
+)
+
+
+def get_transfer_profile(profile: Union[dict, None] = None) -> dict:
+    """Gets a complete transfer profile by filling in the values missing
+    from the specified profile with :py:data:`DEFAULT_TRANSFER_PROFILE`
+
+        Example::
+
+            {
+                "multipart_threshold_mb": 64,
+                "multipart_chunksize_mb": 64,
+                "max_concurrency": 16,
+                "use_threads": True,
+                "num_download_attempts": 10,
+                "adaptive": True
+            }
+
+    Args:
+        profile (dict, optional): partial or complete transfer profile.
+            Defaults to None.
+
+    Returns:
+        dict: the transfer profile
+    """
+    result = DEFAULT_TRANSFER_PROFILE.copy()
+    if profile:
+        unknown = set(profile.keys()) - set(result.keys())
+        if unknown:
+            raise ValueError(f"unknown transfer profile keys: {unknown}")
+        result.update(profile)
+    return result
+
+
+def get_transfer_config(
+    profile: dict, object_size: Union[int, None] = None
+) -> TransferConfig:
+    """Create a boto3 TransferConfig from a transfer profile.
+
+    If the profile is adaptive and the object size is known, the chunk size
+    and concurrency are chosen from the object size: small objects use a
+    single thread and large objects use larger chunks so that every thread
+    handles a few parts.
+
+    Args:
+        profile (dict): transfer profile, see :py:func:`get_transfer_profile`
+        object_size (int, optional): the size in bytes of the object to
+            transfer. Defaults to None.
+
+    Returns:
+        TransferConfig: the boto3 transfer configuration
+    """
+    profile = get_transfer_profile(profile)
+    chunksize_mb = profile["multipart_chunksize_mb"]
+    max_concurrency = profile["max_concurrency"]
+    if profile["adaptive"] and object_size is not None:
+        chunksize_mb = math.ceil(
+            object_size / MB / (max_concurrency * _PARTS_PER_THREAD)
+        )
+        chunksize_mb = min(
+            max(chunksize_mb, _MIN_CHUNKSIZE_MB), _MAX_CHUNKSIZE_MB
+        )
+        n_parts = math.ceil(object_size / (chunksize_mb * MB))
+        max_concurrency = max(1, min(max_concurrency, n_parts))
+
+    return TransferConfig(
+        multipart_threshold=profile["multipart_threshold_mb"] * MB,
+        multipart_chunksize=chunksize_mb * MB,
+        max_concurrency=max_concurrency,
+        use_threads=profile["use_threads"],
+        num_download_attempts=profile["num_download_attempts"],
+    )
+
+
+def add_arguments(parser: ArgumentParser) -> None:
+    """Add command line arguments for specifying a transfer profile
+
+    Args:
+        parser (ArgumentParser): the parser to add arguments to
+    """
+    parser.add_argument(
+        "--transfer_multipart_threshold_mb",
+        required=False,
+        type=int,
+        help="size in MB above which S3 transfers use multipart transfers",
+    )
+    parser.add_argument(
+        "--transfer_multipart_chunksize_mb",
+        required=False,
+        type=int,
+        help="size in MB of each part in S3 multipart transfers",
+    )
+    parser.add_argument(
+        "--transfer_max_concurrency",
+        required=False,
+        type=int,
+        help="maximum number of threads used by each S3 transfer",
+    )
+    parser.add_argument(
+        "--transfer_num_download_attempts",
+        required=False,
+        type=int,
+        help="number of attempts made to download each S3 object",
+    )
+    parser.add_argument(
+        "--transfer_disable_threads",
+        action="store_true",
+        help="perform S3 transfers on the calling thread only",
+    )
+    parser.add_argument(
+        "--transfer_adaptive",
+        action="store_true",
+        help="choose the S3 transfer chunk size and concurrency from the "
+        "size of each object",
+    )
+
+
+def from_args(args: Namespace) -> dict:
+    """Get the transfer profile specified by command line arguments added
+    with :py:func:`add_arguments`
+
+    Args:
+        args (Namespace): the parsed arguments
+
+    Returns:
+        dict: the transfer profile
+    """
+    profile = {}
+    if args.transfer_multipart_threshold_mb is not None:
+        profile["multipart_threshold_mb"] = (
+            args.transfer_multipart_threshold_mb
+        )
+    if args.transfer_multipart_chunksize_mb is not None:
+        profile["multipart_chunksize_mb"] = (
+            args.transfer_multipart_chunksize_mb
+        )
+    if args.transfer_max_concurrency is not None:
+        profile["max_concurrency"] = args.transfer_max_concurrency
+    if args.transfer_num_download_attempts is not None:
+        profile["num_download_attempts"] = args.transfer_num_download_attempts
+    if args.transfer_disable_threads:
+        profile["use_threads"] = False
+    if args.transfer_adaptive:
+        profile["adaptive"] = True
+    return get_transfer_profile(profile)
+
+
+def to_command_line(profile: dict) -> list[str]:
+    """Get the command line arguments, as accepted by
+    :py:func:`add_arguments`, for the specified transfer profile
+
+    Args:
+        profile (dict): transfer profile
+
+    Returns:
+        list: the command line arguments
+    """
+    profile = get_transfer_profile(profile)
+    command_line = [
+        "--transfer_multipart_threshold_mb",
+        str(profile["multipart_threshold_mb"]),
+        "--transfer_multipart_chunksize_mb",
+        str(profile["multipart_chunksize_mb"]),
+        "--transfer_max_concurrency",
+        str(profile["max_concurrency"]),
+        "--transfer_num_download_attempts",
+        str(profile["num_download_attempts"]),
+    ]
+    if not profile["use_threads"]:
+        command_line.append("--transfer_disable_threads")
+    if profile["adaptive"]:
+        command_line.append("--transfer_adaptive")
+    return command_line
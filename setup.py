@@ -16,6 +16,13 @@ console_scripts = [
     "cbm3_aws_cleanup = cbm3_aws.scripts.aws_cleanup:main",
     "cbm3_aws_start_execution = cbm3_aws.scripts.start_execution:main",
     "cbm3_aws_s3_upload = cbm3_aws.scripts.s3_upload:main",
+    "cbm3_aws_pack_tasks = cbm3_aws.scripts.pack_tasks:main",
+    "cbm3_aws_pull_runtime_history = "
+    "cbm3_aws.scripts.pull_runtime_history:main",
+    "cbm3_aws_autoscale = cbm3_aws.scripts.autoscale:main",
+    "cbm3_aws_rerun_failed = cbm3_aws.scripts.rerun_failed:main",
+    "cbm3_aws_state_transition_benchmark = "
+    "cbm3_aws.scripts.state_transition_benchmark:main",
 ]
 
 package_data = [
@@ -33,4 +40,12 @@ setup(
     entry_points={"console_scripts": console_scripts},
     package_data={"cbm3_aws": package_data},
     install_requires=requirements,
+    python_requires=">=3.9",
+    classifiers=[
+        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
+        "Programming Language :: Python :: 3.11",
+        "Programming Language :: Python :: 3.12",
+        "Programming Language :: Python :: 3.13",
+    ],
 )
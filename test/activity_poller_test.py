@@ -0,0 +1,90 @@
+import json
+import logging
+import unittest
+import datetime
+from botocore.exceptions import ClientError
+from cbm3_aws.instance.activity_poller import ActivityPoller
+
+
+class MockStepFunctionsClient:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get_activity_task(self, **kwargs):
+        self.calls.append(kwargs)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def _client_error(code):
+    return ClientError({"Error": {"Code": code}}, "GetActivityTask")
+
+
+class ActivityPoller_Test(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger("activity_poller_test")
+        self.sleeps = []
+
+    def _create_poller(self, client):
+        return ActivityPoller(
+            client,
+            "arn",
+            self.logger,
+            worker_name="worker",
+            sleep_func=self.sleeps.append,
+        )
+
+    def test_empty_polls_repoll_without_sleeping(self):
+        client = MockStepFunctionsClient(
+            [{"taskToken": ""}, {}, {"taskToken": "t", "input": "{}"}]
+        )
+        response = self._create_poller(client).poll()
+        self.assertEqual(response["taskToken"], "t")
+        self.assertEqual(len(client.calls), 3)
+        self.assertEqual(client.calls[0]["workerName"], "worker")
+        self.assertEqual(self.sleeps, [])
+
+    def test_throttling_backs_off(self):
+        client = MockStepFunctionsClient(
+            [
+                _client_error("ThrottlingException"),
+                _client_error("ThrottlingException"),
+                {"taskToken": "t", "input": "{}"},
+            ]
+        )
+        poller = self._create_poller(client)
+        poller.poll()
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(0 <= self.sleeps[0] <= poller.initial_backoff)
+        self.assertTrue(0 <= self.sleeps[1] <= 2 * poller.initial_backoff)
+
+    def test_other_errors_are_raised(self):
+        client = MockStepFunctionsClient([_client_error("AccessDenied")])
+        with self.assertRaises(ClientError):
+            self._create_poller(client).poll()
+
+    def test_record_pickup(self):
+        entered = datetime.datetime.now(
+            datetime.timezone.utc
+        ) - datetime.timedelta(seconds=5)
+        task_input = json.loads(
+            json.dumps(
+                {"EnteredTime": entered.isoformat().replace("+00:00", "Z")}
+            )
+        )
+        poller = self._create_poller(MockStepFunctionsClient([]))
+        with self.assertLogs(self.logger, level="INFO") as logs:
+            poller.record_pickup(task_input)
+        metric = [
+            x.msg
+            for x in logs.records
+            if isinstance(x.msg, dict) and "TaskPickupLatency" in x.msg
+        ][0]
+        self.assertGreaterEqual(metric["TaskPickupLatency"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
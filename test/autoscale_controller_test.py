@@ -0,0 +1,110 @@
+import unittest
+from cbm3_aws.aws.autoscale_controller import AutoscaleController
+from cbm3_aws.aws.autoscale_controller import get_tasks_per_instance
+
+
+class MockPaginator:
+    def __init__(self, executions):
+        self.executions = executions
+
+    def paginate(self, stateMachineArn, statusFilter):
+        n = self.executions[stateMachineArn]
+        # split into pages of 2 to exercise pagination
+        for start in range(0, n, 2):
+            yield {"executions": [{}] * min(2, n - start)}
+        if n == 0:
+            yield {"executions": []}
+
+
+class MockSFNClient:
+    def __init__(self):
+        self.executions = {"task": 0, "app": 0}
+
+    def get_paginator(self, name):
+        return MockPaginator(self.executions)
+
+
+class MockAutoScalingClient:
+    def __init__(self, desired, min_size, max_size):
+        self.group = dict(
+            DesiredCapacity=desired, MinSize=min_size, MaxSize=max_size
+        )
+        self.set_calls = []
+
+    def describe_auto_scaling_groups(self, AutoScalingGroupNames):
+        return {"AutoScalingGroups": [dict(self.group)]}
+
+    def set_desired_capacity(
+        self, AutoScalingGroupName, DesiredCapacity, HonorCooldown
+    ):
+        self.set_calls.append(DesiredCapacity)
+        self.group["DesiredCapacity"] = DesiredCapacity
+
+
+class AutoscaleController_Test(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.sfn = MockSFNClient()
+        self.autoscaling = MockAutoScalingClient(0, 0, 10)
+        self.controller = AutoscaleController(
+            self.autoscaling,
+            self.sfn,
+            "group",
+            "task",
+            "app",
+            tasks_per_instance=2,
+            scale_down_delay=100,
+            idle_timeout=200,
+            clock=lambda: self.now,
+        )
+
+    def _step(self, running_tasks, running_executions, elapsed=10):
+        self.now += elapsed
+        self.sfn.executions["task"] = running_tasks
+        self.sfn.executions["app"] = running_executions
+        return self.controller.step()
+
+    def test_scales_up_immediately_and_caps_at_max(self):
+        self.assertEqual(self._step(5, 1), 3)
+        self.assertEqual(self._step(50, 1), 10)
+        self.assertEqual(self.autoscaling.set_calls, [3, 10])
+
+    def test_scale_down_hysteresis(self):
+        self._step(20, 1)
+        self.assertEqual(self._step(4, 1), 10)
+        self.assertEqual(self._step(4, 1, elapsed=50), 10)
+        # demand rising again resets the delay
+        self.assertEqual(self._step(20, 1), 10)
+        self.assertEqual(self._step(4, 1), 10)
+        self.assertEqual(self._step(4, 1, elapsed=100), 2)
+        self.assertEqual(self.autoscaling.set_calls, [10, 2])
+
+    def test_scale_to_zero_when_idle(self):
+        self._step(4, 1)
+        self.assertEqual(self._step(0, 0), 2)
+        self.assertEqual(self._step(0, 0, elapsed=150), 2)
+        self.assertEqual(self._step(0, 0, elapsed=50), 0)
+        self.assertEqual(self.autoscaling.set_calls, [2, 0])
+
+    def test_respects_min_size(self):
+        self.autoscaling.group["MinSize"] = 1
+        self.assertEqual(self._step(0, 0), 0)
+        self.assertEqual(self._step(0, 0, elapsed=200), 1)
+
+    def test_inline_task_layout_scales_to_max(self):
+        self.controller.task_state_machine_arn = None
+        self.assertEqual(self._step(0, 1), 10)
+        self.assertEqual(self._step(0, 0), 10)
+        self.assertEqual(self._step(0, 0, elapsed=150), 10)
+        self.assertEqual(self._step(0, 0, elapsed=50), 0)
+
+    def test_get_tasks_per_instance(self):
+        # each 8 virtual CPU instance runs one worker process
+        self.assertEqual(get_tasks_per_instance(False), 1)
+        self.assertEqual(get_tasks_per_instance(False, max_tasks_held=2), 2)
+        # with dynamic work units a task is held per simulation slot
+        self.assertEqual(get_tasks_per_instance(True), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import json
+import unittest
+from cbm3_aws.aws import cbm3_run_state_machine
+
+
+class CBM3RunStateMachine_Test(unittest.TestCase):
+    def test_inline_map(self):
+        definition = json.loads(
+            cbm3_run_state_machine.get_state_machine("task_arn")
+        )
+        map_state = definition["States"]["map_tasks"]
+        self.assertEqual(map_state["ItemsPath"], "$.task_list")
+        self.assertNotIn("ItemReader", map_state)
+
+    def test_distributed_map(self):
+        definition = json.loads(
+            cbm3_run_state_machine.get_state_machine(
+                "task_arn",
+                distributed_map=True,
+                s3_bucket_name="bucket",
+                map_max_concurrency=500,
+                map_max_items_per_batch=4,
+            )
+        )
+        map_state = definition["States"]["map_tasks"]
+        self.assertEqual(map_state["MaxConcurrency"], 500)
+        self.assertEqual(map_state["ItemBatcher"]["MaxItemsPerBatch"], 4)
+        self.assertEqual(
+            map_state["ItemReader"]["Parameters"]["Bucket"], "bucket"
+        )
+        processor = map_state["ItemProcessor"]
+        self.assertEqual(processor["ProcessorConfig"]["Mode"], "DISTRIBUTED")
+        batch_state = processor["States"][processor["StartAt"]]
+        self.assertEqual(batch_state["ItemsPath"], "$.Items")
+        launch = batch_state["ItemProcessor"]["States"]["launch_cbm_task"]
+        self.assertEqual(launch["Parameters"]["StateMachineArn"], "task_arn")
+
+    def test_distributed_map_without_batching(self):
+        definition = json.loads(
+            cbm3_run_state_machine.get_state_machine(
+                "task_arn", distributed_map=True, s3_bucket_name="bucket"
+            )
+        )
+        map_state = definition["States"]["map_tasks"]
+        self.assertNotIn("ItemBatcher", map_state)
+        self.assertEqual(
+            map_state["ItemProcessor"]["StartAt"], "launch_cbm_task"
+        )
+
+    def test_distributed_map_requires_bucket(self):
+        with self.assertRaises(ValueError):
+            cbm3_run_state_machine.get_state_machine(
+                "task_arn", distributed_map=True
+            )
+
+    def test_inline_task_layout(self):
+        definition = json.loads(
+            cbm3_run_state_machine.get_state_machine(
+                None,
+                task_layout=cbm3_run_state_machine.INLINE_LAYOUT,
+                activity_arn="activity_arn",
+                task_retry_policy={"max_attempts": 3},
+            )
+        )
+        iterator = definition["States"]["map_tasks"]["Iterator"]
+        self.assertEqual(iterator["StartAt"], "RunCBMTask")
+        run_task = iterator["States"]["RunCBMTask"]
+        self.assertEqual(run_task["Resource"], "activity_arn")
+        self.assertEqual(run_task["Retry"][0]["MaxAttempts"], 2)
+        self.assertNotIn("launch_cbm_task", iterator["States"])
+
+    def test_inline_task_layout_distributed_map(self):
+        definition = json.loads(
+            cbm3_run_state_machine.get_state_machine(
+                None,
+                distributed_map=True,
+                s3_bucket_name="bucket",
+                map_max_items_per_batch=4,
+                task_layout=cbm3_run_state_machine.INLINE_LAYOUT,
+                activity_arn="activity_arn",
+            )
+        )
+        processor = definition["States"]["map_tasks"]["ItemProcessor"]
+        batch_processor = processor["States"]["launch_batch"]["ItemProcessor"]
+        self.assertEqual(batch_processor["ProcessorConfig"]["Mode"], "INLINE")
+        self.assertEqual(batch_processor["StartAt"], "RunCBMTask")
+
+    def test_task_layout_requires_arns(self):
+        with self.assertRaises(ValueError):
+            cbm3_run_state_machine.get_state_machine(None)
+        with self.assertRaises(ValueError):
+            cbm3_run_state_machine.get_state_machine(
+                "task_arn", task_layout=cbm3_run_state_machine.INLINE_LAYOUT
+            )
+        with self.assertRaises(ValueError):
+            cbm3_run_state_machine.get_state_machine(
+                "task_arn", task_layout="unknown"
+            )
+
+    def test_compact_results(self):
+        definition = json.loads(
+            cbm3_run_state_machine.get_state_machine(
+                "task_arn", compact_results=True
+            )
+        )
+        launch = definition["States"]["map_tasks"]["Iterator"]["States"][
+            "launch_cbm_task"
+        ]
+        self.assertEqual(
+            launch["ResultSelector"],
+            {"task.$": "States.StringToJson($.Output)"},
+        )
+        self.assertEqual(launch["OutputPath"], "$.task")
+        # the execution output is reduced to counts and failed task keys
+        result_selector = definition["States"]["map_tasks"]["ResultSelector"]
+        self.assertEqual(result_selector["tasks.$"], "States.ArrayLength($)")
+        self.assertEqual(
+            result_selector["failed_status_keys.$"],
+            "$[?(@.output.failed == true)].output.status_key",
+        )
+
+        definition = json.loads(
+            cbm3_run_state_machine.get_state_machine("task_arn")
+        )
+        self.assertNotIn("ResultSelector", definition["States"]["map_tasks"])
+        launch = definition["States"]["map_tasks"]["Iterator"]["States"][
+            "launch_cbm_task"
+        ]
+        self.assertNotIn("ResultSelector", launch)
+
+    def test_compact_results_distributed_map(self):
+        definition = json.loads(
+            cbm3_run_state_machine.get_state_machine(
+                "task_arn",
+                distributed_map=True,
+                s3_bucket_name="bucket",
+                compact_results=True,
+            )
+        )
+        # the results are written to S3 rather than reduced
+        map_state = definition["States"]["map_tasks"]
+        self.assertNotIn("ResultSelector", map_state)
+        self.assertIn("ResultWriter", map_state)
+
+
+if __name__ == "__main__":
+    unittest.main()
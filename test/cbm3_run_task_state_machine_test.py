@@ -0,0 +1,112 @@
+import json
+import unittest
+from argparse import ArgumentParser
+from cbm3_aws.aws import cbm3_run_task_state_machine
+from cbm3_aws.aws import task_retry_policy
+
+
+class CBM3RunTaskStateMachine_Test(unittest.TestCase):
+    def test_retry_policy(self):
+        definition = json.loads(
+            cbm3_run_task_state_machine.get_state_machine(
+                "activity_arn",
+                dict(
+                    heartbeat_seconds=120,
+                    initial_delay_seconds=30,
+                    backoff_rate=1.5,
+                    max_delay_seconds=600,
+                    max_attempts=3,
+                ),
+            )
+        )
+        task = definition["States"]["RunCBMTask"]
+        self.assertEqual(task["HeartbeatSeconds"], 120)
+        self.assertEqual(
+            task["Parameters"]["ExecutionId.$"], "$$.Execution.Id"
+        )
+        retry = task["Retry"][0]
+        self.assertIn("States.Timeout", retry["ErrorEquals"])
+        self.assertEqual(retry["IntervalSeconds"], 30)
+        self.assertEqual(retry["BackoffRate"], 1.5)
+        self.assertEqual(retry["MaxDelaySeconds"], 600)
+        # the first attempt plus 2 retries
+        self.assertEqual(retry["MaxAttempts"], 2)
+        terminal = definition["States"]["TerminalFailure"]
+        self.assertEqual(terminal["Type"], "Pass")
+
+    def test_terminal_failure_fail(self):
+        definition = json.loads(
+            cbm3_run_task_state_machine.get_state_machine(
+                "activity_arn", dict(terminal_failure="fail")
+            )
+        )
+        self.assertEqual(
+            definition["States"]["TerminalFailure"]["Type"], "Fail"
+        )
+
+    def test_compact_results(self):
+        definition = json.loads(
+            cbm3_run_task_state_machine.get_state_machine(
+                "activity_arn", compact_results=True, s3_bucket_name="bucket"
+            )
+        )
+        states = definition["States"]
+        self.assertEqual(
+            states["TerminalFailure"]["Next"], "RecordTerminalFailure"
+        )
+        record = states["RecordTerminalFailure"]
+        self.assertEqual(
+            record["Resource"], "arn:aws:states:::aws-sdk:s3:putObject"
+        )
+        self.assertEqual(record["Parameters"]["Bucket"], "bucket")
+        self.assertEqual(record["Next"], "TerminalFailureResult")
+        output = states["TerminalFailureResult"]["Parameters"]["output"]
+        # the same keys as the workers' compact task output
+        self.assertEqual(
+            {key.rstrip(".$") for key in output.keys()},
+            {"projects", "simulations", "failed", "status_key"},
+        )
+        self.assertEqual(
+            output["projects.$"], "States.ArrayLength($.Input.simulations)"
+        )
+        self.assertEqual(output["status_key.$"], record["Parameters"]["Key.$"])
+        self.assertIn("/task_status/", output["status_key.$"])
+
+    def test_compact_results_requires_bucket(self):
+        with self.assertRaises(ValueError):
+            cbm3_run_task_state_machine.get_state_machine(
+                "activity_arn", compact_results=True
+            )
+        # the fail terminal failure writes no status record
+        definition = json.loads(
+            cbm3_run_task_state_machine.get_state_machine(
+                "activity_arn",
+                dict(terminal_failure="fail"),
+                compact_results=True,
+            )
+        )
+        self.assertEqual(
+            definition["States"]["TerminalFailure"]["Type"], "Fail"
+        )
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            task_retry_policy.get_task_retry_policy(dict(max_attempts=0))
+        with self.assertRaises(ValueError):
+            task_retry_policy.get_task_retry_policy(dict(retries=1))
+
+    def test_policy_from_args(self):
+        parser = ArgumentParser()
+        task_retry_policy.add_arguments(parser)
+        policy = task_retry_policy.from_args(
+            parser.parse_args(
+                ["--task_max_attempts", "2", "--task_heartbeat_seconds", "30"]
+            )
+        )
+        self.assertEqual(policy["max_attempts"], 2)
+        self.assertEqual(policy["backoff_rate"], 2.0)
+        self.assertEqual(task_retry_policy.get_heartbeat_interval(policy), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+from cbm3_aws.instance.client_pool import ClientPool
+
+
+class ClientPool_Test(unittest.TestCase):
+    def test_clients_are_reused(self):
+        pool = ClientPool("us-east-1", max_pool_connections=25)
+        client = pool.client("stepfunctions")
+        self.assertIs(client, pool.client("stepfunctions"))
+        self.assertEqual(client.meta.config.max_pool_connections, 25)
+        self.assertIs(pool.resource("s3"), pool.resource("s3"))
+
+    def test_timeouts_select_distinct_clients(self):
+        pool = ClientPool("us-east-1")
+        long_poll = pool.client(
+            "stepfunctions", connect_timeout=65, read_timeout=65
+        )
+        self.assertIsNot(long_poll, pool.client("stepfunctions"))
+        self.assertEqual(long_poll.meta.config.read_timeout, 65)
+
+
+if __name__ == "__main__":
+    unittest.main()
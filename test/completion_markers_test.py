@@ -0,0 +1,59 @@
+import unittest
+from cbm3_aws import completion_markers
+
+
+class MockS3IO:
+    def __init__(self, markers, etags):
+        self.markers = markers
+        self.etags = etags
+
+    def get_json(self, s3_key, project_code, simulation_id):
+        return self.markers.get((project_code, simulation_id))
+
+    def get_etag(self, s3_key, project_code):
+        return self.etags[project_code]
+
+
+class CompletionMarkers_Test(unittest.TestCase):
+    def setUp(self):
+        self.s3_io = MockS3IO(
+            {
+                ("AB", 1): dict(execution_id="x1", project_etag='"e1"'),
+                ("AB", 2): dict(execution_id="x0", project_etag='"e1"'),
+                ("AB", 3): dict(execution_id="x0", project_etag='"e0"'),
+            },
+            {"AB": '"e1"', "BC": '"e2"'},
+        )
+
+    def get_incomplete(self, **kwargs):
+        return completion_markers.get_incomplete_simulations(
+            self.s3_io,
+            [dict(project_code="AB", simulation_ids=[1, 2, 3, 4])],
+            max_workers=2,
+            execution_id="x1",
+            **kwargs,
+        )
+
+    def test_markers_of_other_executions_are_ignored(self):
+        self.assertEqual(
+            self.get_incomplete(),
+            [dict(project_code="AB", simulation_ids=[2, 3, 4])],
+        )
+
+    def test_resume_skips_simulations_of_unchanged_projects(self):
+        self.assertEqual(
+            self.get_incomplete(project_etags={"AB": '"e1"'}),
+            [dict(project_code="AB", simulation_ids=[3, 4])],
+        )
+
+    def test_get_project_etags(self):
+        self.assertEqual(
+            completion_markers.get_project_etags(
+                self.s3_io, ["BC", "AB", "BC"], max_workers=2
+            ),
+            {"AB": '"e1"', "BC": '"e2"'},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
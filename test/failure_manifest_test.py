@@ -0,0 +1,179 @@
+import json
+import unittest
+from cbm3_aws.s3_io import S3IO
+from cbm3_aws import failure_manifest
+
+
+class MockS3Interface:
+    def __init__(self):
+        self.objects = {}
+
+    def put_json(self, keyName, data):
+        self.objects[keyName] = json.dumps(data).encode()
+
+    def get_json(self, keyName):
+        data = self.objects.get(keyName)
+        return None if data is None else json.loads(data)
+
+    def delete_object(self, keyName):
+        self.objects.pop(keyName, None)
+
+    def list_keys(self, prefix):
+        return [k for k in self.objects.keys() if k.startswith(prefix)]
+
+    def get_compressed_key(self, key_name_prefix, document_name):
+        return f"{key_name_prefix}/{document_name}.zip"
+
+    def head_object(self, keyName):
+        return dict(ETag=self.objects[keyName].decode())
+
+
+def _record(project_code, simulation_id, final=False):
+    return failure_manifest.create_record(
+        project_code=project_code,
+        simulation_id=simulation_id,
+        task_id="task",
+        error="Traceback...",
+        attempts=1,
+        final=final,
+    )
+
+
+class FailureManifest_Test(unittest.TestCase):
+    def test_write_read_and_clear(self):
+        s3_io = S3IO("execution", MockS3Interface())
+        failure_manifest.write_failures(
+            s3_io, [_record("B", 1), _record("A", 2), _record("A", 1)]
+        )
+        # a later attempt replaces the simulation's record
+        failure_manifest.write_failures(s3_io, [_record("A", 1, final=True)])
+        records = failure_manifest.read_manifest(s3_io)
+        self.assertEqual(
+            [(r["project_code"], r["simulation_id"]) for r in records],
+            [("A", 1), ("A", 2), ("B", 1)],
+        )
+        self.assertTrue(records[0]["final"])
+
+        failure_manifest.clear_failure(s3_io, "A", 2)
+        # clearing a simulation that never failed is a no-op
+        failure_manifest.clear_failure(s3_io, "C", 1)
+        self.assertEqual(
+            failure_manifest.get_failed_simulations(
+                failure_manifest.read_manifest(s3_io)
+            ),
+            [
+                dict(project_code="A", simulation_id=1),
+                dict(project_code="B", simulation_id=1),
+            ],
+        )
+
+    def test_get_unfinished_simulations(self):
+        s3_interface = MockS3Interface()
+        s3_io = S3IO("execution", s3_interface)
+        for project_code in ["A", "B"]:
+            s3_interface.objects[
+                f"cbm3_aws/execution/project/{project_code}.zip"
+            ] = f'"{project_code}1"'.encode()
+        s3_io.put_json(
+            dict(execution_id="x", project_etag='"A1"'),
+            "completed",
+            project_code="A",
+            simulation_id=1,
+        )
+        # completed before project B was uploaded again
+        s3_io.put_json(
+            dict(execution_id="x", project_etag='"B0"'),
+            "completed",
+            project_code="B",
+            simulation_id=1,
+        )
+        task_list = [
+            dict(
+                upload_s3_key="execution",
+                simulations=[dict(project_code="A", simulation_ids=[1, 2])],
+            ),
+            # a task that timed out, with no failure records
+            dict(
+                upload_s3_key="execution",
+                simulations=[
+                    dict(project_code="A", simulation_ids=[3]),
+                    dict(project_code="B", simulation_ids=[1]),
+                ],
+            ),
+        ]
+        self.assertEqual(
+            failure_manifest.get_unfinished_simulations(s3_io, task_list),
+            [
+                dict(project_code="A", simulation_id=2),
+                dict(project_code="A", simulation_id=3),
+                dict(project_code="B", simulation_id=1),
+            ],
+        )
+
+    def test_get_rerun_simulations(self):
+        s3_interface = MockS3Interface()
+        s3_io = S3IO("execution", s3_interface)
+        s3_interface.objects["cbm3_aws/execution/project/A.zip"] = b'"A1"'
+        s3_io.put_json(
+            dict(execution_id="x", project_etag='"A1"'),
+            "completed",
+            project_code="A",
+            simulation_id=1,
+        )
+        failure_manifest.write_failures(s3_io, [_record("A", 2, final=True)])
+        records = failure_manifest.read_manifest(s3_io)
+        # without the tasks, only the failure manifest is rerun
+        self.assertEqual(
+            failure_manifest.get_rerun_simulations(s3_io, records),
+            [dict(project_code="A", simulation_id=2)],
+        )
+        task_list = [
+            dict(
+                upload_s3_key="execution",
+                simulations=[dict(project_code="A", simulation_ids=[1, 2])],
+            ),
+            # a task that timed out, with no failure records
+            dict(
+                upload_s3_key="execution",
+                simulations=[dict(project_code="A", simulation_ids=[3])],
+            ),
+        ]
+        self.assertEqual(
+            failure_manifest.get_rerun_simulations(s3_io, records, task_list),
+            [
+                dict(project_code="A", simulation_id=2),
+                dict(project_code="A", simulation_id=3),
+            ],
+        )
+
+    def test_create_rerun_tasks(self):
+        simulations = [
+            dict(project_code="A", simulation_id=i) for i in range(10)
+        ] + [dict(project_code="B", simulation_id=1)]
+        tasks = failure_manifest.create_rerun_tasks(
+            simulations, "upload_key", max_concurrency=4
+        )
+        self.assertEqual(len(tasks["task_list"]), 3)
+        self.assertEqual(
+            sum(
+                len(x["simulation_ids"])
+                for task in tasks["task_list"]
+                for x in task["simulations"]
+            ),
+            11,
+        )
+        for task in tasks["task_list"]:
+            self.assertEqual(task["upload_s3_key"], "upload_key")
+
+        tasks = failure_manifest.create_rerun_tasks(
+            simulations, "upload_key", n_tasks=1
+        )
+        self.assertEqual(len(tasks["task_list"]), 1)
+        self.assertEqual(
+            failure_manifest.create_rerun_tasks([], "upload_key"),
+            {"task_list": []},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from botocore.exceptions import ClientError
+from cbm3_aws.instance import failure_policy
+from cbm3_aws.instance.failure_policy import FailurePolicy
+
+
+def _client_error(code):
+    return ClientError({"Error": {"Code": code}}, "GetObject")
+
+
+class FailurePolicy_Test(unittest.TestCase):
+    def test_classify_retryable(self):
+        policy = FailurePolicy(max_attempts=3)
+        for error in [
+            OSError("disk full"),
+            RuntimeError("simulation crashed"),
+            _client_error("SlowDown"),
+            _client_error("ThrottlingException"),
+            failure_policy.SimulationsFailed(
+                [dict(project_code="AB", simulation_id=1, error="")]
+            ),
+        ]:
+            self.assertEqual(policy.classify(error, 1), failure_policy.RETRY)
+            self.assertEqual(
+                policy.classify(error, 3), failure_policy.QUARANTINE
+            )
+
+    def test_classify_permanent(self):
+        policy = FailurePolicy(max_attempts=3)
+        for error in [
+            KeyError("simulations"),
+            ValueError("bad input"),
+            _client_error("NoSuchKey"),
+        ]:
+            self.assertEqual(
+                policy.classify(error, 1), failure_policy.QUARANTINE
+            )
+
+    def test_get_task_id_is_stable(self):
+        task_input = {
+            "upload_s3_key": "x",
+            "simulations": [{"project_code": "AB", "simulation_ids": [1]}],
+        }
+        self.assertEqual(
+            failure_policy.get_task_id(task_input),
+            failure_policy.get_task_id(dict(task_input, upload_s3_key="x")),
+        )
+        self.assertNotEqual(
+            failure_policy.get_task_id(task_input),
+            failure_policy.get_task_id(
+                {
+                    "simulations": [
+                        {"project_code": "AB", "simulation_ids": [2]}
+                    ]
+                }
+            ),
+        )
+
+    def test_get_task_id_is_scoped_to_execution(self):
+        task_input = {
+            "simulations": [{"project_code": "AB", "simulation_ids": [1]}]
+        }
+        self.assertEqual(
+            failure_policy.get_task_id(task_input, "execution1"),
+            failure_policy.get_task_id(task_input, "execution1"),
+        )
+        self.assertNotEqual(
+            failure_policy.get_task_id(task_input, "execution1"),
+            failure_policy.get_task_id(task_input, "execution2"),
+        )
+        self.assertNotEqual(
+            failure_policy.get_task_id(task_input, "execution1"),
+            failure_policy.get_task_id(task_input),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
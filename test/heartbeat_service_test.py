@@ -0,0 +1,69 @@
+import time
+import logging
+import unittest
+from threading import Lock
+from botocore.exceptions import ClientError
+from cbm3_aws.instance.heartbeat_service import HeartbeatService
+
+
+class MockStepFunctionsClient:
+    def __init__(self, timed_out_tokens=()):
+        self.timed_out_tokens = set(timed_out_tokens)
+        self.calls = []
+        self.lock = Lock()
+
+    def send_task_heartbeat(self, taskToken):
+        with self.lock:
+            self.calls.append((time.monotonic(), taskToken))
+        if taskToken in self.timed_out_tokens:
+            raise ClientError(
+                {"Error": {"Code": "TaskTimedOut"}}, "SendTaskHeartbeat"
+            )
+
+
+class HeartbeatService_Test(unittest.TestCase):
+    def create(self, client):
+        service = HeartbeatService(
+            client,
+            logging.getLogger(__name__),
+            interval=0.1,
+            min_call_spacing=0.01,
+        )
+        service.start()
+        self.addCleanup(service.join)
+        self.addCleanup(service.stop)
+        return service
+
+    def test_heartbeats_for_many_tokens(self):
+        client = MockStepFunctionsClient()
+        service = self.create(client)
+        for i in range(5):
+            service.register(f"token{i}")
+        time.sleep(0.5)
+        service.unregister("token0")
+        time.sleep(0.05)
+        n_calls = len(client.calls)
+        time.sleep(0.3)
+        tokens = [token for _, token in client.calls]
+        for i in range(5):
+            self.assertGreaterEqual(tokens.count(f"token{i}"), 3)
+        self.assertEqual(tokens[n_calls:].count("token0"), 0)
+        times = [t for t, _ in client.calls]
+        spacing = min(b - a for a, b in zip(times, times[1:]))
+        self.assertGreaterEqual(spacing, 0.009)
+
+    def test_timed_out_token_is_cancelled(self):
+        client = MockStepFunctionsClient(timed_out_tokens=["expired"])
+        service = self.create(client)
+        cancelled = service.register("expired")
+        active = service.register("active")
+        self.assertTrue(cancelled.wait(5))
+        time.sleep(0.3)
+        self.assertFalse(active.is_set())
+        tokens = [token for _, token in client.calls]
+        self.assertEqual(tokens.count("expired"), 1)
+        self.assertGreater(tokens.count("active"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
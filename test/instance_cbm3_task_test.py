@@ -0,0 +1,116 @@
+import time
+import logging
+import unittest
+import importlib.util
+from threading import Lock
+from unittest.mock import patch
+
+# instance_cbm3_task runs simulations with cbm3_python, which is only
+# installed on the worker instances
+HAS_CBM3_PYTHON = importlib.util.find_spec("cbm3_python") is not None
+if HAS_CBM3_PYTHON:
+    from cbm3_aws.instance import instance_cbm3_task
+
+
+class SimulationTracker:
+    """Counts the simulations that are running, finished but not uploaded,
+    and uploading"""
+
+    def __init__(self, fail_ids=()):
+        self.lock = Lock()
+        self.running = 0
+        self.max_running = 0
+        self.not_uploaded = 0
+        self.max_not_uploaded = 0
+        self.uploading = 0
+        self.max_uploading = 0
+        self.uploaded = []
+        self.fail_ids = fail_ids
+
+    def run_monitored(self, target, args, poll_interval, cancel_events):
+        simulation_id = args[0]["project_simulation_id"]
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+            if simulation_id in self.fail_ids:
+                raise RuntimeError("simulation failed")
+            self.not_uploaded += 1
+            self.max_not_uploaded = max(
+                self.max_not_uploaded, self.not_uploaded
+            )
+        return dict(start_time=0, wall_time=0, peak_memory_bytes=0)
+
+    def upload_task(self, s3_io, task, logger, cancelled):
+        with self.lock:
+            self.uploading += 1
+            self.max_uploading = max(self.max_uploading, self.uploading)
+        # uploads are slow relative to the simulations
+        time.sleep(0.2)
+        with self.lock:
+            self.uploading -= 1
+            self.not_uploaded -= 1
+            self.uploaded.append(task["simulation_id"])
+        return dict(upload_bytes=0, upload_seconds=0)
+
+
+@unittest.skipUnless(HAS_CBM3_PYTHON, "cbm3_python is not installed")
+class InstanceCBM3Task_Test(unittest.TestCase):
+    def run_pipelined(self, tracker, n_simulations, failures=None):
+        tasks = [
+            dict(project_code="AB", simulation_id=i)
+            for i in range(n_simulations)
+        ]
+        args_list = [
+            dict(project_simulation_id=task["simulation_id"]) for task in tasks
+        ]
+        with patch.object(
+            instance_cbm3_task, "run_monitored", tracker.run_monitored
+        ), patch.object(
+            instance_cbm3_task, "_upload_task", tracker.upload_task
+        ):
+            instance_cbm3_task._run_pipelined(
+                tasks,
+                args_list,
+                "toolbox_env",
+                s3_io=None,
+                logger=logging.getLogger(__name__),
+                max_concurrency=4,
+                upload_workers=4,
+                max_pending_uploads=2,
+                create_record=lambda task, run_stats: dict(run_stats),
+                failures=failures,
+            )
+
+    def test_pending_uploads_do_not_limit_running_simulations(self):
+        tracker = SimulationTracker()
+        self.run_pipelined(tracker, 4)
+        self.assertEqual(sorted(tracker.uploaded), list(range(4)))
+        self.assertEqual(tracker.max_running, 4)
+
+    def test_pending_uploads_bound_finished_simulations(self):
+        tracker = SimulationTracker()
+        self.run_pipelined(tracker, 16)
+        self.assertEqual(sorted(tracker.uploaded), list(range(16)))
+        # the upload pool has 4 workers, but only the 2 results holding a
+        # permit are queued or uploading
+        self.assertLessEqual(tracker.max_uploading, 2)
+        # the other finished results wait on their simulation's thread, so
+        # they take the place of running simulations
+        self.assertLessEqual(tracker.max_not_uploaded, 2 + 4)
+
+    def test_failed_simulation_releases_permit(self):
+        tracker = SimulationTracker(fail_ids=[0, 1, 2])
+        failures = []
+        self.run_pipelined(tracker, 6, failures)
+        self.assertEqual(sorted(tracker.uploaded), [3, 4, 5])
+        self.assertEqual(
+            [
+                f["simulation_id"]
+                for f in sorted(failures, key=lambda f: f["simulation_id"])
+            ],
+            [0, 1, 2],
+        )
+        self.assertLessEqual(tracker.max_uploading, 2)
@@ -0,0 +1,95 @@
+import json
+import time
+import logging
+import unittest
+import importlib.util
+from threading import Event
+from threading import Thread
+from cbm3_aws.instance.simulation_slots import SimulationSlots
+from cbm3_aws.instance.simulation_slots import TaskSlots
+
+# instance_task runs simulations with cbm3_python, which is only
+# installed on the worker instances
+HAS_CBM3_PYTHON = importlib.util.find_spec("cbm3_python") is not None
+if HAS_CBM3_PYTHON:
+    from cbm3_aws.instance import instance_task
+
+
+def _response(task_token, n_simulations):
+    return dict(
+        taskToken=task_token,
+        input=json.dumps(
+            {
+                "Input": {
+                    "simulations": [
+                        {
+                            "project_code": "AB",
+                            "simulation_ids": list(range(n_simulations)),
+                        }
+                    ]
+                }
+            }
+        ),
+    )
+
+
+class MockPoller:
+    def __init__(self, responses, interrupted):
+        self.responses = list(responses)
+        self.interrupted = interrupted
+        self.n_polls = 0
+
+    def poll(self):
+        self.n_polls += 1
+        if not self.responses[1:]:
+            # stop the worker after the last task
+            self.interrupted.set()
+        return self.responses.pop(0)
+
+
+@unittest.skipUnless(HAS_CBM3_PYTHON, "cbm3_python is not installed")
+class InstanceTask_Test(unittest.TestCase):
+    def test_held_task_is_reserved_before_its_thread_starts(self):
+        interrupted = Event()
+        task_started = Event()
+        poller = MockPoller(
+            [_response("token1", 2), _response("token2", 1)], interrupted
+        )
+        simulation_slots = SimulationSlots(2)
+        run_calls = []
+
+        def run_activity_task(
+            task_token, task_input, task_max_concurrency, task_slots
+        ):
+            run_calls.append((task_token, task_slots))
+            # simulates a task thread that is slow to start
+            task_started.wait()
+            task_slots.close()
+
+        worker = Thread(
+            target=instance_task._run_held_tasks,
+            kwargs=dict(
+                poller=poller,
+                run_activity_task=run_activity_task,
+                max_tasks_held=2,
+                task_max_concurrency=2,
+                simulation_slots=simulation_slots,
+                interrupted=interrupted,
+                logger=logging.getLogger(__name__),
+            ),
+        )
+        worker.start()
+        # the first task's 2 simulations fill the slots, so the worker
+        # must not poll for another task until it finishes
+        time.sleep(0.2)
+        self.assertFalse(simulation_slots.wait_for_free_slot(timeout=0))
+        self.assertEqual(poller.n_polls, 1)
+        task_started.set()
+        worker.join(timeout=5)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(poller.n_polls, 2)
+        self.assertEqual(
+            [task_token for task_token, _ in run_calls], ["token1", "token2"]
+        )
+        for _, task_slots in run_calls:
+            self.assertIsInstance(task_slots, TaskSlots)
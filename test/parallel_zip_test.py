@@ -0,0 +1,92 @@
+import unittest
+import os
+import sys
+import zipfile
+from unittest.mock import patch
+from tempfile import TemporaryDirectory
+from cbm3_aws import parallel_zip
+
+
+class ParallelZip_Test(unittest.TestCase):
+    def _create_files(self, source_dir):
+        contents = {}
+        for i in range(1, 20):
+            subdir = os.path.join(source_dir, str(i % 3))
+            os.makedirs(subdir, exist_ok=True)
+            name = os.path.join(str(i % 3), f"flat_file{i}.txt")
+            contents[name] = f"flat file contents {i}\n".encode() * 1000 * i
+        contents["tiny.txt"] = b"tiny"
+        contents["already_compressed.zip"] = os.urandom(5000)
+        os.makedirs(os.path.join(source_dir, "empty_dir"))
+        for name, data in contents.items():
+            with open(os.path.join(source_dir, name), "wb") as f:
+                f.write(data)
+        return contents
+
+    def test_supported_python_version(self):
+        # the ZipFile internals used to append compressed members must be
+        # present on every supported version
+        self.assertLessEqual(
+            sys.version_info[:2], parallel_zip.MAX_VERIFIED_PYTHON_VERSION
+        )
+        with TemporaryDirectory() as temp_dir:
+            with zipfile.ZipFile(os.path.join(temp_dir, "x.zip"), "w") as z:
+                self.assertTrue(parallel_zip.supports_parallel_compression(z))
+
+    def test_make_zipfile(self):
+        self._test_make_zipfile()
+
+    def test_make_zipfile_public_api(self):
+        with patch.object(
+            parallel_zip, "supports_parallel_compression", lambda z: False
+        ), patch.object(
+            parallel_zip, "_write_member", side_effect=AssertionError
+        ):
+            self._test_make_zipfile()
+
+    def _test_make_zipfile(self):
+        with TemporaryDirectory() as temp_dir:
+            source_dir = os.path.join(temp_dir, "source")
+            contents = self._create_files(source_dir)
+            output = os.path.join(temp_dir, "out.zip")
+            parallel_zip.make_zipfile(
+                output, source_dir, compression_level=9, max_workers=3
+            )
+            with zipfile.ZipFile(output) as z:
+                self.assertIsNone(z.testzip())
+                for name, data in contents.items():
+                    self.assertEqual(z.read(name.replace(os.sep, "/")), data)
+                infos = {x.filename: x for x in z.infolist()}
+                self.assertIn("empty_dir/", infos)
+                self.assertEqual(
+                    infos["tiny.txt"].compress_type, zipfile.ZIP_STORED
+                )
+                self.assertEqual(
+                    infos["already_compressed.zip"].compress_type,
+                    zipfile.ZIP_STORED,
+                )
+                self.assertEqual(
+                    infos["1/flat_file1.txt"].compress_type,
+                    zipfile.ZIP_DEFLATED,
+                )
+
+    def test_make_zipfile_store_only(self):
+        with TemporaryDirectory() as temp_dir:
+            source_dir = os.path.join(temp_dir, "source")
+            contents = self._create_files(source_dir)
+            output = os.path.join(temp_dir, "out.zip")
+            parallel_zip.make_zipfile(
+                output, source_dir, compression_level=0, max_workers=2
+            )
+            with zipfile.ZipFile(output) as z:
+                self.assertIsNone(z.testzip())
+                for info in z.infolist():
+                    self.assertEqual(info.compress_type, zipfile.ZIP_STORED)
+                self.assertEqual(
+                    len([x for x in z.infolist() if not x.is_dir()]),
+                    len(contents),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import time
+import unittest
+from threading import Event
+from threading import Timer
+from cbm3_aws.instance import process_monitor
+
+
+def _allocate(n_bytes):
+    import time
+
+    data = bytearray(n_bytes)
+    time.sleep(0.5)
+    return len(data)
+
+
+def _fail():
+    raise SystemExit(3)
+
+
+def _sleep(seconds):
+    import time
+
+    time.sleep(seconds)
+
+
+class ProcessMonitor_Test(unittest.TestCase):
+    def test_run_monitored(self):
+        n_bytes = 50 * 1024**2
+        result = process_monitor.run_monitored(
+            _allocate, (n_bytes,), poll_interval=0.05
+        )
+        self.assertGreater(result["wall_time"], 0.5)
+        self.assertGreater(result["peak_memory_bytes"], n_bytes)
+
+    def test_run_monitored_failure(self):
+        with self.assertRaises(RuntimeError):
+            process_monitor.run_monitored(_fail, (), poll_interval=0.05)
+
+    def test_run_monitored_cancelled(self):
+        cancel_event = Event()
+        Timer(0.5, cancel_event.set).start()
+        start_time = time.time()
+        with self.assertRaises(process_monitor.ProcessCancelled):
+            process_monitor.run_monitored(
+                _sleep,
+                (30,),
+                poll_interval=0.05,
+                cancel_events=[Event(), cancel_event],
+            )
+        self.assertLess(time.time() - start_time, 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import unittest
+import os
+import json
+from tempfile import TemporaryDirectory
+from cbm3_aws.resource_cache import ResourceCache
+
+
+class MockS3Interface(object):
+    def __init__(self):
+        self.etags = {}
+        self.contents = {}
+        self.download_count = 0
+        self.conditional_head_count = 0
+        self.head_count = 0
+
+    def put(self, key_name_prefix, document_name, etag, contents):
+        key = self.get_compressed_key(key_name_prefix, document_name)
+        self.etags[key] = etag
+        self.contents[key] = contents
+
+    def get_compressed_key(self, key_name_prefix, document_name):
+        return f"{key_name_prefix}/{document_name}.zip"
+
+    def head_object(self, keyName, if_none_match=None):
+        self.head_count += 1
+        if if_none_match:
+            self.conditional_head_count += 1
+            if if_none_match == self.etags[keyName]:
+                return None
+        return dict(
+            ETag=self.etags[keyName],
+            ContentLength=len(self.contents[keyName]),
+            VersionId=None,
+        )
+
+    def download_compressed(self, key_name_prefix, document_name, local_path):
+        self.download_count += 1
+        key = self.get_compressed_key(key_name_prefix, document_name)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        with open(local_path, "w") as f:
+            f.write(self.contents[key])
+
+
+class ResourceCache_Test(unittest.TestCase):
+    def test_get_downloads_once_for_unchanged_etag(self):
+        s3 = MockS3Interface()
+        s3.put("prefix", "doc", '"etag1"', "contents1")
+        with TemporaryDirectory() as temp_dir:
+            cache = ResourceCache(temp_dir, max_size_bytes=1024)
+            path1 = cache.get(s3, "prefix", "doc", "doc.mdb")
+            path2 = cache.get(s3, "prefix", "doc", "doc.mdb")
+            self.assertEqual(path1, path2)
+            self.assertEqual(os.path.basename(path1), "doc.mdb")
+            self.assertEqual(s3.download_count, 1)
+            self.assertEqual(cache.hits, 1)
+            self.assertEqual(cache.misses, 1)
+            with open(path1) as f:
+                self.assertEqual(f.read(), "contents1")
+
+    def test_get_revalidates_with_conditional_head(self):
+        s3 = MockS3Interface()
+        s3.put("prefix", "doc", '"etag1"', "contents1")
+        with TemporaryDirectory() as temp_dir:
+            cache = ResourceCache(temp_dir, max_size_bytes=1024)
+            cache.get(s3, "prefix", "doc", "doc.mdb")
+            # a second cache instance shares the directory, as do the worker
+            # processes on an instance
+            other_cache = ResourceCache(temp_dir, max_size_bytes=1024)
+            other_cache.get(s3, "prefix", "doc", "doc.mdb")
+            self.assertEqual(s3.conditional_head_count, 1)
+            self.assertEqual(other_cache.revalidations, 1)
+            self.assertEqual(s3.download_count, 1)
+
+    def test_get_downloads_again_for_changed_etag(self):
+        s3 = MockS3Interface()
+        s3.put("prefix", "doc", '"etag1"', "contents1")
+        with TemporaryDirectory() as temp_dir:
+            cache = ResourceCache(temp_dir, max_size_bytes=1024)
+            cache.get(s3, "prefix", "doc", "doc.mdb")
+            s3.put("prefix", "doc", '"etag2"', "contents2")
+            path = cache.get(s3, "prefix", "doc", "doc.mdb")
+            self.assertEqual(s3.download_count, 2)
+            # the changed object is described by the conditional request
+            self.assertEqual(s3.head_count, 2)
+            with open(path) as f:
+                self.assertEqual(f.read(), "contents2")
+
+    def test_least_recently_used_entries_are_evicted(self):
+        s3 = MockS3Interface()
+        s3.put("prefix", "a", '"a"', "a" * 10)
+        s3.put("prefix", "b", '"b"', "b" * 10)
+        s3.put("prefix", "c", '"c"', "c" * 10)
+        with TemporaryDirectory() as temp_dir:
+            cache = ResourceCache(temp_dir, max_size_bytes=25)
+            path_a = cache.get(s3, "prefix", "a", "a")
+            path_b = cache.get(s3, "prefix", "b", "b")
+            cache.release(path_a)
+            cache.release(path_b)
+            # make "a" the least recently used entry
+            entry_dir = os.path.dirname(os.path.dirname(path_a))
+            os.utime(os.path.join(entry_dir, "entry.json"), (0, 0))
+            path_c = cache.get(s3, "prefix", "c", "c")
+            self.assertFalse(os.path.exists(path_a))
+            self.assertTrue(os.path.exists(path_b))
+            self.assertTrue(os.path.exists(path_c))
+
+    def test_pinned_entries_are_not_evicted(self):
+        s3 = MockS3Interface()
+        s3.put("prefix", "a", '"a"', "a" * 10)
+        s3.put("prefix", "b", '"b"', "b" * 10)
+        s3.put("prefix", "c", '"c"', "c" * 10)
+        with TemporaryDirectory() as temp_dir:
+            cache = ResourceCache(temp_dir, max_size_bytes=15)
+            path_a = cache.get(s3, "prefix", "a", "a")
+            # another worker process uses "b" while "a" is still in use
+            other_cache = ResourceCache(temp_dir, max_size_bytes=15)
+            path_b = other_cache.get(s3, "prefix", "b", "b")
+            self.assertTrue(os.path.exists(path_a))
+            cache.release(path_a)
+            path_c = other_cache.get(s3, "prefix", "c", "c")
+            self.assertFalse(os.path.exists(path_a))
+            self.assertTrue(os.path.exists(path_b))
+            self.assertTrue(os.path.exists(path_c))
+
+    def test_pins_of_exited_processes_are_ignored(self):
+        s3 = MockS3Interface()
+        s3.put("prefix", "a", '"a"', "a" * 10)
+        s3.put("prefix", "b", '"b"', "b" * 10)
+        with TemporaryDirectory() as temp_dir:
+            cache = ResourceCache(temp_dir, max_size_bytes=15)
+            path_a = cache.get(s3, "prefix", "a", "a")
+            cache.release(path_a)
+            address = os.path.basename(
+                os.path.dirname(os.path.dirname(path_a))
+            )
+            stale_pin = os.path.join(temp_dir, "pins", address, "stale.json")
+            with open(stale_pin, "w") as pin_file:
+                # the pid of an exited process, since reused
+                json.dump(dict(pid=os.getpid(), create_time=0.0), pin_file)
+            cache.get(s3, "prefix", "b", "b")
+            self.assertFalse(os.path.exists(path_a))
+            self.assertFalse(os.path.exists(stale_pin))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from cbm3_aws.s3_io import S3IO
+from cbm3_aws import runtime_history
+from cbm3_aws.runtime_history import RuntimeHistory
+
+
+class MockS3Interface:
+    def __init__(self):
+        self.objects = {}
+
+    def put_bytes(self, keyName, data, content_type=None):
+        self.objects[keyName] = data
+
+    def get_bytes(self, keyName):
+        return self.objects.get(keyName)
+
+    def list_keys(self, prefix):
+        return [k for k in self.objects.keys() if k.startswith(prefix)]
+
+
+def _record(project_code, simulation_id, wall_time, start_time=0.0):
+    return runtime_history.create_record(
+        execution="execution",
+        task_id="task",
+        project_code=project_code,
+        simulation_id=simulation_id,
+        start_time=start_time,
+        wall_time=wall_time,
+        peak_memory_bytes=100,
+        upload_bytes=10,
+        succeeded=True,
+    )
+
+
+class RuntimeHistory_Test(unittest.TestCase):
+    def test_create_record_rejects_unknown_fields(self):
+        with self.assertRaises(ValueError):
+            runtime_history.create_record(runtime=1)
+
+    def test_write_read_and_pull(self):
+        s3_io = S3IO("execution", MockS3Interface())
+        runtime_history.write_records(
+            s3_io, "task1", [_record("A", 1, 10.0), _record("A", 2, 20.0)]
+        )
+        runtime_history.write_records(s3_io, "task2", [_record("B", 1, 5.0)])
+        self.assertEqual(len(runtime_history.read_records(s3_io)), 3)
+        with TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, "history.db")
+            with RuntimeHistory(db_path) as history:
+                self.assertEqual(history.pull(s3_io), 3)
+                # pulling again replaces rather than duplicates records
+                history.pull(s3_io)
+                summary = history.get_project_summary()
+                self.assertEqual(
+                    [(x["project_code"], x["runs"]) for x in summary],
+                    [("A", 2), ("B", 1)],
+                )
+
+    def test_estimates(self):
+        with TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, "history.db")
+            with RuntimeHistory(db_path) as history:
+                history.add_records(
+                    [
+                        _record("A", 1, 10.0, start_time=0.0),
+                        _record("A", 1, 30.0, start_time=1.0),
+                        _record("A", 2, 100.0),
+                    ]
+                )
+                self.assertEqual(history.get_estimate("A", 1), 20.0)
+                self.assertEqual(history.get_estimate("A", 3), 30.0)
+                self.assertIsNone(history.get_estimate("B", 1))
+                estimated = history.add_estimates(
+                    [
+                        dict(project_code="A", simulation_id=2),
+                        dict(project_code="A", simulation_id=1, runtime=1),
+                        dict(project_code="B", simulation_id=1),
+                    ]
+                )
+                self.assertEqual(
+                    [x.get("runtime") for x in estimated], [100.0, 1, None]
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
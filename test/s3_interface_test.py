@@ -1,8 +1,14 @@
 import unittest
 import os
+import io
+import re
 import shutil
 import glob
+from tempfile import TemporaryDirectory
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
 from cbm3_aws.s3_interface import S3Interface
+from cbm3_aws.s3_range_reader import S3RangeReader
 
 
 class MockS3Resource(object):
@@ -23,13 +29,50 @@ class MockS3Bucket(object):
     def bind_upload_file_method(self, method):
         self.upload_file_method = method
 
-    def download_file(self, keyName, localPath):
+    def download_file(self, keyName, localPath, Config=None):
         self.download_file_method(keyName, localPath)
 
-    def upload_file(self, localPath, keyName):
+    def upload_file(self, localPath, keyName, Config=None):
         self.upload_file_method(localPath, keyName)
 
 
+class MockS3Client(object):
+    """stores objects in memory and serves head and ranged get requests"""
+
+    def __init__(self):
+        self.objects = {}
+        self.get_object_count = 0
+
+    def head_object(self, Bucket, Key, IfNoneMatch=None):
+        return dict(
+            ETag=f"etag_{Key}",
+            ContentLength=len(self.objects[Key]),
+        )
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        self.objects[Key] = Body
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        self.get_object_count += 1
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        if Range is None:
+            return dict(Body=io.BytesIO(self.objects[Key]))
+        start, end = [
+            int(x) for x in re.match(r"bytes=(\d+)-(\d+)", Range).groups()
+        ]
+        data = self.objects[Key]
+        return dict(Body=io.BytesIO(data[start:][: end - start + 1]))
+
+
+class MockS3BucketMeta(object):
+    def __init__(self, client):
+        self.client = client
+
+
 class S3Interface_Test(unittest.TestCase):
     def test_constructor_creates_bucket_and_assigns_tempdir(self):
         m = MockS3Resource()
@@ -86,6 +129,37 @@ class S3Interface_Test(unittest.TestCase):
         finally:
             shutil.rmtree(tempPath)
 
+    def test_concurrent_single_file_archives(self):
+        with TemporaryDirectory() as temp_dir:
+            m = MockS3Resource()
+            m.bind_bucket_method(lambda name: MockS3Bucket(name))
+            s = S3Interface(m, "b", temp_dir)
+            compressPath = os.path.join(temp_dir, "compress")
+            extractPath = os.path.join(temp_dir, "extract")
+            os.makedirs(compressPath)
+            names = [f"file_{i}" for i in range(200)]
+            for name in names:
+                with open(os.path.join(compressPath, name), "w") as f:
+                    f.write(name)
+
+            def archive(name):
+                return s.archive_file_or_directory(
+                    os.path.join(compressPath, name), name
+                )
+
+            # the archives share the interface's temp dir
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                archives = list(executor.map(archive, names))
+            for name, archive_path in zip(names, archives):
+                s.unpack_file_or_directory(
+                    archive_path, os.path.join(extractPath, name)
+                )
+                with open(os.path.join(extractPath, name), "r") as f:
+                    self.assertEqual(f.read(), name)
+            self.assertNotIn(
+                "__is__single__file_archive__", os.listdir(temp_dir)
+            )
+
     def test_archive_and_extract_dir(self):
         tempPath = os.path.join(os.getcwd(), "tests", "temp")
         compressPath = os.path.join(tempPath, "compress")
@@ -264,6 +338,81 @@ class S3Interface_Test(unittest.TestCase):
         finally:
             shutil.rmtree(tempPath)
 
+    def test_json_round_trip(self):
+        m = MockS3Resource()
+        m.bind_bucket_method(lambda name: MockS3Bucket(name))
+        s = S3Interface(m, "b")
+        s.bucket.meta = MockS3BucketMeta(MockS3Client())
+        self.assertIsNone(s.get_json("a/b.json"))
+        s.put_json("a/b.json", {"attempts": 2})
+        self.assertEqual(s.get_json("a/b.json"), {"attempts": 2})
+        s.delete_object("a/b.json")
+        self.assertIsNone(s.get_json("a/b.json"))
+
+    def test_range_reader_counts_read_ahead_bytes(self):
+        client = MockS3Client()
+        data = os.urandom(10000)
+        client.objects["key"] = data
+        with S3RangeReader(
+            client, "b", "key", len(data), block_size=64, read_ahead=8
+        ) as reader:
+            self.assertEqual(reader.read(), data)
+        self.assertEqual(reader.bytes_fetched, len(data))
+
+    def test_streaming_download_compressed_file(self):
+        with TemporaryDirectory() as temp_dir:
+            client = MockS3Client()
+            m = MockS3Resource()
+            m.bind_bucket_method(lambda name: MockS3Bucket(name))
+            s = S3Interface(
+                m, "b", stream_downloads=True, stream_block_size=64
+            )
+            s.bucket.meta = MockS3BucketMeta(client)
+
+            fn = os.path.join(temp_dir, "tempfile")
+            with open(fn, "w") as f:
+                f.write("testfile contents " * 100)
+            archive = s.archive_file_or_directory(fn, "docName", temp_dir)
+            with open(archive, "rb") as f:
+                client.objects["keyPrefix/docName.zip"] = f.read()
+
+            extract_path = os.path.join(temp_dir, "extract", "tempfile")
+            s.download_compressed("keyPrefix", "docName", extract_path)
+            with open(extract_path, "r") as f:
+                self.assertEqual(f.read(), "testfile contents " * 100)
+            self.assertTrue(client.get_object_count > 1)
+
+    def test_streaming_download_compressed_directory(self):
+        with TemporaryDirectory() as temp_dir:
+            client = MockS3Client()
+            m = MockS3Resource()
+            m.bind_bucket_method(lambda name: MockS3Bucket(name))
+            s = S3Interface(
+                m, "b", stream_downloads=True, stream_block_size=100
+            )
+            s.bucket.meta = MockS3BucketMeta(client)
+
+            compress_path = os.path.join(temp_dir, "compress")
+            os.makedirs(os.path.join(compress_path, "subdir"))
+            for i in range(1, 10):
+                with open(
+                    os.path.join(compress_path, "subdir", f"tempfile{i}"), "w"
+                ) as f:
+                    f.write(f"testfile contents {i}")
+            archive = s.archive_file_or_directory(
+                compress_path, "docName", temp_dir
+            )
+            with open(archive, "rb") as f:
+                client.objects["keyPrefix/docName.zip"] = f.read()
+
+            extract_path = os.path.join(temp_dir, "extract")
+            s.download_compressed("keyPrefix", "docName", extract_path)
+            for i in range(1, 10):
+                with open(
+                    os.path.join(extract_path, "subdir", f"tempfile{i}"), "r"
+                ) as f:
+                    self.assertEqual(f.read(), f"testfile contents {i}")
+
 
 if __name__ == "__main__":
     unittest.main()
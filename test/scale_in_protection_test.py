@@ -0,0 +1,84 @@
+import os
+import json
+import unittest
+import logging
+from tempfile import TemporaryDirectory
+from cbm3_aws.instance.scale_in_protection import ScaleInProtection
+
+
+class MockAutoScalingClient:
+    def __init__(self):
+        self.calls = []
+
+    def set_instance_protection(
+        self, InstanceIds, AutoScalingGroupName, ProtectedFromScaleIn
+    ):
+        self.calls.append(ProtectedFromScaleIn)
+
+
+class ScaleInProtection_Test(unittest.TestCase):
+    def create(self, client, state_dir, process_index):
+        return ScaleInProtection(
+            client,
+            "group",
+            "i-0",
+            state_dir,
+            process_index,
+            logging.getLogger(__name__),
+        )
+
+    def test_protected_while_any_process_busy(self):
+        client = MockAutoScalingClient()
+        with TemporaryDirectory() as state_dir:
+            p0 = self.create(client, state_dir, 0)
+            p1 = self.create(client, state_dir, 1)
+            with p0.hold():
+                self.assertEqual(client.calls, [True])
+                with p1.hold():
+                    pass
+                # p0 still holds a task
+                self.assertEqual(client.calls, [True])
+            self.assertEqual(client.calls, [True, False])
+
+    def test_held_by_multiple_threads(self):
+        client = MockAutoScalingClient()
+        with TemporaryDirectory() as state_dir:
+            protection = self.create(client, state_dir, 0)
+            with protection.hold():
+                with protection.hold():
+                    pass
+                self.assertEqual(client.calls, [True])
+            self.assertEqual(client.calls, [True, False])
+
+    def test_stale_marker_ignored(self):
+        client = MockAutoScalingClient()
+        with TemporaryDirectory() as state_dir:
+            stale = os.path.join(state_dir, "busy_7")
+            with open(stale, "w") as marker:
+                # not a running process id
+                json.dump(dict(pid=2**22 + 1, create_time=0.0), marker)
+            with self.create(client, state_dir, 0).hold():
+                pass
+            self.assertEqual(client.calls, [True, False])
+            self.assertFalse(os.path.exists(stale))
+
+    def test_reused_process_id_ignored(self):
+        client = MockAutoScalingClient()
+        with TemporaryDirectory() as state_dir:
+            stale = os.path.join(state_dir, "busy_7")
+            with open(stale, "w") as marker:
+                # the process id was reused by a process created later
+                json.dump(dict(pid=os.getpid(), create_time=0.0), marker)
+            with self.create(client, state_dir, 0).hold():
+                pass
+            self.assertEqual(client.calls, [True, False])
+            self.assertFalse(os.path.exists(stale))
+
+    def test_client_errors_do_not_raise(self):
+        class FailingClient:
+            def set_instance_protection(self, **kwargs):
+                raise RuntimeError("throttled")
+
+        with TemporaryDirectory() as state_dir:
+            with self.create(FailingClient(), state_dir, 0).hold():
+                pass
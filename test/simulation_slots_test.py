@@ -0,0 +1,45 @@
+import unittest
+from threading import Thread
+from cbm3_aws.instance.simulation_slots import SimulationSlots
+
+
+class SimulationSlots_Test(unittest.TestCase):
+    def test_pending_simulations_claim_slots(self):
+        slots = SimulationSlots(4)
+        self.assertTrue(slots.wait_for_free_slot(timeout=0))
+        task = slots.reserve(4)
+        # all slots are claimed by the task's pending simulations
+        self.assertFalse(slots.wait_for_free_slot(timeout=0))
+        for _ in range(4):
+            task.acquire()
+        self.assertFalse(slots.wait_for_free_slot(timeout=0))
+        # the tail of the task: one simulation finished
+        task.release()
+        self.assertTrue(slots.wait_for_free_slot(timeout=0))
+
+    def test_set_pending_and_close(self):
+        slots = SimulationSlots(2)
+        task = slots.reserve(5)
+        task.set_pending(1)
+        self.assertTrue(slots.wait_for_free_slot(timeout=0))
+        task.set_pending(3)
+        self.assertFalse(slots.wait_for_free_slot(timeout=0))
+        task.close()
+        self.assertTrue(slots.wait_for_free_slot(timeout=0))
+
+    def test_acquire_waits_for_running_slot(self):
+        slots = SimulationSlots(1)
+        first = slots.reserve(1)
+        second = slots.reserve(1)
+        first.acquire()
+        thread = Thread(target=second.acquire)
+        thread.start()
+        thread.join(0.1)
+        self.assertTrue(thread.is_alive())
+        first.release()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import json
+import logging
+import unittest
+from threading import Thread
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+from cbm3_aws.instance.spot_interruption import MetadataClient
+from cbm3_aws.instance.spot_interruption import SpotInterruptionWatcher
+
+
+class StubMetadataHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_PUT(self):
+        if self.path != "/latest/api/token":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b"token")
+
+    def do_GET(self):
+        if self.headers.get("X-aws-ec2-metadata-token") != "token":
+            self.send_error(401)
+            return
+        notice = self.server.notice
+        if self.path != "/latest/meta-data/spot/instance-action" or not notice:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(json.dumps(notice).encode())
+
+
+class SpotInterruption_Test(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), StubMetadataHandler)
+        self.server.notice = None
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.server_thread = Thread(target=self.server.serve_forever)
+        self.server_thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.server_thread.join()
+
+    def test_get_interruption_notice(self):
+        client = MetadataClient(self.url)
+        self.assertIsNone(client.get_interruption_notice())
+        self.server.notice = {
+            "action": "terminate",
+            "time": "2026-01-01T00:02:00Z",
+        }
+        self.assertEqual(
+            client.get_interruption_notice()["action"], "terminate"
+        )
+
+    def test_watcher(self):
+        watcher = SpotInterruptionWatcher(
+            logging.getLogger(__name__), self.url, poll_interval=0.05
+        )
+        watcher.start()
+        try:
+            self.assertFalse(watcher.interrupted.wait(0.2))
+            self.server.notice = {"action": "stop", "time": ""}
+            self.assertTrue(watcher.interrupted.wait(5))
+        finally:
+            watcher.stop()
+            watcher.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from cbm3_aws.aws import cbm3_run_state_machine
+from cbm3_aws.aws import state_transition_benchmark
+from cbm3_aws.aws.task_retry_policy import FAIL
+
+
+class StateTransitionBenchmark_Test(unittest.TestCase):
+    def _get_rows(self, **kwargs):
+        rows = state_transition_benchmark.run_benchmark(n_tasks=10, **kwargs)
+        return {(row["scenario"], row["task_layout"]): row for row in rows}
+
+    def test_inline_layout_saves_the_child_execution(self):
+        rows = self._get_rows()
+        for scenario in state_transition_benchmark.get_scenarios():
+            child = rows[
+                (scenario, cbm3_run_state_machine.CHILD_EXECUTION_LAYOUT)
+            ]
+            inline = rows[(scenario, cbm3_run_state_machine.INLINE_LAYOUT)]
+            self.assertEqual(child["child_executions_per_task"], 1)
+            self.assertEqual(inline["child_executions_per_task"], 0)
+            self.assertAlmostEqual(
+                child["state_transitions_per_task"]
+                - inline["state_transitions_per_task"],
+                1,
+            )
+            self.assertTrue(child["succeeded"])
+            self.assertTrue(inline["succeeded"])
+
+    def test_retries_and_restarts_are_counted(self):
+        rows = self._get_rows()
+        layout = cbm3_run_state_machine.INLINE_LAYOUT
+        # map state (amortized) + RunCBMTask + StopCBMTask
+        self.assertAlmostEqual(
+            rows[("success", layout)]["state_transitions_per_task"], 2.1
+        )
+        # one retry
+        self.assertAlmostEqual(
+            rows[("one_timeout", layout)]["state_transitions_per_task"], 3.1
+        )
+        # RestartRemaining and the restarted RunCBMTask
+        self.assertAlmostEqual(
+            rows[("spot_interruption", layout)]["state_transitions_per_task"],
+            4.1,
+        )
+
+    def test_attempts_exhausted_with_fail_policy(self):
+        rows = self._get_rows(task_retry_policy={"terminal_failure": FAIL})
+        for layout in [
+            cbm3_run_state_machine.CHILD_EXECUTION_LAYOUT,
+            cbm3_run_state_machine.INLINE_LAYOUT,
+        ]:
+            self.assertFalse(rows[("attempts_exhausted", layout)]["succeeded"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+from cbm3_aws import task_packer
+
+
+class TaskPacker_Test(unittest.TestCase):
+    def test_all_simulations_packed_once(self):
+        simulations = [
+            dict(project_code=f"P{i % 5}", simulation_id=i, runtime=i % 7 + 1)
+            for i in range(100)
+        ]
+        packed = task_packer.pack_tasks(simulations, n_tasks=6)
+        self.assertEqual(len(packed), 6)
+        result = sorted(
+            (s["project_code"], s["simulation_id"]) for t in packed for s in t
+        )
+        expected = sorted(
+            (s["project_code"], s["simulation_id"]) for s in simulations
+        )
+        self.assertEqual(result, expected)
+
+    def test_tasks_are_balanced(self):
+        simulations = [
+            dict(project_code="A", simulation_id=i, runtime=runtime)
+            for i, runtime in enumerate([100, 50, 50] + [10] * 30)
+        ]
+        packed = task_packer.pack_tasks(
+            simulations, n_tasks=2, max_concurrency=2
+        )
+        runtimes = task_packer.get_expected_runtimes(packed, max_concurrency=2)
+        self.assertLessEqual(max(runtimes), 130)
+
+    def test_project_affinity(self):
+        simulations = [
+            dict(project_code=project_code, simulation_id=i, runtime=1)
+            for project_code in ["A", "B", "C", "D"]
+            for i in range(8)
+        ]
+        packed = task_packer.pack_tasks(
+            simulations, n_tasks=4, max_concurrency=8
+        )
+        for task in packed:
+            self.assertEqual(len(set(s["project_code"] for s in task)), 1)
+
+    def test_pack_creates_task_list(self):
+        simulations = [
+            dict(project_code="A", simulation_id=2),
+            dict(project_code="A", simulation_id=1),
+            dict(project_code="B", simulation_id=1),
+        ]
+        tasks = task_packer.pack(
+            simulations, "upload_key", max_concurrency=8, n_tasks=1
+        )
+        self.assertEqual(
+            tasks,
+            {
+                "task_list": [
+                    {
+                        "upload_s3_key": "upload_key",
+                        "simulations": [
+                            {"project_code": "A", "simulation_ids": [1, 2]},
+                            {"project_code": "B", "simulation_ids": [1]},
+                        ],
+                    }
+                ]
+            },
+        )
+
+    def test_get_task_count(self):
+        simulations = [
+            dict(project_code="A", simulation_id=i, runtime=10)
+            for i in range(32)
+        ]
+        self.assertEqual(
+            task_packer.get_task_count(
+                simulations, max_concurrency=8, target_task_runtime=20
+            ),
+            2,
+        )
+        with self.assertRaises(ValueError):
+            task_packer.pack(
+                simulations, "k", n_tasks=2, target_task_runtime=1
+            )
+
+    def test_create_work_units(self):
+        tasks = {
+            "task_list": [
+                {
+                    "upload_s3_key": "k",
+                    "simulations": [
+                        {"project_code": "A", "simulation_ids": [1, 2]},
+                        {"project_code": "B", "simulation_ids": [3]},
+                    ],
+                }
+            ]
+        }
+        units = task_packer.create_work_units(tasks)["task_list"]
+        self.assertEqual(len(units), 3)
+        self.assertEqual(
+            units[2],
+            {
+                "upload_s3_key": "k",
+                "simulations": [{"project_code": "B", "simulation_ids": [3]}],
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from argparse import ArgumentParser
+from cbm3_aws import transfer_profile
+
+MB = transfer_profile.MB
+
+
+class TransferProfile_Test(unittest.TestCase):
+    def test_get_transfer_profile_rejects_unknown_keys(self):
+        with self.assertRaises(ValueError):
+            transfer_profile.get_transfer_profile({"chunksize": 1})
+
+    def test_fixed_transfer_config(self):
+        config = transfer_profile.get_transfer_config(
+            dict(multipart_chunksize_mb=32, max_concurrency=4),
+            object_size=10000 * MB,
+        )
+        self.assertEqual(config.multipart_chunksize, 32 * MB)
+        self.assertEqual(config.max_concurrency, 4)
+
+    def test_adaptive_transfer_config(self):
+        profile = dict(max_concurrency=10, adaptive=True)
+        small = transfer_profile.get_transfer_config(profile, 4 * MB)
+        self.assertEqual(small.multipart_chunksize, 8 * MB)
+        self.assertEqual(small.max_concurrency, 1)
+        large = transfer_profile.get_transfer_config(profile, 4000 * MB)
+        self.assertEqual(large.multipart_chunksize, 100 * MB)
+        self.assertEqual(large.max_concurrency, 10)
+
+    def test_command_line_round_trip(self):
+        profile = transfer_profile.get_transfer_profile(
+            dict(max_concurrency=3, use_threads=False, adaptive=True)
+        )
+        parser = ArgumentParser()
+        transfer_profile.add_arguments(parser)
+        args = parser.parse_args(transfer_profile.to_command_line(profile))
+        self.assertEqual(transfer_profile.from_args(args), profile)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import base64
+import unittest
+from cbm3_aws.instance.user_data import create_userdata
+
+
+def _decode(user_data):
+    return base64.b64decode(user_data.encode("ascii")).decode()
+
+
+class UserData_Test(unittest.TestCase):
+    def test_worker_command(self):
+        script = _decode(
+            create_userdata(
+                activity_arn="activity_arn",
+                s3_bucket_name="bucket",
+                region_name="ca-central-1",
+                auto_scaling_group_name="group",
+                dynamic_work_units=True,
+                compact_results=True,
+            )
+        )
+        lines = script.split("\n")
+        self.assertEqual(lines[0], "<powershell>")
+        self.assertEqual(lines[-1], "</powershell>")
+        command = lines[1].split()
+        self.assertEqual(command[0], "cbm3_aws_instance")
+        for option, value in [
+            ("--activity_arn", "activity_arn"),
+            ("--s3_bucket_name", "bucket"),
+            ("--region_name", "ca-central-1"),
+            ("--auto_scaling_group_name", "group"),
+        ]:
+            self.assertEqual(command[command.index(option) + 1], value)
+        self.assertIn("--dynamic_work_units", command)
+        self.assertIn("--compact_results", command)
+        self.assertNotIn("--max_task_attempts", command)
+
+    def test_max_task_attempts(self):
+        command = _decode(
+            create_userdata(
+                activity_arn="activity_arn",
+                s3_bucket_name="bucket",
+                region_name="ca-central-1",
+                max_task_attempts=5,
+            )
+        ).split()
+        self.assertEqual(
+            command[command.index("--max_task_attempts") + 1], "5"
+        )